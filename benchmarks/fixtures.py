@@ -0,0 +1,326 @@
+"""
+Payloads served by the mock server
+
+Every payload is generated in the shape the bot reads from Riot and valorant-api.com, sized by Scale.
+A recorded payload can replace a generated one by dropping <name>.json into the fixtures directory,
+e.g. skins.json holding a real https://valorant-api.com/v1/weapons/skins?language=all response.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Any
+
+LOCALES = [
+    'ar-AE', 'de-DE', 'en-US', 'es-ES', 'es-MX', 'fr-FR', 'id-ID', 'it-IT', 'ja-JP', 'ko-KR',
+    'pl-PL', 'pt-BR', 'ru-RU', 'th-TH', 'tr-TR', 'vi-VN', 'zh-CN', 'zh-TW',
+]  # fmt: skip
+
+# real content tier uuids, the bot maps them to emojis in resources.tiers
+TIERS = {
+    '0cebb8be-46d7-c12a-d306-e9907bfc5a25': 'Deluxe',
+    'e046854e-406c-37f4-6607-19a9ba8426fc': 'Exclusive',
+    '60bca009-4182-7998-dee7-b8a2558dc369': 'Premium',
+    '12683d76-48d7-84a3-4e09-6985794f0445': 'Select',
+    '411e4a55-4e59-7757-41f0-86a53f101bb5': 'Ultra',
+}
+
+VP = '85ad13f7-3d1b-5128-9eb2-7cd8ee0b5741'
+RAD = 'e59aa87c-4cbf-517a-5983-6e81511be9b7'
+SEASON = '99ac9283-4dd3-5248-2e01-8baf778affb4'
+
+
+@dataclass
+class Scale:
+    skins: int = 800
+    bundles: int = 60
+    cards: int = 400
+    titles: int = 250
+    sprays: int = 300
+    buddies: int = 300
+    missions: int = 80
+    contracts: int = 10
+    party_size: int = 10
+
+
+def _uuid(kind: str, i: int) -> str:
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f'{kind}/{i}'))
+
+
+def _names(text: str) -> dict[str, str]:
+    return {locale: f'{text} ({locale})' for locale in LOCALES}
+
+
+def _icon(kind: str, i: int) -> str:
+    return f'https://media.valorant-api.com/{kind}/{_uuid(kind, i)}/displayicon.png'
+
+
+def skin_uuid(i: int) -> str:
+    return _uuid('skinlevel', i)
+
+
+def card_uuid(i: int) -> str:
+    return _uuid('playercard', i)
+
+
+def contract_uuid(i: int) -> str:
+    return _uuid('contract', i)
+
+
+class Fixtures:
+    def __init__(self, scale: Scale, directory: str | None = None) -> None:
+        self.scale = scale
+        self.directory = directory
+        self.payloads: dict[str, Any] = {}
+
+    def get(self, name: str) -> Any:
+        if name not in self.payloads:
+            self.payloads[name] = self._recorded(name) or getattr(self, f'_{name}')()
+        return self.payloads[name]
+
+    def _recorded(self, name: str) -> Any:
+        if self.directory is None:
+            return None
+        path = os.path.join(self.directory, f'{name}.json')
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    # ---------- valorant-api.com ---------- #
+
+    def _version(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': {
+                'manifestId': 'BENCHMARK0000000',
+                'branch': 'release-09.00',
+                'version': '09.00.00.2500000',
+                'buildVersion': '10',
+                'riotClientVersion': 'release-09.00-shipping-10-2500000',
+            },
+        }
+
+    def _skins(self) -> dict[str, Any]:
+        tiers = list(TIERS)
+        return {
+            'status': 200,
+            'data': [
+                {
+                    'uuid': _uuid('skin', i),
+                    'displayName': _names(f'Skin {i}'),
+                    'contentTierUuid': tiers[i % len(tiers)],
+                    'levels': [{'uuid': skin_uuid(i), 'displayIcon': _icon('skinlevel', i)}],
+                }
+                for i in range(self.scale.skins)
+            ],
+        }
+
+    def _tiers(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {'uuid': tier, 'devName': name, 'displayIcon': f'https://media.valorant-api.com/contenttiers/{tier}/displayicon.png'}
+                for tier, name in TIERS.items()
+            ],
+        }
+
+    def _bundles(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {
+                    'uuid': _uuid('bundle', i),
+                    'displayName': _names(f'Bundle {i}'),
+                    'displayNameSubText': _names('Collection'),
+                    'extraDescription': _names(f'Bundle {i} description'),
+                    'displayIcon2': _icon('bundle', i),
+                }
+                for i in range(self.scale.bundles)
+            ],
+        }
+
+    def _playercards(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {
+                    'uuid': card_uuid(i),
+                    'displayName': _names(f'Card {i}'),
+                    'smallArt': _icon('playercard', i),
+                    'wideArt': _icon('playercard', i),
+                    'largeArt': _icon('playercard', i),
+                }
+                for i in range(self.scale.cards)
+            ],
+        }
+
+    def _titles(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {'uuid': _uuid('title', i), 'displayName': _names(f'Title {i}'), 'titleText': _names(f'Title {i}')}
+                for i in range(self.scale.titles)
+            ],
+        }
+
+    def _sprays(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {
+                    'uuid': _uuid('spray', i),
+                    'displayName': _names(f'Spray {i}'),
+                    'fullTransparentIcon': _icon('spray', i),
+                    'displayIcon': _icon('spray', i),
+                }
+                for i in range(self.scale.sprays)
+            ],
+        }
+
+    def _buddies(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {
+                    'uuid': _uuid('buddy', i),
+                    'displayName': _names(f'Buddy {i}'),
+                    'levels': [{'uuid': _uuid('buddylevel', i), 'displayIcon': _icon('buddylevel', i)}],
+                }
+                for i in range(self.scale.buddies)
+            ],
+        }
+
+    def _currencies(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {'uuid': VP, 'displayName': _names('VP'), 'displayIcon': _icon('currency', 0)},
+                {'uuid': RAD, 'displayName': _names('Radianite Points'), 'displayIcon': _icon('currency', 1)},
+            ],
+        }
+
+    def _missions(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {
+                    'uuid': _uuid('mission', i),
+                    'title': _names(f'Mission {i}'),
+                    'type': 'EAresMissionType::Daily' if i % 2 else 'EAresMissionType::Weekly',
+                    'progressToComplete': 10,
+                    'xpGrant': 2000,
+                }
+                for i in range(self.scale.missions)
+            ],
+        }
+
+    def _contracts(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {
+                    'uuid': contract_uuid(i),
+                    'shipIt': False,
+                    'displayName': _names(f'Act {i}'),
+                    'displayIcon': _icon('contract', i),
+                    'content': {
+                        'relationUuid': SEASON if i == 0 else _uuid('season', i),
+                        'chapters': [
+                            {
+                                'levels': [
+                                    {'reward': {'type': 'PlayerCard', 'uuid': card_uuid(level % self.scale.cards)}}
+                                    for level in range(chapter * 5, chapter * 5 + 5)
+                                ]
+                            }
+                            for chapter in range(11)
+                        ],
+                    },
+                }
+                for i in range(self.scale.contracts)
+            ],
+        }
+
+    def _maps(self) -> dict[str, Any]:
+        return {
+            'status': 200,
+            'data': [
+                {'mapUrl': f'/Game/Maps/Map{i}/Map{i}', 'displayName': f'Map {i}'} for i in range(12)
+            ],
+        }
+
+    # ---------- Riot ---------- #
+
+    def _storefront(self) -> dict[str, Any]:
+        skins = self.scale.skins
+        return {
+            'SkinsPanelLayout': {
+                'SingleItemOffers': [skin_uuid(i * 7 % skins) for i in range(4)],
+                'SingleItemOffersRemainingDurationInSeconds': 40000,
+            },
+            'BonusStore': {
+                'BonusStoreOffers': [
+                    {
+                        'Offer': {'OfferID': skin_uuid(i * 11 % skins), 'Cost': {VP: 1775}},
+                        'DiscountPercent': 30,
+                        'DiscountCosts': {VP: 1242},
+                    }
+                    for i in range(6)
+                ],
+                'BonusStoreRemainingDurationInSeconds': 400000,
+            },
+            'FeaturedBundle': {'Bundles': []},
+        }
+
+    def _offers(self) -> dict[str, Any]:
+        return {
+            'Offers': [{'OfferID': skin_uuid(i), 'Cost': {VP: 875 + (i % 5) * 450}} for i in range(self.scale.skins)]
+        }
+
+    def _wallet(self) -> dict[str, Any]:
+        return {'Balances': {VP: 1000, RAD: 20}}
+
+    def _player_contracts(self) -> dict[str, Any]:
+        return {
+            'Contracts': [
+                {'ContractDefinitionID': contract_uuid(i), 'ProgressionLevelReached': 20, 'ProgressionTowardsNextLevel': 100}
+                for i in range(self.scale.contracts)
+            ]
+        }
+
+    def _content(self) -> dict[str, Any]:
+        return {
+            'Seasons': [
+                {'ID': SEASON, 'Name': 'ACT', 'Type': 'act', 'IsActive': True, 'EndTime': '2099-01-01T00:00:00Z'},
+                {'ID': _uuid('season', 0), 'Name': 'EPISODE', 'Type': 'episode', 'IsActive': True},
+            ]
+        }
+
+    def _mmr(self) -> dict[str, Any]:
+        return {
+            'LatestCompetitiveUpdate': {'SeasonID': SEASON},
+            'QueueSkills': {'competitive': {'SeasonalInfoBySeasonID': {SEASON: {'CompetitiveTier': 15}}}},
+        }
+
+    def _party(self) -> dict[str, Any]:
+        return {
+            'ID': 'party',
+            'CustomGameData': {'Membership': {'teamOne': [], 'teamTwo': [], 'teamSpectate': []}},
+        }
+
+    def _invite_code(self) -> dict[str, Any]:
+        return {'InviteCode': 'BENCH1'}
+
+    # ---------- auth ---------- #
+
+    def _entitlements(self) -> dict[str, Any]:
+        return {'entitlements_token': 'benchmark-entitlements'}
+
+    def _userinfo(self) -> dict[str, Any]:
+        return {'sub': 'benchmark-puuid', 'acct': {'game_name': 'Bench', 'tag_line': '0000'}}
+
+    def _region(self) -> dict[str, Any]:
+        return {'affinities': {'live': 'kr'}}
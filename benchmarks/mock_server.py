@@ -0,0 +1,126 @@
+"""
+Local stand-in for Riot and valorant-api.com
+
+Requests arrive as /<host>/<path> through UPSTREAM_OVERRIDE and are answered from Fixtures.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+import threading
+from collections import Counter
+from typing import TYPE_CHECKING, Any
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from .fixtures import Fixtures
+
+# (method, host pattern, path pattern, fixture name), first match wins
+ROUTES: list[tuple[str, str, str, str | None]] = [
+    ('GET', r'valorant-api\.com', r'/v1/version', 'version'),
+    ('GET', r'valorant-api\.com', r'/v1/weapons/skins', 'skins'),
+    ('GET', r'valorant-api\.com', r'/v1/contenttiers/?', 'tiers'),
+    ('GET', r'valorant-api\.com', r'/v1/bundles', 'bundles'),
+    ('GET', r'valorant-api\.com', r'/v1/playercards', 'playercards'),
+    ('GET', r'valorant-api\.com', r'/v1/playertitles', 'titles'),
+    ('GET', r'valorant-api\.com', r'/v1/sprays', 'sprays'),
+    ('GET', r'valorant-api\.com', r'/v1/buddies', 'buddies'),
+    ('GET', r'valorant-api\.com', r'/v1/currencies', 'currencies'),
+    ('GET', r'valorant-api\.com', r'/v1/missions', 'missions'),
+    ('GET', r'valorant-api\.com', r'/v1/contracts', 'contracts'),
+    ('GET', r'valorant-api\.com', r'/v1/maps', 'maps'),
+    ('GET', r'pd\..*', r'/store/v2/storefront/.*', 'storefront'),
+    ('GET', r'pd\..*', r'/store/v1/offers/?', 'offers'),
+    ('GET', r'pd\..*', r'/store/v1/wallet/.*', 'wallet'),
+    ('GET', r'pd\..*', r'/contracts/v1/contracts/.*', 'player_contracts'),
+    ('GET', r'shared\..*', r'/content-service/v3/content', 'content'),
+    ('GET', r'pd\..*', r'/mmr/v1/players/.*', 'mmr'),
+    ('PUT', r'pd\..*', r'/name-service/v2/players', None),
+    ('GET', r'glz-.*', r'/parties/v1/players/.*', None),
+    ('GET', r'glz-.*', r'/parties/v1/parties/[^/]+', 'party'),
+    ('POST', r'glz-.*', r'/parties/v1/parties/[^/]+/invitecode', 'invite_code'),
+    ('POST', r'glz-.*', r'/parties/v1/.*', None),
+    ('POST', r'entitlements\.auth\.riotgames\.com', r'/api/token/v1', 'entitlements'),
+    ('POST', r'auth\.riotgames\.com', r'/userinfo', 'userinfo'),
+    ('PUT', r'riot-geo\.pas\.si\.riotgames\.com', r'/pas/v1/product/valorant', 'region'),
+]
+
+_COMPILED = [(method, re.compile(host), re.compile(path), name) for method, host, path, name in ROUTES]
+
+
+class MockServer:
+    def __init__(self, fixtures: Fixtures, latency: float = 0.0) -> None:
+        self.fixtures = fixtures
+        self.latency = latency
+        self.hits: Counter[str] = Counter()
+        self.runner: web.AppRunner | None = None
+        self.url = ''
+
+    async def handle(self, request: web.Request) -> web.Response:
+        host, _, path = request.match_info['tail'].partition('/')
+        path = '/' + path
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        for method, host_pattern, path_pattern, name in _COMPILED:
+            if request.method != method or not host_pattern.fullmatch(host) or not path_pattern.fullmatch(path):
+                continue
+            self.hits[name or path_pattern.pattern] += 1
+            return web.json_response(await self._payload(request, name, path))
+
+        self.hits['404'] += 1
+        return web.json_response({'httpStatus': 404, 'errorCode': 'RESOURCE_NOT_FOUND'}, status=404)
+
+    async def _payload(self, request: web.Request, name: str | None, path: str) -> Any:
+        if name is not None:
+            return self.fixtures.get(name)
+
+        if path == '/name-service/v2/players':
+            puuids = json.loads(await request.text())
+            return [{'Subject': puuid, 'GameName': f'Player{i}', 'TagLine': 'KR1'} for i, puuid in enumerate(puuids)]
+        if path.startswith('/parties/v1/players/'):
+            return {'CurrentPartyID': 'party'}
+        return {}
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+        self.url = f'http://{host}:{port}'
+        return self.url
+
+    async def stop(self) -> None:
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    def start_in_thread(self) -> str:
+        """Serve from a separate thread and loop, the bot still makes blocking calls from its own loop"""
+
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+
+        def serve() -> None:
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            started.set()
+            loop.run_forever()
+            loop.run_until_complete(self.stop())
+            loop.close()
+
+        self.thread = threading.Thread(target=serve, name='mock-server', daemon=True)
+        self.thread.start()
+        started.wait()
+        self.loop = loop
+        return self.url
+
+    def stop_thread(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
@@ -0,0 +1,322 @@
+"""
+Offline benchmarks against the mock server
+
+    python -m benchmarks.run --users 200 --subscriptions 5 --guilds 20 --latency 0.02 --out bench.json
+
+Each scenario prints throughput and latency percentiles, --out writes them as json so runs can be
+compared across releases. Nothing leaves the machine, every upstream host is served by MockServer.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fixtures import Fixtures, Scale, skin_uuid  # noqa: E402
+from benchmarks.mock_server import MockServer  # noqa: E402
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+
+def percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(name: str, latencies: list[float], elapsed: float, ops: int) -> dict[str, Any]:
+    result = {
+        'scenario': name,
+        'ops': ops,
+        'seconds': round(elapsed, 4),
+        'ops_per_second': round(ops / elapsed, 2) if elapsed else None,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+    }
+    print(
+        f'{name:<22} {ops:>7} ops {result["ops_per_second"]:>10} ops/s '
+        f'p50 {result["p50_ms"]:>9}ms p95 {result["p95_ms"]:>9}ms p99 {result["p99_ms"]:>9}ms'
+    )
+    return result
+
+
+async def measure(
+    name: str, call: Callable[[], Awaitable[Any]], repeat: int, concurrency: int = 1, ops_per_call: int = 1
+) -> dict[str, Any]:
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(repeat)))
+    return report(name, latencies, time.perf_counter() - start, repeat * ops_per_call)
+
+
+# ---------- DISCORD STAND-INS ---------- #
+
+
+class BenchUser:
+    def __init__(self, user_id: int) -> None:
+        self.id = user_id
+        self.mention = f'<@{user_id}>'
+        self.sent = 0
+
+    async def send(self, *args: Any, **kwargs: Any) -> None:
+        self.sent += 1
+
+
+class BenchChannel(BenchUser):
+    pass
+
+
+class BenchGuild:
+    def __init__(self, guild_id: int, locale: str) -> None:
+        self.id = guild_id
+        self.preferred_locale = locale
+        self.channels: list[BenchChannel] = []
+
+
+class BenchBot:
+    """Just enough of ValorantBot for embeds and send_notify"""
+
+    def __init__(self, guilds: list[BenchGuild]) -> None:
+        self.emojis: list[Any] = []
+        self.guilds = guilds
+        self.users: dict[int, BenchUser] = {}
+        self.channels = {channel.id: channel for guild in guilds for channel in guild.channels}
+        self.fetches = 0
+
+    def get_user(self, user_id: int) -> BenchUser:
+        return self.users.setdefault(user_id, BenchUser(user_id))
+
+    async def fetch_user(self, user_id: int) -> BenchUser:
+        self.fetches += 1
+        return self.get_user(user_id)
+
+    async def create_dm(self, user: Any) -> BenchUser:
+        self.fetches += 1
+        return self.get_user(user.id)
+
+    def get_partial_messageable(self, channel_id: int, **kwargs: Any) -> BenchUser:
+        return self.get_user(channel_id)
+
+    def get_channel(self, channel_id: int) -> BenchChannel | None:
+        return self.channels.get(channel_id)
+
+    @property
+    def messages(self) -> int:
+        return sum(user.sent for user in self.users.values()) + sum(c.sent for c in self.channels.values())
+
+
+def seed_users(args: argparse.Namespace, guilds: list[BenchGuild]) -> None:
+    from utils.valorant.useful import JSON
+
+    expiry = datetime.timestamp(datetime.utcnow() + timedelta(days=1))
+    users = {}
+    notifys = []
+    channels = [channel for guild in guilds for channel in guild.channels]
+    for i in range(args.users):
+        user_id = str(10_000 + i)
+        channel = channels[i % len(channels)]
+        users[user_id] = {
+            'cookie': {},
+            'access_token': f'token-{i}',
+            'token_id': f'id-{i}',
+            'emt': f'emt-{i}',
+            'puuid': f'puuid-{i}',
+            'username': f'Player{i}#KR1',
+            'region': 'kr',
+            'expiry_token': expiry,
+            'notify_mode': 'Specified' if i % 2 else 'All',
+            'DM_Message': i % 3 == 0,
+            'notify_channel': channel.id,
+        }
+        for n in range(args.subscriptions):
+            notifys.append({'id': user_id, 'uuid': skin_uuid(n * 7 % args.skins), 'channel_id': channel.id})
+    JSON.save('users', users)
+    JSON.save('notifys', notifys)
+    JSON.flush()
+
+
+# ---------- SCENARIOS ---------- #
+
+
+async def run(args: argparse.Namespace) -> list[dict[str, Any]]:
+    from utils.valorant import cache as Cache, transport
+    from utils.valorant.auth import Auth
+    from utils.valorant.catalog import get_catalog
+    from utils.valorant.embed import GetEmbed
+    from utils.valorant.endpoint import API_ENDPOINT
+    from utils.valorant.local import ResponseLanguage
+    from utils.valorant.useful import JSON, GetFormat
+
+    if not args.rate_limits:
+        transport.DEFAULT_RATE_LIMIT = (1e9, 1e9)
+        transport.HOST_RATE_LIMITS.clear()
+
+    fixtures = Fixtures(
+        Scale(skins=args.skins, party_size=args.party_size),
+        args.fixtures,
+    )
+    server = MockServer(fixtures, latency=args.latency)
+    server.start_in_thread()
+    transport.UPSTREAM_OVERRIDE = server.url
+
+    results = []
+    try:
+        # cache builder, valorant-api.com catalog into cache.json
+        results.append(await measure('cache_build', lambda: asyncio.to_thread(Cache.get_cache), args.cache_repeat))
+        JSON.flush()
+        await asyncio.to_thread(Cache.fetch_price, fixtures.get('offers'))
+        get_catalog()
+
+        storefront = fixtures.get('storefront')
+        response = ResponseLanguage('store', 'en-US')
+
+        async def offer_format() -> None:
+            GetFormat.offer_format(storefront)
+
+        results.append(await measure('get_format_offer', offer_format, args.repeat))
+
+        guilds = [BenchGuild(900_000 + g, 'en-US' if g % 2 else 'ko') for g in range(args.guilds)]
+        for g, guild in enumerate(guilds):
+            guild.channels = [BenchChannel(800_000 + g * 10 + c) for c in range(3)]
+        bot = BenchBot(guilds)
+
+        async def store_embed() -> None:
+            GetEmbed.store('Player#KR1', storefront, response, bot)  # type: ignore
+
+        results.append(await measure('get_embed_store', store_embed, args.repeat))
+
+        # send_notify over every seeded user
+        from cogs.notify import Notify
+        from utils.recipients import recipients
+        from utils.valorant.db import DATABASE
+
+        seed_users(args, guilds)
+        recipients.index(guilds)  # type: ignore
+        notify = Notify.__new__(Notify)
+        notify.bot = bot  # type: ignore
+        notify.db = DATABASE()
+        result = await measure('send_notify', notify.send_notify, args.notify_repeat, ops_per_call=args.users)
+        # Discord sends per notified user and night, one message each once matches are batched
+        result['messages'] = bot.messages
+        result['messages_per_user'] = round(bot.messages / (args.users * args.notify_repeat), 3)
+        results.append(result)
+        print(
+            f'{"":<22} {bot.messages} notify messages sent ({result["messages_per_user"]} per user), '
+            f'{server.hits.total()} upstream requests, {bot.fetches} Discord user lookups'
+        )
+
+        # the same run with every guild channel in digest mode, DM users are unaffected
+        JSON.save('notify_digest', {str(channel.id): guild.id for guild in guilds for channel in guild.channels})
+        sent = bot.messages
+        result = await measure('send_notify_digest', notify.send_notify, args.notify_repeat, ops_per_call=args.users)
+        result['messages'] = bot.messages - sent
+        result['messages_per_user'] = round(result['messages'] / (args.users * args.notify_repeat), 3)
+        results.append(result)
+        JSON.save('notify_digest', {})
+        print(f'{"":<22} {result["messages"]} notify messages sent ({result["messages_per_user"]} per user)')
+
+        # party flows, host endpoint plus party_size logged in players
+        endpoint = API_ENDPOINT()
+        endpoint.activate(
+            {'puuid': 'host', 'region': 'kr', 'player_name': 'Host#KR1', 'headers': {'Authorization': 'Bearer host', 'X-Riot-Entitlements-JWT': 'host'}}
+        )
+        players = [
+            {
+                'puuid': f'puuid-{i}',
+                'username': f'Player{i}',
+                'tag': 'KR1',
+                'headers': {'Authorization': f'Bearer {i}', 'X-Riot-Entitlements-JWT': f'emt-{i}'},
+            }
+            for i in range(args.party_size)
+        ]
+        half = args.party_size // 2
+
+        async def party() -> None:
+            await endpoint.invite_party('party', players)
+            await endpoint.request_party_join('party', players)
+            await endpoint.change_custom_game_team('party', players[:half], players[half:], endpoint.headers)
+
+        results.append(await measure('party_flow', party, args.repeat // 10 or 1, ops_per_call=args.party_size))
+
+        # auth steps run on login and token refresh
+        auth = Auth()
+
+        async def auth_steps() -> None:
+            await auth.resolve_identity('access', 'id')
+
+        results.append(await measure('auth_steps', auth_steps, args.repeat // 10 or 1, concurrency=args.concurrency))
+    finally:
+        server.stop_thread()
+        JSON.flush()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Offline benchmarks against a local Riot / valorant-api.com stand-in')
+    parser.add_argument('--users', type=int, default=100, help='logged in users with notify enabled')
+    parser.add_argument('--subscriptions', type=int, default=5, help='skin subscriptions per user')
+    parser.add_argument('--guilds', type=int, default=10)
+    parser.add_argument('--skins', type=int, default=800, help='skins in the generated catalog')
+    parser.add_argument('--party-size', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=200, help='iterations of the per-call scenarios')
+    parser.add_argument('--cache-repeat', type=int, default=3)
+    parser.add_argument('--notify-repeat', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the mock server waits per request')
+    parser.add_argument('--rate-limits', action='store_true', help='keep the transport rate limits')
+    parser.add_argument('--fixtures', help='directory of recorded <name>.json payloads replacing generated ones')
+    parser.add_argument('--out', help='write results as json')
+    args = parser.parse_args()
+
+    fixtures_dir = os.path.abspath(args.fixtures) if args.fixtures else None
+    out = os.path.abspath(args.out) if args.out else None
+
+    # the bot reads data/ and languages/ relative to the working directory
+    workdir = tempfile.mkdtemp(prefix='valorant-bench-')
+    os.symlink(os.path.join(ROOT, 'languages'), os.path.join(workdir, 'languages'))
+    os.chdir(workdir)
+    os.environ.setdefault('STORAGE_BACKEND', 'file')
+    args.fixtures = fixtures_dir
+
+    results = asyncio.run(run(args))
+
+    if out:
+        with open(out, 'w', encoding='utf-8') as f:
+            json.dump(
+                {
+                    'date': datetime.utcnow().isoformat(),
+                    'python': platform.python_version(),
+                    'args': {k: v for k, v in vars(args).items() if k != 'out'},
+                    'results': results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,21 +1,35 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import os
 import sys
-import traceback
+from typing import Any
 
 import aiohttp
 import discord
+from aiohttp import web
+from discord import app_commands
 from discord.ext import commands
 from discord.ext.commands import ExtensionFailed, ExtensionNotFound, NoEntryPointError
 from dotenv import load_dotenv
 
-from utils import locale_v2
+from utils import deadline, locale_v2, metrics
+from utils.admission import admission
+from utils.cluster import CACHE_BUILD_LEASE, cluster
+from utils.log import bind, setup_logging, stop_logging
+from utils.profiling import profiler
 from utils.valorant.cache import get_cache
+from utils.valorant.catalog import cache_info
+from utils.valorant.storage import leases
+from utils.valorant.transport import BULK, prioritized
+from utils.valorant.useful import JSON
+from utils.watchdog import watchdog
 
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 initial_extensions = ['cogs.admin', 'cogs.errors', 'cogs.notify', 'cogs.valorant']
 
 # intents required
@@ -35,31 +49,52 @@ else:
     DISCORD_VALORANT_BOT_TOKEN = sys.argv[1]
     OWNER_ID = sys.argv[2]
 
-class ValorantBot(commands.Bot):
+class CommandTree(app_commands.CommandTree):
+    async def _call(self, interaction: discord.Interaction) -> None:
+        name = (interaction.data or {}).get('name', 'unknown')
+        async with admission.admit(interaction) as admitted:
+            if not admitted:
+                return
+            async with profiler.profile(f'command.{name}', name):
+                await super()._call(interaction)
+
+
+# SHARDED=1 splits the gateway over shards, see utils/cluster.py for running them in several processes
+BotBase = commands.AutoShardedBot if cluster.sharded else commands.Bot
+
+
+class ValorantBot(BotBase):  # type: ignore
     debug: bool
     bot_app_info: discord.AppInfo
 
     def __init__(self) -> None:
-        super().__init__(command_prefix=BOT_PREFIX, case_insensitive=True, intents=intents)
+        super().__init__(command_prefix=BOT_PREFIX, case_insensitive=True, intents=intents, tree_cls=CommandTree, **cluster.bot_options())
         self.session: aiohttp.ClientSession | None = None
+        self.metrics_runner: web.AppRunner | None = None
         self.bot_version = '3.3.5'
         self.tree.interaction_check = self.interaction_check
         self.valorant_cog = None
 
     @staticmethod
     async def interaction_check(interaction: discord.Interaction) -> bool:
+        bind(interaction)
+        deadline.begin(interaction)
+        deadline.auto_defer(interaction)
         locale_v2.set_interaction_locale(interaction.locale)  # bot responses localized # wait for update # type: ignore
         locale_v2.set_valorant_locale(interaction.locale)  # valorant localized # type: ignore
         return True
 
+    async def on_app_command_completion(self, interaction: discord.Interaction, command: Any) -> None:
+        elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+        metrics.command_seconds.observe(elapsed, command=command.qualified_name, status='ok')
+
     @property
     def owner(self) -> discord.User:
         return self.bot_app_info.owner
 
     async def on_ready(self) -> None:
         await self.tree.sync()
-        print(f'\nLogged in as: {self.user}\n\n BOT IS READY !')
-        print(f'Version: {self.bot_version}')
+        log.info('Logged in as: %s, BOT IS READY ! Version: %s', self.user, self.bot_version)
 
         # bot presence
         activity_type = discord.ActivityType.listening
@@ -75,7 +110,16 @@ class ValorantBot(commands.Bot):
             self.bot_app_info = await self.application_info()
             self.owner_id = self.bot_app_info.owner.id
 
-        self.setup_cache()
+        if os.getenv('METRICS_PORT'):
+            host = os.getenv('METRICS_HOST') or '127.0.0.1'
+            self.metrics_runner = await metrics.start_server(host, int(os.getenv('METRICS_PORT')))  # type: ignore
+
+        # seconds the event loop may stall before the blocking stack is recorded, 0 turns the watchdog off
+        threshold = float(os.getenv('LOOP_BLOCK_THRESHOLD') or watchdog.threshold)
+        if threshold > 0:
+            watchdog.start(threshold)
+
+        await self.setup_cache()
         await self.load_cogs()
         # await self.tree.sync()
 
@@ -91,21 +135,35 @@ class ValorantBot(commands.Bot):
                 NoEntryPointError,
                 ExtensionFailed,
             ):
-                print(f'Failed to load extension {ext}.', file=sys.stderr)
-                traceback.print_exc()
+                log.exception('Failed to load extension %s.', ext)
 
     @staticmethod
-    def setup_cache() -> None:
-        try:
-            with open('data/cache.json'):
-                ...
-        except FileNotFoundError:
-            get_cache()
+    async def setup_cache() -> None:
+        """Build the asset cache when the store has none, other processes wait for the one building it"""
+
+        if cache_info() is not None:
+            return
+        cache = await asyncio.to_thread(JSON.read, 'cache', False)
+        if cache is not None:
+            # saved before cache_meta existed, saving it once records its generation and version
+            await asyncio.to_thread(JSON.save, 'cache', cache)
+            return
+        async with leases.hold('cache_build', cluster.owner, CACHE_BUILD_LEASE):
+            JSON.invalidate('cache')
+            if cache_info() is None:
+                with prioritized(BULK):
+                    await asyncio.to_thread(get_cache)
+                await asyncio.to_thread(JSON.flush)
 
     async def close(self) -> None:
+        watchdog.stop()
         if self.session:
             await self.session.close()
+        if self.metrics_runner:
+            await self.metrics_runner.cleanup()
         await super().close()
+        await asyncio.to_thread(JSON.flush)
+        stop_logging()
 
     async def start(self, debug: bool = False) -> None:
         self.debug = debug
@@ -114,6 +172,7 @@ class ValorantBot(commands.Bot):
 
 
 def run_bot() -> None:
+    setup_logging()
     bot = ValorantBot()
     asyncio.run(bot.start())
 
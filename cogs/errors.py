@@ -1,8 +1,8 @@
 from __future__ import annotations
 
+import logging
 import traceback
 from typing import TYPE_CHECKING
-from traceback import format_exception
 
 import discord
 from discord import Interaction
@@ -20,12 +20,14 @@ from utils.errors import (
     AuthenticationError,
     BadArgument,
     DatabaseError,
+    DeadlineExceeded,
     HandshakeError,
     NotOwner,
     ResponseError,
     ValorantBotError,
     PermissionMangeRoleError,
 )
+from utils.metrics import command_seconds
 from utils.valorant.local import LocalErrorResponse
 from utils.valorant.view import LoginView
 
@@ -34,6 +36,8 @@ if TYPE_CHECKING:
 
 app_cmd_scope = 'https://cdn.discordapp.com/attachments/934041100048535563/979410875226128404/applications.commands.png'
 
+log = logging.getLogger(__name__)
+
 
 class ErrorHandler(commands.Cog):
     """Error handler"""
@@ -45,7 +49,18 @@ class ErrorHandler(commands.Cog):
     async def on_app_command_error(self, interaction: Interaction, error: AppCommandError) -> None:
         """Handles errors for all application commands."""
 
-        errortxt = str(format_exception(type(error), error, error.__traceback__)).replace("\\n", "\n")
+        expired = isinstance(getattr(error, 'original', error), DeadlineExceeded)
+        if interaction.command is not None:
+            elapsed = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+            command_seconds.observe(
+                elapsed, command=interaction.command.qualified_name, status='expired' if expired else 'error'
+            )
+
+        if expired:
+            # the interaction token is gone, there is nobody to answer
+            log.info('abandoned %s after its deadline', interaction.command.qualified_name if interaction.command else 'interaction')
+            return
+
         if self.bot.debug is True:
             traceback.print_exception(type(error), error, error.__traceback__)
 
@@ -71,7 +86,7 @@ class ErrorHandler(commands.Cog):
         # else:
         #     traceback.print_exception(type(error), error)
         response = LocalErrorResponse('DATABASE', interaction.locale) # type: ignore
-        print(f'Error: {error}')
+        log.info('app command error: %s', error)
         embed = discord.Embed(description=f'{str(error_message)[:2000]}', color=0xFE676E)
 
         if response.get('NOT_LOGIN') == str(error_message):
@@ -88,12 +103,11 @@ class ErrorHandler(commands.Cog):
             # if interaction.response.is_done():
             return await interaction.followup.send(embed=embed, ephemeral=True) # type: ignore
             # await interaction.response.send_message(embed=embed, ephemeral=True) # type: ignore
-        print(f'Error: {errortxt}')
+        log.error('app command error', exc_info=error)
 
     @commands.Cog.listener()
     async def on_command_error(self, ctx: commands.Context[ValorantBot], error: Exception) -> None:
         embed = discord.Embed(color=0xFE676E)
-        errortxt = str(format_exception(type(error), error, error.__traceback__)).replace("\\n", "\n")
 
         if isinstance(error, CommandNotFound):
             return
@@ -116,9 +130,8 @@ class ErrorHandler(commands.Cog):
         elif isinstance(error, PermissionMangeRoleError):
             cm_error = 'Could not manage roles.'
         else:
-            traceback.print_exception(type(error), error, error.__traceback__)
             cm_error = 'An unknown error occurred, sorry'
-        print(f'Error: {errortxt}')
+        log.error('command error', exc_info=error)
         embed.description = cm_error
         await ctx.send(embed=embed, delete_after=30, ephemeral=True)
 
@@ -1,35 +1,81 @@
 from __future__ import annotations
 
-import traceback
+import asyncio
+import logging
 from datetime import datetime, time, timedelta
 from difflib import get_close_matches
 from typing import TYPE_CHECKING, Any, Literal
 
 # Standard
 import discord
-from discord import Forbidden, HTTPException, Interaction, app_commands
+from discord import Forbidden, HTTPException, Interaction, NotFound, app_commands
 from discord.ext import commands, tasks
 
-from utils.errors import ValorantBotError
-from utils.locale_v2 import ValorantTranslator
+from utils.cluster import NOTIFY_LEASE, cluster
+from utils.errors import SessionExpired, ValorantBotError
+from utils.locale_v2 import ValorantTranslator, valorant_locale_overwrite
+from utils.log import bind
+from utils.metrics import failures, sessions_quarantined
+from utils.profiling import profiler
+from utils.recipients import recipients
 from utils.valorant import view as View
-from utils.valorant.cache import create_json
+from utils.valorant.catalog import get_catalog
 from utils.valorant.db import DATABASE
 from utils.valorant.embed import Embed, GetEmbed
 from utils.valorant.endpoint import API_ENDPOINT
 from utils.valorant.local import ResponseLanguage
+from utils.valorant.storage import leases, notifys
+from utils.valorant.transport import BULK, prioritized
 from utils.valorant.useful import JSON, GetEmoji, GetItems, format_relative
 
 VLR_locale = ValorantTranslator()
 
+log = logging.getLogger(__name__)
+
 if TYPE_CHECKING:
     from bot import ValorantBot
 
+# users per digest message and the description budget of its embed
+DIGEST_PAGE_SIZE = 10
+DIGEST_PAGE_CHARS = 3800
+
+
+class Digest:
+    """Matches collected for one channel during a notify run, posted as a few shared messages"""
+
+    def __init__(self, channel: Any, response: dict[str, Any], duration: str) -> None:
+        self.channel = channel
+        self.response = response
+        self.duration = duration
+        self.entries: list[tuple[str, str]] = []  # mention, line
+
+    def add(self, mention: str, text: str) -> None:
+        self.entries.append((mention, f'{mention} {text}'))
+
+    def pages(self) -> list[list[tuple[str, str]]]:
+        pages: list[list[tuple[str, str]]] = [[]]
+        size = 0
+        for entry in self.entries:
+            if pages[-1] and (len(pages[-1]) >= DIGEST_PAGE_SIZE or size + len(entry[1]) > DIGEST_PAGE_CHARS):
+                pages.append([])
+                size = 0
+            pages[-1].append(entry)
+            size += len(entry[1]) + 1
+        return pages
+
+    async def send(self) -> None:
+        header: str = self.response.get('DIGEST', 'Daily store notifications | Leaves {duration} | Page {page}/{pages}')
+        pages = self.pages()
+        for page, entries in enumerate(pages, start=1):
+            description = header.format(duration=self.duration, page=page, pages=len(pages))
+            embed = Embed('\n'.join([description, *(line for _, line in entries)]))
+            mentions = ' '.join(mention for mention, _ in entries)
+            await self.channel.send(content=f'||{mentions}||', embed=embed)
+
 
 class Notify(commands.Cog):
     def __init__(self, bot: ValorantBot) -> None:
         self.bot: ValorantBot = bot
-        self.endpoint: API_ENDPOINT = None  # type: ignore
         self.db: DATABASE = None  # type: ignore
         self.notifys.start()
 
@@ -39,103 +85,200 @@ class Notify(commands.Cog):
     @commands.Cog.listener()
     async def on_ready(self) -> None:
         self.db = DATABASE()
-        self.endpoint = API_ENDPOINT()
+        recipients.index(self.bot.guilds)
+
+    @commands.Cog.listener('on_guild_join')
+    @commands.Cog.listener('on_guild_available')
+    async def index_guild(self, guild: discord.Guild) -> None:
+        recipients.add_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_update(self, before: discord.Guild, after: discord.Guild) -> None:
+        recipients.add_guild(after)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild) -> None:
+        recipients.remove_guild(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_create(self, channel: discord.abc.GuildChannel) -> None:
+        recipients.add_channel(channel)
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: discord.abc.GuildChannel) -> None:
+        recipients.remove_channel(channel)
 
     async def get_endpoint_and_data(self, user_id: int) -> tuple[API_ENDPOINT, Any]:
         data = await self.db.is_data(user_id, 'en-US')
-        endpoint = self.endpoint
-        endpoint.activate(data)  # type: ignore
+        endpoint = API_ENDPOINT()
+        await asyncio.to_thread(endpoint.activate, data)  # type: ignore
         return endpoint, data
 
+    def delivers(self, user_id: str, data: dict[str, Any]) -> bool:
+        """Whether this cluster sends the user's notify, DMs are split by user id, channels go where the channel is"""
+        if not cluster.enabled:
+            return True
+        if data.get('DM_Message', True):
+            return cluster.owns_user(user_id)
+        return self.bot.get_channel(int(data.get('notify_channel') or 0)) is not None
+
     async def send_notify(self) -> None:
-        notify_users = self.db.get_user_is_notify()
-        notify_data = JSON.read('notifys')
+        users = self.db.read_db()
+        notify_users = [user_id for user_id in self.db.get_user_is_notify() if self.delivers(user_id, users[user_id])]
+        notify_data = notifys.all()
+        await recipients.prefetch(self.bot, [user_id for user_id in notify_users if users[user_id].get('DM_Message')])
+
+        # channels opted into digest mode get a few shared messages after the run instead of one per user
+        digest_channels = JSON.read('notify_digest')
+        digests: dict[int, Digest] = {}
 
         for user_id in notify_users:
+            bind(user_id=int(user_id))
             try:
                 # endpoint
                 endpoint, data = await self.get_endpoint_and_data(int(user_id))
 
-                # offer
-                offer = endpoint.store_fetch_storefront()
+                # offer, fetched off the event loop at the bulk priority the run was started with
+                offer = await asyncio.to_thread(endpoint.store_fetch_storefront)
+                if users[user_id].get('session_failures'):
+                    self.db.session_ok(int(user_id))
                 skin_offer_list = offer['SkinsPanelLayout']['SingleItemOffers']
                 duration = offer['SkinsPanelLayout']['SingleItemOffersRemainingDurationInSeconds']
 
-                # author
-                author = self.bot.get_user(int(user_id)) or await self.bot.fetch_user(int(user_id))
-                channel_send = author if data['dm_message'] else self.bot.get_channel(int(data['notify_channel']))
-
-                # get guild language
-                guild_locale = 'en-US'
-                get_guild_locale = [
-                    guild.preferred_locale for guild in self.bot.guilds if channel_send in guild.channels
-                ]
-                if len(get_guild_locale) > 0:
-                    guild_locale = guild_locale[0]
+                # destination and its language, the guild's for channels and the user's for DMs
+                channel_send, guild_locale = await recipients.destination(self.bot, user_id, users[user_id])
+                mention = f'<@{user_id}>'
+                item_locale = valorant_locale_overwrite.get(guild_locale, 'en-US')
 
                 response = ResponseLanguage('notify_send', guild_locale)
+                relative = format_relative(datetime.utcnow() + timedelta(seconds=duration))  # type: ignore
+
+                digest = None
+                if not data['dm_message'] and str(data['notify_channel']) in digest_channels:
+                    digest = digests.get(channel_send.id)  # type: ignore
+                    if digest is None:
+                        digest = digests[channel_send.id] = Digest(channel_send, response, relative)  # type: ignore
 
                 user_skin_list = [skin for skin in notify_data if skin['id'] == str(user_id)]  # type: ignore
                 user_skin_list_uuid = [skin['uuid'] for skin in notify_data if skin['id'] == str(user_id)]  # type: ignore
 
                 if data['notify_mode'] == 'Specified':
                     skin_notify_list = list(set(skin_offer_list).intersection(set(user_skin_list_uuid)))
+                    notify_send: str = response.get('RESPONSE_SPECIFIED')  # type: ignore
+
+                    # every match goes out in one message with one removal menu
+                    embeds: list[discord.Embed] = []
+                    skins: dict[str, str] = {}
+                    labels: list[str] = []
                     for noti in user_skin_list:
-                        if noti['uuid'] in skin_notify_list:  # type: ignore
-                            uuid = noti['uuid']  # type: ignore
-                            skin = GetItems.get_skin(uuid)
-                            name = skin['names'][guild_locale]
-                            icon = skin['icon']
-                            emoji = GetEmoji.tier_by_bot(uuid, self.bot)
-
-                            notify_send: str = response.get('RESPONSE_SPECIFIED')  # type: ignore
-                            duration = format_relative(datetime.utcnow() + timedelta(seconds=duration))  # type: ignore
-
-                            embed = Embed(notify_send.format(emoji=emoji, name=name, duration=duration), color=0xFD4554)
-                            embed.set_thumbnail(url=icon)
-                            view = View.NotifyView(user_id, uuid, name, ResponseLanguage('notify_add', guild_locale))
-                            view.message = await channel_send.send(  # type: ignore
-                                content=f'||{author.mention}||', embed=embed, view=view
-                            )
+                        uuid = noti['uuid']  # type: ignore
+                        if uuid not in skin_notify_list or uuid in skins:
+                            continue
+                        skin = GetItems.get_skin(uuid)
+                        name = skin['names'][item_locale]
+                        emoji = GetEmoji.tier_by_bot(uuid, self.bot)
+
+                        embed = Embed(notify_send.format(emoji=emoji, name=name, duration=relative), color=0xFD4554)
+                        embed.set_thumbnail(url=skin['icon'])
+                        embeds.append(embed)
+                        skins[uuid] = name
+                        labels.append(f'{emoji} **{name}**')
+
+                    if skins and digest is not None:
+                        digest.add(mention, ', '.join(labels))
+                    elif skins:
+                        notify_add = ResponseLanguage('notify_add', guild_locale)
+                        if len(skins) == 1:
+                            view = View.NotifyView(user_id, *next(iter(skins.items())), notify_add)
+                        else:
+                            view = View.NotifyBatchView(user_id, skins, notify_add)
+                        view.message = await channel_send.send(  # type: ignore
+                            content=f'||{mention}||', embeds=embeds, view=view
+                        )
+
+                elif data['notify_mode'] == 'All' and digest is not None:
+                    labels = [
+                        f'{GetEmoji.tier_by_bot(uuid, self.bot)} {GetItems.get_skin(uuid)["names"][item_locale]}'
+                        for uuid in skin_offer_list
+                    ]
+                    digest.add(mention, f'**{endpoint.player}**: {", ".join(labels)}')
 
                 elif data['notify_mode'] == 'All':
                     embeds = GetEmbed.notify_all_send(endpoint.player, offer, response, self.bot)
-                    await channel_send.send(content=f'||{author.mention}||', embeds=embeds)  # type: ignore
+                    await channel_send.send(content=f'||{mention}||', embeds=embeds)  # type: ignore
 
+            except SessionExpired:
+                log.info('riot session expired', extra={'data': {'notify_user': user_id}})
+                if self.db.session_failed(int(user_id)):
+                    sessions_quarantined.inc()
+                    await self.send_relogin(user_id, users[user_id])
             except (KeyError, FileNotFoundError):
-                print(f'{user_id} is not in notify list')
+                log.warning('user is not in notify list', extra={'data': {'notify_user': user_id}})
             except Forbidden:
-                print("Bot don't have perm send notification message.")
+                log.warning("bot doesn't have permission to send the notify message", extra={'data': {'notify_user': user_id}})
                 continue
-            except HTTPException:
-                print("Bot Can't send notification message.")
+            except HTTPException as e:
+                log.warning("bot can't send the notify message", extra={'data': {'notify_user': user_id}})
+                if isinstance(e, NotFound):
+                    recipients.forget(user_id)
                 continue
-            except Exception as e:
-                print(e)
-                traceback.print_exception(type(e), e, e.__traceback__)
+            except Exception:
+                failures.inc(source='send_notify')
+                log.exception('send_notify failed', extra={'data': {'notify_user': user_id}})
                 continue
 
+        for channel_id, digest in digests.items():
+            try:
+                await digest.send()
+            except HTTPException:
+                log.warning("bot can't send the notify digest", extra={'data': {'notify_channel': channel_id}})
+
+    async def send_relogin(self, user_id: str, user: dict[str, Any]) -> None:
+        """Tell a quarantined user once that their notifications are paused until they log in again"""
+
+        response = ResponseLanguage('notify_send', user.get('locale') or 'en-US')
+        message = response.get(
+            'SESSION_EXPIRED',
+            'Your Riot session has expired, so your store notifications are paused. Use `/login` again to turn them back on.',
+        )
+        try:
+            author, _ = await recipients.destination(self.bot, user_id, {**user, 'DM_Message': True})
+            await author.send(embed=Embed(message))
+        except HTTPException:
+            log.warning("can't send the re-login message", extra={'data': {'notify_user': user_id}})
+
     @tasks.loop(time=time(hour=0, minute=0, second=10))  # utc 00:00:15
     async def notifys(self) -> None:
         __verify_time = datetime.utcnow()
         if __verify_time.hour == 0:
-            await self.send_notify()
+            # once a day per cluster, even when the process restarts or a second copy runs
+            lease = f'notify:{__verify_time.date()}:{cluster.id}'
+            if not await leases.acquire(lease, cluster.owner, NOTIFY_LEASE):
+                log.info('notify %s already sent by another process', lease)
+                return
+            async with profiler.profile('task.notifys', 'notifys'):
+                with prioritized(BULK):
+                    await self.send_notify()
 
     @notifys.before_loop
     async def before_daily_send(self) -> None:
         await self.bot.wait_until_ready()
-        print('Checking new store skins for notifys...')
+        log.info('Checking new store skins for notifys...')
 
     notify = app_commands.Group(name='notify', description='Notify commands')
 
-    @notify.command(name='add', description='Set a notification when a specific skin is available on your store')
+    @notify.command(
+        name='add',
+        description='Set a notification when a specific skin is available on your store',
+        extras={'ephemeral': False},
+    )
     @app_commands.describe(skin='The name of the skin you want to notify')
     @app_commands.guild_only()
     # @dynamic_cooldown(cooldown_5s)
     async def notify_add(self, interaction: Interaction, skin: str) -> None:
         await interaction.response.defer()
 
-        await self.db.is_data(interaction.user.id, interaction.locale)  # type: ignore
+        user = await self.db.is_data(interaction.user.id, interaction.locale)  # type: ignore
 
         # language
 
@@ -144,11 +287,8 @@ class Notify(commands.Cog):
         # # setup emoji
         # await setup_emoji(self.bot, interaction.guild, interaction.locale)
 
-        # check file whether
-        create_json('notifys', [])  # type: ignore
-
         # get cache
-        skin_data = self.db.read_cache()
+        skin_data = get_catalog()
 
         # find skin
         skin_list = sum(
@@ -157,8 +297,6 @@ class Notify(commands.Cog):
         skin_name = get_close_matches(skin, skin_list, 1)  # get skin close match
 
         if skin_name:
-            notify_data = JSON.read('notifys')
-
             find_skin = [x for x in skin_data['skins'] if skin_name[0] in skin_data['skins'][x]['names'].values()]
             skin_uuid = find_skin[0]
             skin_source = skin_data['skins'][skin_uuid]
@@ -169,27 +307,14 @@ class Notify(commands.Cog):
 
             emoji = GetEmoji.tier_by_bot(skin_uuid, self.bot)
 
-            for skin in notify_data:
-                if skin['id'] == str(interaction.user.id) and skin['uuid'] == skin_uuid:  # type: ignore
-                    skin_already = response.get('SKIN_ALREADY_IN_LIST')
-                    raise ValorantBotError(skin_already.format(emoji=emoji, skin=name))  # type: ignore
-
-            payload = {'id': str(interaction.user.id), 'uuid': skin_uuid}
+            if not notifys.add(interaction.user.id, skin_uuid):
+                skin_already = response.get('SKIN_ALREADY_IN_LIST')
+                raise ValorantBotError(skin_already.format(emoji=emoji, skin=name))  # type: ignore
 
-            try:
-                notify_data.append(payload)  # type: ignore
-                JSON.save('notifys', notify_data)
-            except AttributeError:
-                notify_data = [payload]
-                JSON.save('notifys', notify_data)  # type: ignore
-
-            # check if user is notify is on
-            userdata = JSON.read('users')
-            notify_mode = userdata.get('notify_mode', None)
-            if notify_mode is None:
-                userdata[str(interaction.user.id)]['notify_mode'] = 'Specified'
-                userdata[str(interaction.user.id)]['DM_Message'] = True
-                JSON.save('users', userdata)
+            # turn the notify on for users who never set it up
+            if user['notify_mode'] is None:  # type: ignore
+                self.db.change_notify_mode(interaction.user.id, 'Specified Skin')
+                self.db.change_notify_channel(interaction.user.id, 'DM Message')
 
             success = response.get('SUCCESS')
             embed = Embed(success.format(emoji=emoji, skin=name))  # type: ignore
@@ -261,6 +386,28 @@ class Notify(commands.Cog):
 
         await interaction.followup.send(embed=embed, ephemeral=True)
 
+    @notify.command(name='digest', description="Post this channel's notifications as one shared digest")
+    @app_commands.describe(enabled='Collect the notifications of this channel into a few shared messages')
+    @app_commands.guild_only()
+    @app_commands.checks.has_permissions(manage_channels=True)
+    async def notify_digest(self, interaction: Interaction, enabled: bool) -> None:
+        await interaction.response.defer(ephemeral=True)
+
+        # language
+        response = ResponseLanguage('notify_digest', interaction.locale)  # type: ignore
+
+        channels = JSON.read('notify_digest')
+        if enabled:
+            channels[str(interaction.channel_id)] = interaction.guild_id
+        else:
+            channels.pop(str(interaction.channel_id), None)
+        JSON.save('notify_digest', channels)
+
+        message = response.get('ENABLED' if enabled else 'DISABLED')
+        embed = discord.Embed(description=message.format(channel=interaction.channel.mention), color=0x77DD77)  # type: ignore
+
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
     @notify.command(name='test', description='Testing notification')
     # @dynamic_cooldown(cooldown_5s)
     async def notify_test(self, interaction: Interaction) -> None:
@@ -272,15 +419,14 @@ class Notify(commands.Cog):
         response_add = ResponseLanguage('notify_add', interaction.locale)  # type: ignore
 
         # notify list
-        notify_data = JSON.read('notifys')
+        user_skin_list = notifys.by_user(interaction.user.id)
 
         # get user data and offer
         endpoint, data = await self.get_endpoint_and_data(int(interaction.user.id))
-        offer = endpoint.store_fetch_storefront()
+        offer = await asyncio.to_thread(endpoint.store_fetch_storefront)
 
         # offer data
         duration = offer['SkinsPanelLayout']['SingleItemOffersRemainingDurationInSeconds']
-        user_skin_list = [skin for skin in notify_data if skin['id'] == str(interaction.user.id)]  # type: ignore
 
         if len(user_skin_list) == 0:
             empty_list = response_test.get('EMPTY_LIST')
@@ -321,7 +467,7 @@ class Notify(commands.Cog):
         except HTTPException as e:
             raise ValorantBotError(response_test.get('FAILED_SEND_NOTIFY')) from e
         except Exception as e:
-            print(e)
+            log.exception('notify test failed')
             raise ValorantBotError(f"{response_test.get('FAILED_SEND_NOTIFY')} - {e}") from e
         else:
             await interaction.followup.send(
@@ -1,33 +1,43 @@
 from __future__ import annotations
 
 import contextlib
-from typing import TYPE_CHECKING, Literal, Tuple
+import logging
+from typing import TYPE_CHECKING, Any, Literal
 
 import discord
 from discord import Interaction, app_commands, ui, User
 from discord.ext import commands, tasks
 from discord.utils import MISSING
 
+from utils import metrics
+from utils.admission import admission
 from utils.checks import owner_only
+from utils.cluster import CACHE_BUILD_LEASE, cluster
 from utils.errors import ValorantBotError
 from utils.locale_v2 import ValorantTranslator
+from utils.members import MemberOps
+from utils.profiling import profiler
+from utils.watchdog import watchdog
 from utils.valorant import cache as Cache, useful, view as View
+from utils.valorant import storage
+from utils.valorant.catalog import cache_info, get_catalog
 from utils.valorant.db import DATABASE
 from utils.valorant.embed import Embed, GetEmbed
 from utils.valorant.endpoint import API_ENDPOINT
 from utils.valorant.local import ResponseLanguage
+from utils.valorant.names import resolver
 from utils.valorant.resources import setup_emoji
 from utils.valorant.party import CustomParty
+from utils.valorant.transport import BULK, prioritized
 from utils.valorant.view import LoginView, TwoFA_Button_UI
 import json, random
-import pymysql
 from dotenv import load_dotenv
-import os
-import string
 import asyncio
 
 VLR_locale = ValorantTranslator()
 
+log = logging.getLogger(__name__)
+
 if TYPE_CHECKING:
     from bot import ValorantBot
 
@@ -42,7 +52,6 @@ class ValorantCog(commands.Cog, name='Valorant'):
 
     def __init__(self, bot: ValorantBot) -> None:
         self.bot: ValorantBot = bot
-        self.endpoint: API_ENDPOINT = MISSING
         self.db: DATABASE = MISSING
         self.reload_cache.start()
         self.party = {}
@@ -71,21 +80,35 @@ class ValorantCog(commands.Cog, name='Valorant'):
         self.reload_cache.cancel()
 
     def funtion_reload_cache(self, force: bool = False) -> None:
-        """Reload the cache"""
+        """Reload the cache, skipped while another process rebuilds it"""
         with contextlib.suppress(Exception):
-            cache = self.db.read_cache()
+            # the version is kept in cache_meta, the cache itself is only parsed to rebuild it
+            info = cache_info() or {}
             valorant_version = Cache.get_valorant_version()
-            if valorant_version != cache['valorant_version'] or force:
-                Cache.get_cache()
-                cache = self.db.read_cache()
-                cache['valorant_version'] = valorant_version
-                self.db.insert_cache(cache)
-                print('Updated cache')
+            if valorant_version != info.get('valorant_version') or force:
+                if not storage.storage.acquire('cache_build', cluster.owner, CACHE_BUILD_LEASE):
+                    return
+                try:
+                    # another process may have rebuilt it since this one read it
+                    useful.JSON.invalidate('cache')
+                    info = cache_info() or {}
+                    if valorant_version == info.get('valorant_version') and not force:
+                        return
+                    Cache.get_cache()
+                    cache = self.db.read_cache()
+                    cache['valorant_version'] = valorant_version
+                    self.db.insert_cache(cache)
+                    useful.JSON.flush()
+                    log.info('Updated cache')
+                finally:
+                    storage.storage.release('cache_build', cluster.owner)
 
     @tasks.loop(minutes=30)
     async def reload_cache(self) -> None:
         """Reload the cache every 30 minutes"""
-        self.funtion_reload_cache()
+        async with profiler.profile('task.reload_cache', 'reload_cache'):
+            with prioritized(BULK):
+                await asyncio.to_thread(self.funtion_reload_cache)
 
     @reload_cache.before_loop
     async def before_reload_cache(self) -> None:
@@ -96,7 +119,6 @@ class ValorantCog(commands.Cog, name='Valorant'):
     async def on_ready(self) -> None:
         """When the bot is ready"""
         self.db = DATABASE()
-        self.endpoint = API_ENDPOINT()
 
     async def get_endpoint(
         self,
@@ -115,8 +137,9 @@ class ValorantCog(commands.Cog, name='Valorant'):
         else:
             data = await self.db.is_data(user_id, locale_code)  # type: ignore
         data['locale_code'] = locale_code  # type: ignore
-        endpoint = self.endpoint
-        endpoint.activate(data)  # type: ignore
+        # one endpoint per command, concurrent commands must not share the activated user
+        endpoint = API_ENDPOINT()
+        await asyncio.to_thread(endpoint.activate, data)  # type: ignore
         return endpoint
 
     @app_commands.command(name="로그인", description='발로란트에 로그인합니다.')
@@ -133,59 +156,32 @@ class ValorantCog(commands.Cog, name='Valorant'):
         captcha = await auth.hcaptcha(session)
 
         try:
-            host = os.getenv('DB_HOST')
-            user = os.getenv('DB_USER')
-            passw = os.getenv('DB_PASS')
-            db = os.getenv('DB_NAME')
-            if host is None or user is None or passw is None or db is None:
-                raise Exception("DB Connection Error")
-            conn = pymysql.connect(host=host, user=user, password=passw, db=db, charset='utf8')
-            cursor = conn.cursor()
-            def generate_random_string(length: int) -> str:
-                letters = string.ascii_letters
-                return ''.join(random.choice(letters) for _ in range(length))
-
-            random_string = generate_random_string(20)
-            check = cursor.execute("SELECT * FROM captcha WHERE customToken = %s", (random_string))
-            while check:
-                random_string = generate_random_string(20)
-                check = cursor.execute("SELECT * FROM captcha WHERE customToken = %s", (random_string))
-            cursor.execute("INSERT INTO captcha VALUES (%s, %s, %s, %s)", (random_string, '', captcha[0], captcha[1]))
-            conn.commit()
-            count = 0
-            token = ''
-            conn.close()
-            if not interaction.response.is_done():
-                await interaction.response.defer(ephemeral=True)
-            embed = Embed(description=f"[여기를 클릭하여 인증을 완료하세요](https://mayonedev.com/valorant/index.html?token={random_string})", color=0x00ff00)
-            captcha_msg = await interaction.followup.send(embed=embed, ephemeral=True)
-
-            while True:
-                conn = pymysql.connect(host=host, user=user, password=passw, db=db, charset='utf8')
-                cursor = conn.cursor()
-                cursor.execute("SELECT SQL_NO_CACHE token FROM captcha WHERE customToken = %s", (random_string))
-                result = cursor.fetchone()
-                if result[0] != '': # type: ignore
-                    token = result[0] # type: ignore
-                    cursor.execute("DELETE FROM captcha WHERE customToken = %s", (random_string))
-                    conn.commit()
-                    conn.close()
-                    break
-                # 5초마다 확인
-                await asyncio.sleep(5)
-                count += 1
-                # 3분이 지나면 종료
-                if count >= 36:
-                    cursor.execute("DELETE FROM captcha WHERE customToken = %s", (random_string))
-                    conn.commit()
-                    raise ValorantBotError("시간 초과")
-                conn.close()
-        except Exception as e:
-            print(e)
+            custom_token = await storage.captcha.create(captcha[0], captcha[1])
+        except Exception:
+            log.exception('captcha storage failed')
             raise ValorantBotError("DB Connection Error")
-            return
-        
-        
+
+        if not interaction.response.is_done():
+            await interaction.response.defer(ephemeral=True)
+        embed = Embed(description=f"[여기를 클릭하여 인증을 완료하세요](https://mayonedev.com/valorant/index.html?token={custom_token})", color=0x00ff00)
+        captcha_msg = await interaction.followup.send(embed=embed, ephemeral=True)
+
+        token = ''
+        try:
+            # 5초마다 확인, 3분이 지나면 종료, 기다리는 동안 admission 슬롯은 반납
+            async with admission.suspend():
+                for _ in range(36):
+                    token = await storage.captcha.solved(custom_token)
+                    if token != '':
+                        break
+                    await asyncio.sleep(5)
+        except Exception:
+            log.exception('captcha storage failed')
+            raise ValorantBotError("DB Connection Error")
+        finally:
+            with contextlib.suppress(Exception):
+                await storage.captcha.delete(custom_token)
+
         if token == '':
             raise ValorantBotError("시간 초과")
 
@@ -248,18 +244,16 @@ class ValorantCog(commands.Cog, name='Valorant'):
         if not interaction.guild:
             raise ValorantBotError('This command can only be used in a server')
 
-        # setup emoji
-        await setup_emoji(self.bot, interaction.guild, interaction.locale)  # type: ignore
-
-        # get endpoint
-        endpoint = await self.get_endpoint(interaction.user.id, interaction.locale)  # type: ignore
+        # setup emoji and get endpoint
+        _, endpoint = await asyncio.gather(
+            setup_emoji(self.bot, interaction.guild, interaction.locale),  # type: ignore
+            self.get_endpoint(interaction.user.id, interaction.locale),  # type: ignore
+        )
 
-        # fetch skin price
-        skin_price = endpoint.store_fetch_offers()
+        # fetch skin price and data
+        skin_price, data = await endpoint.gather(endpoint.store_fetch_offers, endpoint.store_fetch_storefront)
         self.db.insert_skin_price(skin_price)
 
-        # data
-        data = endpoint.store_fetch_storefront()
         embeds = GetEmbed.store(endpoint.player, data, response, self.bot)
         await interaction.followup.send(embeds=embeds, view=View.share_button(interaction, embeds), ephemeral=True)
 
@@ -285,7 +279,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
         endpoint = await self.get_endpoint(interaction.user.id, locale_code=interaction.locale.value)
 
         # data
-        data = endpoint.store_fetch_wallet()
+        data = await asyncio.to_thread(endpoint.store_fetch_wallet)
         embed = GetEmbed.point(endpoint.player, data, response, self.bot)
 
         await interaction.followup.send(embed=embed, view=View.share_button(interaction, [embed]))
@@ -300,18 +294,20 @@ class ValorantCog(commands.Cog, name='Valorant'):
         try:
             existing_role = discord.utils.get(interaction.guild.roles, name="VAL_1") # type: ignore
             existing_role2 = discord.utils.get(interaction.guild.roles, name="VAL_2") # type: ignore
+            # 모든 파티원을 제거, 두 역할을 가진 멤버도 한 번에
+            ops = MemberOps(reason='custom party reset')
             if existing_role:
-                # 모든 파티원을 제거
                 for member in existing_role.members:
-                    await member.remove_roles(existing_role)
+                    ops.remove_roles(member, existing_role)
             else:
                 await interaction.guild.create_role(name="VAL_1") # type: ignore
             if existing_role2:
-                # 모든 파티원을 제거
                 for member in existing_role2.members:
-                    await member.remove_roles(existing_role2)
+                    ops.remove_roles(member, existing_role2)
             else:
                 await interaction.guild.create_role(name="VAL_2") # type: ignore
+            if not (await ops.run()).ok:
+                raise ValorantBotError('역할 관리 권한이 없는 거 같아요.. \n역할 관리 권한을 부여해주세요! :sob:')
         except Exception as e:
             raise ValorantBotError('역할 관리 권한이 없는 거 같아요.. \n역할 관리 권한을 부여해주세요! :sob:')
             return
@@ -322,8 +318,8 @@ class ValorantCog(commands.Cog, name='Valorant'):
         try:
             self.party[interaction.channel] = CustomParty(self, interaction, self.bot)
             await self.party[interaction.channel].initialize()
-        except Exception as e:
-            print(e)
+        except Exception:
+            log.exception('party create failed')
             raise ValorantBotError('테스트중인 커맨드입니다. 빠르게 사용할 수 있게 만들게요! :yum:')
 
     @party_group.command(name="참여", description='내전에 참여합니다.')
@@ -405,7 +401,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
         await self.party[interaction.channel].re_change(interaction)
 
     
-    @party_group.command(name="발로란트", description='발로란트 내전을 생성합니다.')
+    @party_group.command(name="발로란트", description='발로란트 내전을 생성합니다.', extras={'ephemeral': False})
     @app_commands.guild_only()
     async def party_room_create(self, interaction: Interaction[ValorantBot]) -> None:
         if not interaction.response.is_done():
@@ -425,46 +421,47 @@ class ValorantCog(commands.Cog, name='Valorant'):
         endpoint = await self.get_endpoint(interaction.user.id, interaction.locale)  # type: ignore
 
         try:
-            partyid = endpoint.fetch_party_id()
+            partyid = await asyncio.to_thread(endpoint.fetch_party_id)
             if not partyid:
                 raise ValorantBotError(f'{interaction.user.mention}님이 `발로란트`에 로그인되어 있지 않습니다.')
                 return
         except Exception as e:
-            print(e)
+            log.warning('fetch party id failed: %r', e)
             raise ValorantBotError(f'발로란트 내전 생성에 실패했습니다.\n{e}')
             return
-        players, team1, team2 = await self.party[interaction.channel].invite_room(interaction, endpoint.player) # list[puuid]
+        players, team1, team2 = await self.party[interaction.channel].invite_room(interaction, endpoint) # list[puuid]
 
-        try:
-            endpoint.set_party_accessibility(partyid)
-        except Exception as e:
-            print(e)
-            raise ValorantBotError(f'공개 파티 전환에 실패했습니다.\n{e}')
-            return
+        accessibility, code, data = await asyncio.gather(
+            asyncio.to_thread(endpoint.set_party_accessibility, partyid),
+            asyncio.to_thread(endpoint.generate_party_code, partyid),
+            asyncio.to_thread(endpoint.fetch_custom_game_map),
+            return_exceptions=True,
+        )
 
-        try:
-            code = endpoint.generate_party_code(partyid)
-            if code:
-                await interaction.followup.send(f'파티 코드: {code}')
-        except Exception as e:
-            print(e)
-            raise ValorantBotError(f'파티 코드 생성에 실패했습니다.\n{e}')
-            return
-        
-        try:
-            data = endpoint.fetch_custom_game_map()
+        if isinstance(accessibility, Exception):
+            log.warning('party accessibility failed: %r', accessibility)
+            raise ValorantBotError(f'공개 파티 전환에 실패했습니다.\n{accessibility}')
 
+        if isinstance(code, Exception):
+            log.warning('party code failed: %r', code)
+            raise ValorantBotError(f'파티 코드 생성에 실패했습니다.\n{code}')
+        if code:
+            await interaction.followup.send(f'파티 코드: {code}')
+
+        try:
+            if isinstance(data, Exception):
+                raise data
             map = random.choice(data) # type: ignore
         except Exception as e:
             map = None
-            print(e)
+            log.warning('custom game maps failed: %r', e)
             raise ValorantBotError(f'맵 추천에 실패했습니다.\n{e}')
 
         try:
             await endpoint.set_change_queue(partyid, endpoint.headers, map['url'])
             await interaction.followup.send(f'맵: {map["name"]}')
         except Exception as e:
-            print(e)
+            log.warning('change queue failed: %r', e)
             raise ValorantBotError(f'커스텀게임 생성에 실패했습니다.\n{e}')
             return
         
@@ -472,21 +469,21 @@ class ValorantCog(commands.Cog, name='Valorant'):
         try:
             await endpoint.join_party_code(interaction, players, code)
         except Exception as e:
-            print(e)
+            log.warning('join party code failed: %r', e)
             raise ValorantBotError(f'팀원이 내전에 참가하지 못했습니다.\n{e}')
             return
         
 
         try:
-            endpoint.change_custom_game_team(partyid, team1, team2 ,endpoint.headers)
+            await endpoint.change_custom_game_team(partyid, team1, team2 ,endpoint.headers)
         except Exception as e:
-            print(e)
+            log.warning('change custom game team failed: %r', e)
             raise ValorantBotError(f'팀 변경에 실패했습니다.\n{e}')
             return
         
 
 
-    @party_group.command(name="맵", description='내전 맵을 추천합니다.')
+    @party_group.command(name="맵", description='내전 맵을 추천합니다.', extras={'ephemeral': False})
     @app_commands.guild_only()
     async def party_map_recommend(self, interaction: Interaction[ValorantBot]) -> None:
         if not interaction.response.is_done():
@@ -494,7 +491,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
 
         endpoint = await self.get_endpoint(interaction.user.id, interaction.locale) # type: ignore
         
-        data = endpoint.fetch_custom_game_map()
+        data = await asyncio.to_thread(endpoint.fetch_custom_game_map)
 
         result = random.choice(data) # type: ignore
         
@@ -526,45 +523,43 @@ class ValorantCog(commands.Cog, name='Valorant'):
     #     await endpoint.set_change_queue(partyid, endpoint.headers)
     
 
-    async def get_player_info(self, interaction: Interaction[ValorantBot]) -> Tuple[str, str]:
-        endpoint = await self.get_endpoint(interaction.user.id, interaction.locale)  # type: ignore
-        return endpoint.player, endpoint.puuid
-    
-    async def get_player_headers(self, interaction: Interaction[ValorantBot]) -> dict[str, str]:
-        endpoint = await self.get_endpoint(interaction.user.id, interaction.locale)  # type: ignore
-        return endpoint.headers
-
-
-    async def get_tier_rank(self, interaction: Interaction[ValorantBot]) -> int:
-        
-        # check if user is logged in
-
-        # response = ResponseLanguage(interaction.command.name, interaction.locale)  # type: ignore
+    async def get_party_player(self, interaction: Interaction[ValorantBot]) -> dict[str, Any] | None:
+        """Resolve the user once and fetch everything a party join needs"""
 
         if not interaction.guild:
             raise ValorantBotError('This command can only be used in a server')
 
-        # setup emoji
-        await setup_emoji(self.bot, interaction.guild, interaction.locale)  # type: ignore
-
-        # get endpoint
-        if await self.db.is_login(interaction.user.id, interaction.locale, True): # type: ignore
-            endpoint = await self.get_endpoint(interaction.user.id, interaction.locale)  # type: ignore
-        else:
-            # await interaction.followup.send(embed=Embed(str(e)), ephemeral=True)
+        # check if user is logged in
+        if not await self.db.is_login(interaction.user.id, interaction.locale, True):  # type: ignore
             view = LoginView(self)
             msg = await interaction.followup.send(content="`비로그인시 자동 입장기능 비활성화.`", view=view, ephemeral=True)
             view.init(msg)
-            return -1
-
-        # data
-        try:
-            data = endpoint.get_player_tier_rank() # dict[str, Any]
-        except:
-            data = 0
-
-        return int(data)
-
+            return None
+
+        # setup emoji and get endpoint
+        _, endpoint = await asyncio.gather(
+            setup_emoji(self.bot, interaction.guild, interaction.locale),  # type: ignore
+            self.get_endpoint(interaction.user.id, interaction.locale),  # type: ignore
+        )
+
+        # rank and the current riot id, names share the name-service batch with the other players joining
+        ranked, name = await asyncio.gather(
+            endpoint.gather(endpoint.get_player_tier_rank),
+            resolver.resolve(endpoint, endpoint.puuid),
+            return_exceptions=True,
+        )
+        rank = 0 if isinstance(ranked, BaseException) else ranked[0]
+        player = endpoint.player
+        if name is not None and not isinstance(name, BaseException):
+            player = f'{name["name"]}#{name["tag"]}'
+
+        return {
+            'rank': int(rank),
+            'player': player,
+            'puuid': endpoint.puuid,
+            'headers': endpoint.headers,
+            'endpoint': endpoint,
+        }
 
     @app_commands.command(name='미션', description='일일/주간미션을 확인합니다.')
     # @dynamic_cooldown(cooldown_5s)
@@ -581,7 +576,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
         endpoint = await self.get_endpoint(interaction.user.id, interaction.locale)  # type: ignore
 
         # data
-        data = endpoint.fetch_contracts()
+        data = await asyncio.to_thread(endpoint.fetch_contracts)
         embed = GetEmbed.mission(endpoint.player, data, response)
 
         await interaction.followup.send(embed=embed, view=View.share_button(interaction, [embed]))
@@ -598,22 +593,20 @@ class ValorantCog(commands.Cog, name='Valorant'):
         if not interaction.guild:
             raise ValorantBotError('This command can only be used in a server')
 
-        # setup emoji
-        await setup_emoji(self.bot, interaction.guild, interaction.locale)  # type: ignore
-
         # language
         command_name = '야시장'
         response = ResponseLanguage(command_name, interaction.locale)  # type: ignore
 
-        # endpoint
-        endpoint = await self.get_endpoint(interaction.user.id, interaction.locale)  # type: ignore
+        # setup emoji and endpoint
+        _, endpoint = await asyncio.gather(
+            setup_emoji(self.bot, interaction.guild, interaction.locale),  # type: ignore
+            self.get_endpoint(interaction.user.id, interaction.locale),  # type: ignore
+        )
 
-        # fetch skin price
-        skin_price = endpoint.store_fetch_offers()
+        # fetch skin price and data
+        skin_price, data = await endpoint.gather(endpoint.store_fetch_offers, endpoint.store_fetch_storefront)
         self.db.insert_skin_price(skin_price)
 
-        # data
-        data = endpoint.store_fetch_storefront()
         embeds = GetEmbed.nightmarket(endpoint.player, data, self.bot, response)
 
         await interaction.followup.send(embeds=embeds, view=View.share_button(interaction, embeds))  # type: ignore
@@ -633,8 +626,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
         endpoint = await self.get_endpoint(interaction.user.id, interaction.locale)  # type: ignore
 
         # data
-        data = endpoint.fetch_contracts()
-        content = endpoint.fetch_content()
+        data, content = await endpoint.gather(endpoint.fetch_contracts, endpoint.fetch_content)
         season = useful.get_season_by_content(content)
 
         embed = GetEmbed.battlepass(endpoint.player, data, season, response)
@@ -642,7 +634,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
         await interaction.followup.send(embed=embed, view=View.share_button(interaction, [embed]))
 
     # inspired by https://github.com/giorgi-o
-    @app_commands.command(name='번들', description='특정 번들을 확인합니다.')
+    @app_commands.command(name='번들', description='특정 번들을 확인합니다.', extras={'ephemeral': False})
     @app_commands.describe(bundle='번들 이름을 입력하세요.')
     @app_commands.guild_only()
     # @dynamic_cooldown(cooldown_5s)
@@ -660,7 +652,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
         await setup_emoji(self.bot, interaction.guild, interaction.locale.value)
 
         # cache
-        cache = self.db.read_cache()
+        cache = get_catalog()
 
         # default language language
         default_language = 'en-US'
@@ -683,7 +675,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
         await view.start()
 
     # inspired by https://github.com/giorgi-o
-    @app_commands.command(name='번들상점', description='상점에 존재하는 번들을 확인합니다.')
+    @app_commands.command(name='번들상점', description='상점에 존재하는 번들을 확인합니다.', extras={'ephemeral': False})
     @app_commands.guild_only()
     # @dynamic_cooldown(cooldown_5s)
     async def bundles(self, interaction: Interaction[ValorantBot]) -> None:
@@ -703,7 +695,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
         endpoint = await self.get_endpoint(interaction.user.id, interaction.locale.value)
 
         # data
-        bundle_entries = endpoint.store_fetch_storefront()
+        bundle_entries = await asyncio.to_thread(endpoint.store_fetch_storefront)
 
         # bundle view
         view = View.BaseBundle(interaction, bundle_entries, response)
@@ -754,13 +746,19 @@ class ValorantCog(commands.Cog, name='Valorant'):
     # ---------- DEBUGs ---------- #
 
     @app_commands.command(description='The command debug for the bot')
-    @app_commands.describe(bug='The bug you want to fix')
+    @app_commands.describe(
+        bug='The bug you want to fix', target='Commands or tasks to profile, comma separated, all when empty'
+    )
     @app_commands.guild_only()
     @owner_only()
     async def debug(
         self,
         interaction: Interaction[ValorantBot],
-        bug: Literal['Skin price not loading', 'Emoji not loading', 'Cache not loading'],
+        bug: Literal[
+            'Skin price not loading', 'Emoji not loading', 'Cache not loading', 'Metrics',
+            'Start profiling', 'Stop profiling', 'Profiles', 'Event loop',
+        ],
+        target: str | None = None,
     ) -> None:
         if not interaction.response.is_done():
             await interaction.response.defer(ephemeral=True)
@@ -773,7 +771,7 @@ class ValorantCog(commands.Cog, name='Valorant'):
             endpoint = await self.get_endpoint(interaction.user.id, interaction.locale.value)
 
             # fetch skin price
-            skin_price = endpoint.store_fetch_offers()
+            skin_price = await asyncio.to_thread(endpoint.store_fetch_offers)
             self.db.insert_skin_price(skin_price, force=True)
 
         elif bug == 'Emoji not loading':
@@ -783,12 +781,89 @@ class ValorantCog(commands.Cog, name='Valorant'):
             await setup_emoji(self.bot, interaction.guild, interaction.locale.value, force=True)
 
         elif bug == 'Cache not loading':
-            self.funtion_reload_cache(force=True)
+            await asyncio.to_thread(self.funtion_reload_cache, True)
+
+        elif bug == 'Metrics':
+            await interaction.followup.send(embed=self.metrics_embed())
+            return
+
+        elif bug == 'Start profiling':
+            profiler.start({name.strip() for name in target.split(',')} if target else None)
+
+        elif bug == 'Stop profiling':
+            profiler.stop()
+
+        elif bug == 'Profiles':
+            await interaction.followup.send(embed=self.profiles_embed())
+            return
+
+        elif bug == 'Event loop':
+            await interaction.followup.send(embed=self.loop_embed())
+            return
 
         success: str = response.get('SUCCESS', 'success')
         await interaction.followup.send(embed=Embed(success.format(bug=bug)))
 
 
+    @staticmethod
+    def metrics_embed() -> discord.Embed:
+        """Slowest commands, Riot calls and cache operations by p95"""
+
+        embed = Embed(title='Metrics')
+        lines = []
+        for name, labels, count, average, p95, maximum in metrics.registry.slowest(15):
+            label = ' '.join(value for _, value in labels)
+            lines.append(f'`{name}` **{label}** n={count} avg={average:.2f}s p95={p95:.2f}s max={maximum:.2f}s')
+        embed.description = '\n'.join(lines) or 'No data yet'
+
+        statuses = [
+            f'{dict(labels)["host"]} {dict(labels)["status"]}: {int(count)}'
+            for labels, count in sorted(metrics.http_responses.values.items())
+        ]
+        if statuses:
+            embed.add_field(name='HTTP', value='\n'.join(statuses)[:1024], inline=False)
+        return embed
+
+    @staticmethod
+    def profiles_embed() -> discord.Embed:
+        """Top functions of the latest profile, own time first"""
+
+        status = profiler.status()
+        targets = status['targets'] if isinstance(status['targets'], str) else ', '.join(status['targets'])
+        embed = Embed(title=f'Profiling {"on" if status["enabled"] else "off"} ({targets})')
+        if not profiler.captures:
+            embed.description = 'No profiles yet'
+            return embed
+
+        latest = profiler.captures[0]
+        lines = [f'**{latest.name}** {latest.seconds:.2f}s `{latest.path}`']
+        for row in latest.rows:
+            lines.append(f'`{row.function[-60:]}` n={row.calls} own={row.own:.3f}s cum={row.cumulative:.3f}s')
+        embed.description = '\n'.join(lines)[:4000]
+
+        recent = [f'{capture.name} {capture.seconds:.2f}s' for capture in list(profiler.captures)[1:]]
+        if recent:
+            embed.add_field(name='Earlier', value='\n'.join(recent)[:1024], inline=False)
+        return embed
+
+    @staticmethod
+    def loop_embed() -> discord.Embed:
+        """Code that blocked the event loop, by total blocked time"""
+
+        embed = Embed(title=f'Event loop stalls over {watchdog.threshold:.2f}s')
+        top = watchdog.top(10)
+        if not top:
+            embed.description = 'No stalls recorded'
+            return embed
+
+        embed.description = '\n'.join(
+            f'`{site.callsite[-70:]}` n={site.count} total={site.total:.2f}s max={site.max:.2f}s' for site in top
+        )[:4000]
+        stack = '\n'.join(top[0].stack[-8:])
+        embed.add_field(name='Worst stack', value=f'```{stack[-1000:]}```', inline=False)
+        return embed
+
+
 async def setup(bot: ValorantBot) -> None:
     await bot.add_cog(ValorantCog(bot))
     
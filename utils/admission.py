@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+from typing import TYPE_CHECKING
+
+import discord
+
+from .metrics import registry
+from .valorant.local import LocalErrorResponse
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+log = logging.getLogger(__name__)
+
+# refill per second and burst of the per user and per guild buckets, in cost units
+USER_BUCKET = (0.2, 6.0)
+GUILD_BUCKET = (2.0, 40.0)
+
+# cost of a command by qualified name, roughly its Riot calls plus file rewrites, others cost 1
+COMMAND_COSTS = {
+    '상점': 2,
+    '포인트': 2,
+    '미션': 2,
+    '야시장': 2,
+    '배틀패스': 3,
+    '번들': 2,
+    '번들상점': 3,
+    '로그인': 3,
+    '쿠키': 3,
+    '파티 발로란트': 6,
+    '파티 맵': 2,
+    'notify add': 2,
+    'notify test': 4,
+}
+
+# commands running at once across the bot, later ones wait up to QUEUE_TIMEOUT and are then turned away
+MAX_CONCURRENT = 16
+MAX_WAITING = 64
+QUEUE_TIMEOUT = 1.0
+
+# idle buckets are dropped once this many are tracked
+MAX_BUCKETS = 10_000
+
+rejected = registry.counter('admission_rejected_total', 'Commands turned away by admission control')
+running = registry.gauge('admission_running', 'Commands holding an admission slot')
+
+# whether the running command holds a slot, cleared while it waits on the user in suspend()
+_holding: contextvars.ContextVar[bool] = contextvars.ContextVar('admission_holding', default=False)
+
+
+class Bucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float) -> float:
+        """Spend cost tokens, returns 0 on success or the seconds until they would be available"""
+        self._refill(time.monotonic())
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (min(cost, self.capacity) - self.tokens) / self.rate
+
+    def refund(self, cost: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + cost)
+
+    def idle(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class Buckets:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: dict[int, Bucket] = {}
+
+    def get(self, key: int) -> Bucket:
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            if len(self.buckets) >= MAX_BUCKETS:
+                self.prune()
+            bucket = self.buckets[key] = Bucket(self.rate, self.capacity)
+        return bucket
+
+    def prune(self) -> None:
+        now = time.monotonic()
+        for key in [key for key, bucket in self.buckets.items() if bucket.idle(now)]:
+            del self.buckets[key]
+
+
+class Admission:
+    """Rate limits per user and guild by command cost plus a global cap on commands in flight
+
+    Everything runs on the event loop, so the buckets need no locking.
+    """
+
+    def __init__(self) -> None:
+        self.users = Buckets(*USER_BUCKET)
+        self.guilds = Buckets(*GUILD_BUCKET)
+        self.slots = asyncio.Semaphore(MAX_CONCURRENT)
+        self.waiting = 0
+
+    @staticmethod
+    def cost(interaction: discord.Interaction) -> int:
+        command = interaction.command
+        return COMMAND_COSTS.get(command.qualified_name, 1) if command is not None else 1
+
+    def limit(self, interaction: discord.Interaction, cost: int) -> float:
+        """Charge the user and guild buckets, returns 0 or the seconds the caller should wait"""
+
+        user = self.users.get(interaction.user.id)
+        wait = user.take(cost)
+        if wait or interaction.guild_id is None:
+            return wait
+
+        wait = self.guilds.get(interaction.guild_id).take(cost)
+        if wait:
+            user.refund(cost)
+        return wait
+
+    async def _slot(self) -> bool:
+        if self.waiting >= MAX_WAITING:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), QUEUE_TIMEOUT)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    @contextlib.asynccontextmanager
+    async def admit(self, interaction: discord.Interaction) -> AsyncIterator[bool]:
+        """Yield whether the command may run, turned away interactions already got the busy reply"""
+
+        if interaction.type is not discord.InteractionType.application_command or await interaction.client.is_owner(
+            interaction.user
+        ):
+            yield True
+            return
+
+        wait = self.limit(interaction, self.cost(interaction))
+        if wait:
+            rejected.inc(reason='rate_limit')
+            await self._reject(interaction, 'RATE_LIMITED', seconds=max(1, round(wait)))
+            yield False
+            return
+
+        if not await self._slot():
+            rejected.inc(reason='busy')
+            await self._reject(interaction, 'BUSY')
+            yield False
+            return
+
+        running.inc()
+        token = _holding.set(True)
+        try:
+            yield True
+        finally:
+            if _holding.get():
+                running.dec()
+                self.slots.release()
+            _holding.reset(token)
+
+    @contextlib.asynccontextmanager
+    async def suspend(self) -> AsyncIterator[None]:
+        """Give the slot back while the command waits on the user, e.g. a captcha, and take one again after
+
+        The buckets were charged on admission and are not charged again, only the wait for a slot repeats.
+        """
+
+        if not _holding.get():
+            yield
+            return
+
+        _holding.set(False)
+        running.dec()
+        self.slots.release()
+        try:
+            yield
+        finally:
+            await self.slots.acquire()
+            running.inc()
+            _holding.set(True)
+
+    @staticmethod
+    async def _reject(interaction: discord.Interaction, key: str, **kwargs: int) -> None:
+        response = LocalErrorResponse('ADMISSION', interaction.locale)  # type: ignore
+        message = response.get(key, 'The bot is busy right now, please try again in a moment.').format(**kwargs)
+        log.info('turned away %s: %s', interaction.command.qualified_name if interaction.command else 'interaction', key)
+        with contextlib.suppress(discord.HTTPException):
+            await interaction.response.send_message(message, ephemeral=True)
+
+
+admission = Admission()
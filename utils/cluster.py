@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+import os
+import socket
+from typing import Any
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# seconds a process may hold the cache build lease before another one takes over
+CACHE_BUILD_LEASE = 600
+
+# the daily notify lease outlives the run so a restarted or duplicate process does not send it again
+NOTIFY_LEASE = 20 * 60 * 60
+
+
+class Cluster:
+    """Which shards and which part of the background work this process owns
+
+    SHARDED=1 runs the bot as an AutoShardedBot. With CLUSTER_COUNT > 1 every process is started with its own
+    CLUSTER_ID and takes shards cluster_id, cluster_id + CLUSTER_COUNT, ... of SHARD_COUNT. DM notifications
+    are split by user id, channel notifications go to the cluster whose guilds contain the channel.
+    """
+
+    def __init__(self, cluster_id: int = 0, count: int = 1, shard_count: int | None = None, sharded: bool = False) -> None:
+        if count > 1 and not (sharded and shard_count):
+            raise ValueError('CLUSTER_COUNT > 1 needs SHARDED=1 and SHARD_COUNT')
+        if not 0 <= cluster_id < count:
+            raise ValueError(f'CLUSTER_ID must be between 0 and {count - 1}')
+        self.id = cluster_id
+        self.count = count
+        self.shard_count = shard_count
+        self.sharded = sharded
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:cluster{cluster_id}'
+
+    @classmethod
+    def from_env(cls) -> Cluster:
+        shard_count = os.getenv('SHARD_COUNT')
+        return cls(
+            cluster_id=int(os.getenv('CLUSTER_ID') or 0),
+            count=int(os.getenv('CLUSTER_COUNT') or 1),
+            shard_count=int(shard_count) if shard_count else None,
+            sharded=os.getenv('SHARDED', '').lower() in ('1', 'true', 'yes'),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        """More than one process shares the work"""
+        return self.count > 1
+
+    @property
+    def shard_ids(self) -> list[int] | None:
+        if not self.enabled or self.shard_count is None:
+            return None
+        return [shard for shard in range(self.shard_count) if shard % self.count == self.id]
+
+    def bot_options(self) -> dict[str, Any]:
+        """Keyword arguments for AutoShardedBot, empty for a plain Bot"""
+        if not self.sharded:
+            return {}
+        return {'shard_count': self.shard_count, 'shard_ids': self.shard_ids}
+
+    def owns_user(self, user_id: int | str) -> bool:
+        return not self.enabled or (int(user_id) >> 22) % self.count == self.id
+
+
+cluster = Cluster.from_env()
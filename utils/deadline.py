@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+
+import discord
+
+from .errors import DeadlineExceeded
+
+log = logging.getLogger(__name__)
+
+# seconds Discord waits for the first response to an interaction
+INITIAL_RESPONSE = 3.0
+
+# seconds after the interaction that followups and edits are accepted
+FOLLOWUP_WINDOW = 15 * 60
+
+# a command that has not responded after this many seconds is deferred for it
+AUTO_DEFER_AFTER = 2.0
+
+# time kept back to deliver the response once the work is done
+MARGIN = 0.5
+
+
+class Window:
+    """The time an interaction's response can still be delivered in
+
+    Without a fixed window that is INITIAL_RESPONSE until the interaction was answered or deferred, or an
+    auto defer is on its way, and FOLLOWUP_WINDOW after.
+    """
+
+    __slots__ = ('interaction', 'window', 'start', 'deferring')
+
+    def __init__(self, interaction: discord.Interaction, window: float | None = None) -> None:
+        self.interaction = interaction
+        self.window = window
+        self.start = time.monotonic() - _age(interaction)
+        self.deferring = False
+
+    def left(self) -> float:
+        window = self.window
+        if window is None:
+            answered = self.deferring or self.interaction.response.is_done()
+            window = FOLLOWUP_WINDOW if answered else INITIAL_RESPONSE
+        return self.start + window - MARGIN - time.monotonic()
+
+
+deadline: contextvars.ContextVar[Window | None] = contextvars.ContextVar('deadline', default=None)
+
+_pending: set[asyncio.Task[None]] = set()
+
+
+def _age(interaction: discord.Interaction) -> float:
+    return max(0.0, (discord.utils.utcnow() - interaction.created_at).total_seconds())
+
+
+def begin(interaction: discord.Interaction, window: float | None = None) -> float:
+    """Bound the work of the current task by the interaction's window, returns the seconds left"""
+
+    current = Window(interaction, window)
+    deadline.set(current)
+    return current.left()
+
+
+def remaining() -> float | None:
+    """Seconds left for the current interaction, None outside of one"""
+    current = deadline.get()
+    return None if current is None else current.left()
+
+
+def check() -> None:
+    """Abandon the work when nobody can receive its result anymore"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded('The interaction expired before the response was ready.')
+
+
+def clamp(timeout: float | tuple[float, float]) -> float | tuple[float, float]:
+    """Shorten a requests timeout to the time left"""
+
+    left = remaining()
+    if left is None:
+        return timeout
+    left = max(left, 0.001)
+    if isinstance(timeout, tuple):
+        return min(timeout[0], left), min(timeout[1], left)
+    return min(timeout, left)
+
+
+def auto_defer(interaction: discord.Interaction, ephemeral: bool = True) -> asyncio.TimerHandle | None:
+    """Defer the response when the handler has not answered shortly before Discord gives up on it
+
+    Commands answering publicly set extras={'ephemeral': False} on their decorator. An interaction that
+    arrives already older than AUTO_DEFER_AFTER is deferred right away. Until the defer went through or
+    failed the current window counts as answered, so work started now is not cut to INITIAL_RESPONSE.
+    """
+
+    if interaction.type is not discord.InteractionType.application_command:
+        return None
+    if interaction.command is not None:
+        ephemeral = interaction.command.extras.get('ephemeral', ephemeral)
+
+    current = deadline.get()
+    if current is not None and (current.interaction is not interaction or current.window is not None):
+        current = None
+    if current is not None:
+        current.deferring = True
+
+    async def defer() -> None:
+        try:
+            if interaction.response.is_done():
+                return
+            with contextlib.suppress(discord.InteractionResponded):
+                await interaction.response.defer(ephemeral=ephemeral)
+                log.info('auto deferred %s', interaction.command.qualified_name if interaction.command else 'interaction')
+        except discord.HTTPException as e:
+            log.info('auto defer failed: %r', e)
+        finally:
+            # from here on only a response that really went out keeps the followup window
+            if current is not None:
+                current.deferring = False
+
+    def start() -> None:
+        task = loop.create_task(defer())
+        _pending.add(task)
+        task.add_done_callback(_pending.discard)
+
+    loop = asyncio.get_running_loop()
+    return loop.call_later(max(0.0, AUTO_DEFER_AFTER - _age(interaction)), start)
@@ -46,6 +46,14 @@ class AuthenticationError(app_commands.AppCommandError):
     pass
 
 
+class SessionExpired(AuthenticationError):
+    """
+    Raised when Riot rejects the stored cookies or tokens, the user has to log in again.
+    """
+
+    pass
+
+
 class DatabaseError(app_commands.AppCommandError):
     """
     Raised whenever there's a problem while attempting to access the database.
@@ -59,4 +67,12 @@ class PermissionMangeRoleError(app_commands.AppCommandError):
     Raised whenever there's a problem while attempting to manage roles.
     """
 
-    pass
\ No newline at end of file
+    pass
+
+
+class DeadlineExceeded(app_commands.AppCommandError):
+    """
+    Raised when an interaction can no longer be answered, the work for it is abandoned.
+    """
+
+    pass
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from typing import Any
+
+# records waiting for the writer thread, new records are dropped when it is full
+QUEUE_SIZE = 10_000
+
+# per logger and message template: records let through per window, the rest are counted and dropped
+RATE_LIMIT_BURST = 20
+RATE_LIMIT_WINDOW = 60.0
+
+# share of records below WARNING kept per logger and its children, loaded from LOG_SAMPLING
+# e.g. LOG_SAMPLING=utils.valorant.transport=0.1,cogs.notify=0.5
+SAMPLING: dict[str, float] = {}
+
+request_id: contextvars.ContextVar[str | None] = contextvars.ContextVar('request_id', default=None)
+user_id: contextvars.ContextVar[int | None] = contextvars.ContextVar('user_id', default=None)
+guild_id: contextvars.ContextVar[int | None] = contextvars.ContextVar('guild_id', default=None)
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def bind(interaction: Any = None, **ids: Any) -> str:
+    """Set the correlation ids of the current task, every record logged from it carries them"""
+
+    rid = ids.get('request_id') or (str(interaction.id) if interaction is not None else uuid.uuid4().hex[:16])
+    request_id.set(rid)
+    if interaction is not None:
+        user_id.set(interaction.user.id)
+        guild_id.set(interaction.guild_id)
+    if 'user_id' in ids:
+        user_id.set(ids['user_id'])
+    if 'guild_id' in ids:
+        guild_id.set(ids['guild_id'])
+    return rid
+
+
+def parse_sampling(value: str | None) -> dict[str, float]:
+    """Parse logger=rate pairs separated by commas, malformed pairs are skipped"""
+
+    sampling: dict[str, float] = {}
+    for pair in (value or '').split(','):
+        name, sep, rate = pair.partition('=')
+        if not sep or not name.strip():
+            continue
+        try:
+            sampling[name.strip()] = min(max(float(rate), 0.0), 1.0)
+        except ValueError:
+            continue
+    return sampling
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        record.user_id = user_id.get()
+        record.guild_id = guild_id.get()
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Sample the loggers in SAMPLING, then let a burst of each message through per window
+
+    The drop count of a window rides on the next record of the same message.
+    """
+
+    def __init__(self, burst: int = RATE_LIMIT_BURST, window: float = RATE_LIMIT_WINDOW) -> None:
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.rates: dict[str, float | None] = {}
+        self.sample_counters: dict[str, int] = {}
+        self.windows: dict[tuple[str, Any], list[Any]] = {}
+        self.lock = threading.Lock()
+
+    def rate(self, name: str) -> float | None:
+        """Sampling rate of the closest configured logger, None when it is not sampled"""
+        if name not in self.rates:
+            logger = name
+            while logger and logger not in SAMPLING:
+                logger = logger.rpartition('.')[0]
+            self.rates[name] = SAMPLING.get(logger)
+        return self.rates[name]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        rate = self.rate(record.name) if record.levelno < logging.WARNING else None
+        with self.lock:
+            if rate is not None:
+                counter = self.sample_counters[record.name] = self.sample_counters.get(record.name, 0) + 1
+                if rate <= 0 or counter % max(1, round(1 / rate)):
+                    return False
+
+            state = self.windows.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state is not None else 0
+                state = self.windows[key] = [now, 0, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+            state[1] += 1
+            if state[1] <= self.burst:
+                return True
+            state[2] += 1
+            return False
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the writer thread without formatting them on the event loop"""
+
+    def __init__(self, log_queue: queue.Queue[Any]) -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    FIELDS = ('request_id', 'user_id', 'guild_id', 'suppressed')
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: dict[str, Any] = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S') + f'.{int(record.msecs):03d}',
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                payload[field] = value
+        extra = getattr(record, 'data', None)
+        if extra is not None:
+            payload['data'] = extra
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str | None = None) -> None:
+    """Route every logger through a bounded queue to a writer thread, JSON lines on stderr unless LOG_FORMAT=text"""
+
+    global _listener
+    if _listener is not None:
+        return
+
+    SAMPLING.update(parse_sampling(os.getenv('LOG_SAMPLING')))
+
+    stream = logging.StreamHandler(sys.stderr)
+    if os.getenv('LOG_FORMAT') == 'text':
+        stream.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'))
+    else:
+        stream.setFormatter(JSONFormatter())
+
+    log_queue: queue.Queue[Any] = queue.Queue(QUEUE_SIZE)
+    handler = NonBlockingQueueHandler(log_queue)
+    handler.addFilter(ContextFilter())
+    handler.addFilter(RateLimitFilter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level or os.getenv('LOG_LEVEL') or 'INFO')
+
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Drain the queue, called on shutdown"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Any, NamedTuple
+
+import discord
+
+from .metrics import registry
+
+log = logging.getLogger(__name__)
+
+# member edits in flight at once, discord.py still waits out the per-route buckets and 429s
+MAX_CONCURRENT = 10
+
+member_edits = registry.counter('member_edits_total', 'Discord member edits by the bulk executor by result')
+
+
+class Failure(NamedTuple):
+    member: discord.Member
+    error: Exception
+
+
+class Result(NamedTuple):
+    applied: list[discord.Member]
+    failed: list[Failure]
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
+
+
+class _Change:
+    __slots__ = ('member', 'add', 'remove', 'channel')
+
+    def __init__(self, member: discord.Member) -> None:
+        self.member = member
+        self.add: dict[int, discord.Role] = {}
+        self.remove: dict[int, discord.Role] = {}
+        self.channel: discord.abc.Snowflake | None = None
+
+    def plan(self) -> tuple[list[discord.Role], list[discord.Role], discord.abc.Snowflake | None]:
+        """Roles to add, roles to remove and the channel to move to, without what is already so"""
+
+        self.member = self.member.guild.get_member(self.member.id) or self.member
+        current = {role.id for role in self.member.roles}
+        add = [role for role_id, role in self.add.items() if role_id not in current]
+        remove = [role for role_id, role in self.remove.items() if role_id in current]
+
+        channel = None
+        voice = self.member.voice
+        # only connected members can be moved
+        if self.channel is not None and voice is not None and voice.channel is not None:
+            if voice.channel.id != self.channel.id:
+                channel = self.channel
+        return add, remove, channel
+
+    async def apply(self, reason: str | None) -> bool:
+        """Send the change, False when there was nothing to do
+
+        Role-only changes go out as one PUT or DELETE per role, which never touch the member's other roles.
+        The full role list is only sent when a voice move is batched with the roles into a single PATCH.
+        """
+
+        add, remove, channel = self.plan()
+        if channel is not None:
+            kwargs: dict[str, Any] = {'voice_channel': channel}
+            if add or remove:
+                removed = {role.id for role in remove}
+                roles = [role for role in self.member.roles if not role.is_default() and role.id not in removed]
+                kwargs['roles'] = roles + add
+            await self.member.edit(reason=reason, **kwargs)
+            return True
+
+        if add:
+            await self.member.add_roles(*add, reason=reason)
+        if remove:
+            await self.member.remove_roles(*remove, reason=reason)
+        return bool(add or remove)
+
+
+class MemberOps:
+    """Role changes and voice moves for many members, applied concurrently across members
+
+    Changes queued for the same member are merged first: the last add or remove queued for a role wins,
+    and roles the member already has or lacks and moves to the channel they are in are dropped. Current
+    roles are read from the guild cache when the change is sent, so members passed in may be older objects.
+    """
+
+    def __init__(self, reason: str | None = None) -> None:
+        self.reason = reason
+        self.changes: dict[int, _Change] = {}
+
+    def _change(self, member: discord.Member) -> _Change:
+        change = self.changes.get(member.id)
+        if change is None:
+            change = self.changes[member.id] = _Change(member)
+        return change
+
+    def add_roles(self, member: discord.Member, *roles: discord.Role | None) -> MemberOps:
+        change = self._change(member)
+        for role in roles:
+            if role is not None:
+                change.remove.pop(role.id, None)
+                change.add[role.id] = role
+        return self
+
+    def remove_roles(self, member: discord.Member, *roles: discord.Role | None) -> MemberOps:
+        change = self._change(member)
+        for role in roles:
+            if role is not None:
+                change.add.pop(role.id, None)
+                change.remove[role.id] = role
+        return self
+
+    def move(self, member: discord.Member, channel: discord.abc.Snowflake) -> MemberOps:
+        self._change(member).channel = channel
+        return self
+
+    async def run(self) -> Result:
+        """Apply every queued change, failures are collected instead of stopping the others"""
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT)
+        applied: list[discord.Member] = []
+        failed: list[Failure] = []
+
+        async def apply(change: _Change) -> None:
+            async with semaphore:
+                try:
+                    if not await change.apply(self.reason):
+                        return
+                except discord.HTTPException as e:
+                    failed.append(Failure(change.member, e))
+                    member_edits.inc(result='failed')
+                else:
+                    applied.append(change.member)
+                    member_edits.inc(result='applied')
+
+        changes = list(self.changes.values())
+        self.changes.clear()
+        await asyncio.gather(*(apply(change) for change in changes))
+
+        if failed:
+            log.warning(
+                '%d of %d member edits failed',
+                len(failed),
+                len(applied) + len(failed),
+                extra={'data': {'failed': {str(f.member.id): repr(f.error) for f in failed}}},
+            )
+        return Result(applied, failed)
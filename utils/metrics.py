@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import inspect
+import math
+import threading
+import time
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from aiohttp import web
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+
+T = TypeVar('T')
+
+# histogram bucket upper bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, math.inf)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _labels(labels: dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: tuple[tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped, strict=True)) + '}'
+
+
+class Counter:
+    """Monotonic counter per label set"""
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.values: dict[Labels, float] = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _labels(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f'{self.name}{_format_labels(labels)} {value:g}')
+        return lines
+
+
+class Gauge(Counter):
+    """Value that goes up and down per label set"""
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self.lock:
+            self.values[_labels(labels)] = value
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f'# TYPE {self.name} gauge'
+        return lines
+
+
+class _Series:
+    __slots__ = ('buckets', 'count', 'sum', 'max')
+
+    def __init__(self) -> None:
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q quantile"""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.buckets, strict=True):
+            seen += count
+            if seen >= rank:
+                return self.max if math.isinf(bound) else min(bound, self.max)
+        return self.max
+
+
+class Histogram:
+    """Latency histogram per label set"""
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.series: dict[Labels, _Series] = {}
+        self.lock = threading.Lock()
+
+    def observe(self, seconds: float, **labels: Any) -> None:
+        key = _labels(labels)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = _Series()
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series.buckets[i] += 1
+                    break
+            series.count += 1
+            series.sum += seconds
+            series.max = max(series.max, seconds)
+
+    @contextlib.contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            for labels, series in sorted(self.series.items()):
+                total = 0
+                for bound, count in zip(BUCKETS, series.buckets, strict=True):
+                    total += count
+                    le = '+Inf' if math.isinf(bound) else f'{bound:g}'
+                    lines.append(f'{self.name}_bucket{_format_labels(labels, (("le", le),))} {total}')
+                lines.append(f'{self.name}_sum{_format_labels(labels)} {series.sum:g}')
+                lines.append(f'{self.name}_count{_format_labels(labels)} {series.count}')
+        return lines
+
+    def summary(self) -> list[tuple[Labels, int, float, float, float]]:
+        """(labels, count, average, p95, max) for every label set"""
+        with self.lock:
+            return [
+                (labels, s.count, s.sum / s.count, s.quantile(0.95), s.max)
+                for labels, s in self.series.items()
+                if s.count
+            ]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Counter | Gauge | Histogram] = {}
+
+    def counter(self, name: str, description: str) -> Counter:
+        metric = self.metrics.setdefault(name, Counter(name, description))
+        assert isinstance(metric, Counter)
+        return metric
+
+    def gauge(self, name: str, description: str) -> Gauge:
+        metric = self.metrics.setdefault(name, Gauge(name, description))
+        assert isinstance(metric, Gauge)
+        return metric
+
+    def histogram(self, name: str, description: str) -> Histogram:
+        metric = self.metrics.setdefault(name, Histogram(name, description))
+        assert isinstance(metric, Histogram)
+        return metric
+
+    def render(self) -> str:
+        """Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def slowest(self, limit: int = 10) -> list[tuple[str, Labels, int, float, float, float]]:
+        """Label sets with the highest p95 over every histogram"""
+        rows = []
+        for metric in self.metrics.values():
+            if isinstance(metric, Histogram):
+                rows.extend((metric.name, *row) for row in metric.summary())
+        rows.sort(key=lambda row: row[4], reverse=True)
+        return rows[:limit]
+
+
+registry = Registry()
+
+command_seconds = registry.histogram('command_seconds', 'Slash command time from interaction to completion')
+endpoint_seconds = registry.histogram('endpoint_seconds', 'API_ENDPOINT method time')
+auth_seconds = registry.histogram('auth_seconds', 'Riot auth step time')
+cache_seconds = registry.histogram('cache_seconds', 'Asset cache, catalog and storage operation time')
+http_seconds = registry.histogram('http_request_seconds', 'Upstream HTTP request time per attempt')
+http_responses = registry.counter('http_responses_total', 'Upstream HTTP responses by status code')
+http_retries = registry.counter('http_retries_total', 'Upstream HTTP retries by reason')
+http_rate_limited = registry.counter('http_rate_limited_total', 'Upstream HTTP 429 responses')
+http_coalesced = registry.counter('http_coalesced_total', 'Upstream GETs answered by an identical request already in flight')
+http_queue_depth = registry.gauge('http_queue_depth', 'Upstream requests waiting for a rate limit token by priority')
+http_queue_seconds = registry.histogram('http_queue_seconds', 'Time upstream requests waited for a rate limit token')
+failures = registry.counter('failures_total', 'Errors that were caught and logged')
+sessions_quarantined = registry.counter('sessions_quarantined_total', 'Users left out of notify after their Riot session kept failing')
+loop_lag_seconds = registry.histogram('loop_lag_seconds', 'Event loop heartbeat delay')
+loop_blocked = registry.counter('loop_blocked_total', 'Event loop stalls over the watchdog threshold')
+
+
+def timed(histogram: Histogram, **labels: Any) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """Decorator recording the run time of a sync or async function"""
+
+    def decorator(func: Callable[..., T]) -> Callable[..., T]:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with histogram.time(**labels):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument(cls: type[T], histogram: Histogram, exclude: tuple[str, ...] = ()) -> type[T]:
+    """Time every public method of a class, labelled by method name"""
+
+    for name, func in list(vars(cls).items()):
+        if name.startswith('_') or name in exclude or not inspect.isfunction(func):
+            continue
+        setattr(cls, name, timed(histogram, method=name)(func))
+    return cls
+
+
+async def start_server(host: str, port: int) -> web.AppRunner:
+    """Serve /metrics in Prometheus text format"""
+
+    async def handle(request: web.Request) -> web.Response:
+        text = await asyncio.to_thread(registry.render)
+        return web.Response(text=text, content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import cProfile
+import logging
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+log = logging.getLogger(__name__)
+
+PROFILE_DIR = 'data/profiles'
+
+# oldest .prof files are removed past this many
+MAX_PROFILES = 50
+
+# rows kept per capture for the embed, ordered by own time
+SUMMARY_ROWS = 15
+
+
+class Row(NamedTuple):
+    function: str
+    calls: int
+    own: float
+    cumulative: float
+
+
+class Capture(NamedTuple):
+    name: str
+    path: str
+    seconds: float
+    rows: list[Row]
+
+
+def _label(key: tuple[str, int, str]) -> str:
+    filename, line, function = key
+    if filename == '~':
+        return function  # builtins, e.g. <method 'read' of '_io.TextIOWrapper' objects>
+    parts = filename.replace('\\', '/').split('/')
+    return f'{"/".join(parts[-2:])}:{line}({function})'
+
+
+def summarize(profile: cProfile.Profile, limit: int = SUMMARY_ROWS) -> list[Row]:
+    """Functions with the most own time"""
+
+    stats = pstats.Stats(profile).stats  # type: ignore
+    ordered = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+    return [Row(_label(key), calls, own, cumulative) for key, (_, calls, own, cumulative, _) in ordered[:limit]]
+
+
+class Profiler:
+    """cProfile around commands and background tasks, switched on and off by the owner
+
+    One capture runs at a time, other invocations run unprofiled. cProfile records the event loop thread,
+    so tasks interleaving with the profiled one show up too and work pushed to threads does not.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR) -> None:
+        self.directory = directory
+        self.enabled = False
+        self.targets: set[str] | None = None
+        self.captures: deque[Capture] = deque(maxlen=10)
+        self._lock = threading.Lock()
+
+    def start(self, targets: set[str] | None = None) -> None:
+        """Profile the given commands or tasks, all of them when targets is None"""
+        self.targets = targets
+        self.enabled = True
+
+    def stop(self) -> None:
+        self.enabled = False
+
+    def wants(self, target: str) -> bool:
+        return self.enabled and (self.targets is None or target in self.targets)
+
+    @contextlib.asynccontextmanager
+    async def profile(self, name: str, target: str | None = None) -> AsyncIterator[None]:
+        """Profile the block when enabled for target, saved as <name>-<timestamp>.prof"""
+
+        if not self.wants(target or name) or not self._lock.acquire(blocking=False):
+            yield
+            return
+
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:  # another profiler is already attached to this thread
+                profile = None
+            if profile is None:
+                yield
+                return
+
+            start = time.perf_counter()
+            try:
+                yield
+            finally:
+                profile.disable()
+                elapsed = time.perf_counter() - start
+                await asyncio.to_thread(self.save, name, profile, elapsed)
+        finally:
+            self._lock.release()
+
+    def save(self, name: str, profile: cProfile.Profile, seconds: float) -> Capture:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}.prof')
+        profile.dump_stats(path)
+        capture = Capture(name, path, seconds, summarize(profile))
+        self.captures.appendleft(capture)
+        self.prune()
+        log.info('saved profile %s', path, extra={'data': {'seconds': round(seconds, 3)}})
+        return capture
+
+    def prune(self) -> None:
+        with contextlib.suppress(OSError):
+            files = sorted(
+                (os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.prof')),
+                key=os.path.getmtime,
+            )
+            for path in files[:-MAX_PROFILES]:
+                os.remove(path)
+
+    def status(self) -> dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'targets': sorted(self.targets) if self.targets else 'all',
+            'captures': len(self.captures),
+        }
+
+
+profiler = Profiler()
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Any
+
+import discord
+
+from .valorant.useful import JSON
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+    from bot import ValorantBot
+
+log = logging.getLogger(__name__)
+
+# DM channels opened at once while prefetching, discord.py still applies the REST rate limits
+PREFETCH_CONCURRENCY = 5
+
+DEFAULT_LOCALE = 'en-US'
+
+
+class Recipients:
+    """Where each notify goes and in which language, resolved without scans or REST calls during a run
+
+    channel -> guild and guild -> preferred locale are indexed from the gateway cache on ready and kept
+    current by the Notify cog's guild and channel listeners. DM channel ids are kept in the dm_channels
+    document, so a restart does not fetch every user again, and users without one are opened in bulk
+    before the run.
+    """
+
+    def __init__(self) -> None:
+        self.channels: dict[int, int] = {}  # channel id: guild id
+        self.locales: dict[int, str] = {}  # guild id: preferred locale
+        self.dm_channels: dict[str, int] | None = None  # user id: DM channel id
+
+    # ---------- INDEX ---------- #
+
+    def index(self, guilds: Iterable[discord.Guild]) -> None:
+        self.channels.clear()
+        self.locales.clear()
+        for guild in guilds:
+            self.add_guild(guild)
+
+    def add_guild(self, guild: discord.Guild) -> None:
+        self.locales[guild.id] = str(guild.preferred_locale)
+        for channel in guild.channels:
+            self.channels[channel.id] = guild.id
+
+    def remove_guild(self, guild: discord.Guild) -> None:
+        self.locales.pop(guild.id, None)
+        for channel in guild.channels:
+            self.channels.pop(channel.id, None)
+
+    def add_channel(self, channel: discord.abc.GuildChannel) -> None:
+        self.channels[channel.id] = channel.guild.id
+
+    def remove_channel(self, channel: discord.abc.GuildChannel) -> None:
+        self.channels.pop(channel.id, None)
+
+    def locale(self, channel: Any) -> str:
+        """Preferred locale of the guild the channel is in, threads and unindexed channels are added on first use"""
+
+        guild_id = self.channels.get(channel.id)
+        if guild_id is None:
+            guild = getattr(channel, 'guild', None)
+            if guild is None:
+                return DEFAULT_LOCALE
+            self.channels[channel.id] = guild.id
+            self.locales.setdefault(guild.id, str(guild.preferred_locale))
+            guild_id = guild.id
+        return self.locales.get(guild_id, DEFAULT_LOCALE)
+
+    # ---------- DIRECT MESSAGES ---------- #
+
+    def _load(self) -> dict[str, int]:
+        if self.dm_channels is None:
+            self.dm_channels = dict(JSON.read('dm_channels'))
+        return self.dm_channels
+
+    async def prefetch(self, bot: ValorantBot, user_ids: Iterable[str]) -> None:
+        """Open the DM channels the run will need and have not been opened before"""
+
+        # read again every run, other clusters add their users' channels to the same document
+        self.dm_channels = dm_channels = dict(JSON.read('dm_channels'))
+        missing = [user_id for user_id in user_ids if user_id not in dm_channels]
+        if not missing:
+            return
+
+        semaphore = asyncio.Semaphore(PREFETCH_CONCURRENCY)
+
+        async def open_dm(user_id: str) -> None:
+            async with semaphore:
+                try:
+                    channel = await bot.create_dm(discord.Object(int(user_id)))
+                except discord.HTTPException:
+                    log.warning("can't open a DM channel", extra={'data': {'notify_user': user_id}})
+                    return
+            dm_channels[user_id] = channel.id
+
+        await asyncio.gather(*(open_dm(user_id) for user_id in missing))
+        JSON.save('dm_channels', dm_channels)
+        log.info('prefetched %d DM channels', len(missing))
+
+    async def destination(self, bot: ValorantBot, user_id: str, user: dict[str, Any]) -> tuple[Any, str]:
+        """The channel a user's notify goes to and its locale, from their users record
+
+        DMs use the locale the user logged in with, a REST fetch only happens when the prefetch missed.
+        """
+
+        if not user.get('DM_Message'):
+            channel = bot.get_channel(int(user.get('notify_channel') or 0))
+            return channel, self.locale(channel) if channel is not None else DEFAULT_LOCALE
+
+        locale = user.get('locale') or DEFAULT_LOCALE
+        dm_channel = self._load().get(user_id)
+        if dm_channel is not None:
+            return bot.get_partial_messageable(dm_channel, type=discord.ChannelType.private), locale
+        return bot.get_user(int(user_id)) or await bot.fetch_user(int(user_id)), locale
+
+    def forget(self, user_id: str) -> None:
+        """Drop a DM channel that stopped working, it is opened again before the next run"""
+        if self._load().pop(user_id, None) is not None:
+            JSON.save('dm_channels', self.dm_channels)  # type: ignore
+
+
+recipients = Recipients()
@@ -2,26 +2,32 @@
 
 # Standard
 from secrets import token_urlsafe
+import asyncio
+import base64
+import binascii
 import contextlib
 import ctypes
 import json
 import re
 import ssl
-from datetime import datetime, timedelta
 import sys
+import time
 from typing import Any, Optional
 import warnings
+from collections.abc import AsyncIterator
 
 # Third
 import aiohttp
-import requests
 
-from ..errors import AuthenticationError
+from .. import deadline
+from ..errors import AuthenticationError, SessionExpired
+from ..metrics import auth_seconds, instrument
 from ..locale_v2 import ValorantTranslator
 from ..errors import ValorantBotError
 
 # Local
 from .local import LocalErrorResponse, ResponseLanguage
+from .transport import client, override_url
 
 
 vlr_locale = ValorantTranslator()
@@ -37,6 +43,38 @@ def _extract_tokens(data: str) -> str:
     return response
 
 
+# lifetime assumed for tokens whose expiry can not be read, Riot access tokens last an hour
+DEFAULT_TOKEN_LIFETIME = 59 * 60
+
+# tokens are refreshed this many seconds before they expire
+EXPIRY_SKEW = 60
+
+
+def jwt_expiry(token: str) -> float | None:
+    """The exp claim of a JWT, read without verifying the signature"""
+
+    try:
+        payload = token.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return float(claims['exp'])
+    except (IndexError, KeyError, TypeError, ValueError, binascii.Error):
+        return None
+
+
+def token_expiry(*tokens: str, expires_in: int | str | None = None) -> float:
+    """Unix time the first of the tokens expires, from their exp claims or expires_in"""
+
+    expiries = [expiry for expiry in map(jwt_expiry, tokens) if expiry is not None]
+    if expiries:
+        return min(expiries)
+    lifetime = int(expires_in) if expires_in else DEFAULT_TOKEN_LIFETIME
+    return time.time() + lifetime
+
+
+def token_expired(expiry_token: float, skew: float = EXPIRY_SKEW) -> bool:
+    return time.time() + skew >= expiry_token
+
+
 def _extract_tokens_from_uri(url: str) -> tuple[str, str]:
     try:
         access_token = url.split('access_token=')[1].split('&scope')[0]
@@ -140,6 +178,10 @@ class ClientSession(aiohttp.ClientSession):
         ).encode())
         super().__init__(*args, **kwargs, cookie_jar=aiohttp.CookieJar(), connector=aiohttp.TCPConnector(ssl=ssl_ctx), raise_for_status=True)
 
+    async def _request(self, method: str, str_or_url: Any, **kwargs: Any) -> aiohttp.ClientResponse:
+        deadline.check()
+        return await super()._request(method, override_url(str(str_or_url)), **kwargs)
+
 
 class Auth:
     RIOT_CLIENT_USER_AGENT = 'RiotClient/1.0.2.1870.3774 rso-auth (Windows;10;;Professional, x64)'
@@ -159,6 +201,18 @@ class Auth:
 
     def setup_session(self):
         return ClientSession()
+
+    @contextlib.asynccontextmanager
+    async def _session(self, session: aiohttp.ClientSession | None) -> AsyncIterator[aiohttp.ClientSession]:
+        """Use the caller's session, or a new one closed afterwards"""
+        if session is not None:
+            yield session
+            return
+        session = self.setup_session()
+        try:
+            yield session
+        finally:
+            await session.close()
     
     async def setup_auth(self, session: aiohttp.ClientSession) -> aiohttp.ClientResponse:
         data = {
@@ -186,7 +240,8 @@ class Auth:
         # }
         # await session.post('https://auth.riotgames.com/api/v1/authorization', json=data, headers=self._headers)
 
-        sdk = requests.get("https://valorant-api.com/v1/version").json()["data"]["riotClientVersion"]
+        r = await asyncio.to_thread(client.get, "https://valorant-api.com/v1/version")
+        sdk = r.json()["data"]["riotClientVersion"]
         data = {
             "clientId": "riot-client",
             "language": "",
@@ -278,8 +333,7 @@ class Auth:
                 access_token = response[0]
                 token_id = response[1]
                 # print(access_token, token_id)
-                expiry_token = datetime.now() + timedelta(minutes=59)
-                cookies['expiry_token'] = int(datetime.timestamp(expiry_token))  # type: ignore
+                cookies['expiry_token'] = int(token_expiry(access_token, expires_in=response[2]))  # type: ignore
 
                 return {'auth': 'response', 'data': {'cookie': cookies, 'access_token': access_token, 'token_id': token_id}}
 
@@ -304,43 +358,43 @@ class Auth:
         raise AuthenticationError(local_response.get('INVALID_PASSWORD', 'Your username or password may be incorrect!'))
     
 
-    async def get_entitlements_token(self, access_token: str) -> str:
+    async def get_entitlements_token(self, access_token: str, session: aiohttp.ClientSession | None = None) -> str:
         """This function is used to get the entitlements token."""
 
         # language
         local_response = self.local_response()
 
-        session = ClientSession()
-
         headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {access_token}'}
 
-        async with session.post('https://entitlements.auth.riotgames.com/api/token/v1', headers=headers, json={}) as r:
-            data = await r.json()
+        async with self._session(session) as session:
+            async with session.post(
+                'https://entitlements.auth.riotgames.com/api/token/v1', headers=headers, json={}
+            ) as r:
+                data = await r.json()
 
-        await session.close()
         try:
             entitlements_token = data['entitlements_token']
         except KeyError as e:
-            raise AuthenticationError(
+            raise SessionExpired(
                 local_response.get('COOKIES_EXPIRED', 'Cookies is expired, plz /login again!')
             ) from e
         else:
             return entitlements_token
 
-    async def get_userinfo(self, access_token: str) -> tuple[str, str, str]:
+    async def get_userinfo(
+        self, access_token: str, session: aiohttp.ClientSession | None = None
+    ) -> tuple[str, str, str]:
         """This function is used to get the user info."""
 
         # language
         local_response = self.local_response()
 
-        session = ClientSession()
-
         headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {access_token}'}
 
-        async with session.post('https://auth.riotgames.com/userinfo', headers=headers, json={}) as r:
-            data = await r.json()
+        async with self._session(session) as session:
+            async with session.post('https://auth.riotgames.com/userinfo', headers=headers, json={}) as r:
+                data = await r.json()
 
-        await session.close()
         try:
             puuid = data['sub']
             name = data['acct']['game_name']
@@ -352,24 +406,24 @@ class Auth:
         else:
             return puuid, name, tag
 
-    async def get_region(self, access_token: str, token_id: str) -> str:
+    async def get_region(
+        self, access_token: str, token_id: str, session: aiohttp.ClientSession | None = None
+    ) -> str:
         """This function is used to get the region."""
 
         # language
         local_response = self.local_response()
 
-        session = ClientSession()
-
         headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {access_token}'}
 
         body = {'id_token': token_id}
 
-        async with session.put(
-            'https://riot-geo.pas.si.riotgames.com/pas/v1/product/valorant', headers=headers, json=body
-        ) as r:
-            data = await r.json()
+        async with self._session(session) as session:
+            async with session.put(
+                'https://riot-geo.pas.si.riotgames.com/pas/v1/product/valorant', headers=headers, json=body
+            ) as r:
+                data = await r.json()
 
-        await session.close()
         try:
             region = data['affinities']['live']
         except KeyError as e:
@@ -379,6 +433,32 @@ class Auth:
         else:
             return region
 
+    async def resolve_identity(
+        self, access_token: str, token_id: str, entitlements_token: str | None = None
+    ) -> tuple[str, str, str, str, str]:
+        """Fetch entitlements, user info and region at once over one session
+
+        The three calls only need the access token, so they share a connection pool instead of
+        paying a TLS handshake each. Returns entitlements_token, puuid, name, tag and region.
+        """
+
+        async with self._session(None) as session:
+            steps = [self.get_userinfo(access_token, session), self.get_region(access_token, token_id, session)]
+            if entitlements_token is None:
+                steps.append(self.get_entitlements_token(access_token, session))
+
+            # wait for every step before the session closes, then surface the first failure
+            results = await asyncio.gather(*steps, return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+        (puuid, name, tag), region = results[0], results[1]
+        if entitlements_token is None:
+            entitlements_token = results[2]
+        return entitlements_token, puuid, name, tag, region  # type: ignore
+
     async def give2facode(self, code: str, cookies: dict[str, Any]) -> dict[str, Any]:
         """This function is used to give the 2FA code."""
 
@@ -435,10 +515,10 @@ class Auth:
             data = await r.text()
 
         if r.status != 303:
-            raise AuthenticationError(local_response.get('COOKIES_EXPIRED'))
+            raise SessionExpired(local_response.get('COOKIES_EXPIRED'))
 
         if r.headers['Location'].startswith('/login'):
-            raise AuthenticationError(local_response.get('COOKIES_EXPIRED'))
+            raise SessionExpired(local_response.get('COOKIES_EXPIRED'))
 
         old_cookie = cookies.copy()
 
@@ -459,9 +539,7 @@ class Auth:
             access_token = authenticate['data']['access_token']  # type: ignore
             token_id = authenticate['data']['token_id']  # type: ignore
 
-            entitlements_token = await self.get_entitlements_token(access_token)
-            puuid, name, tag = await self.get_userinfo(access_token)
-            region = await self.get_region(access_token, token_id)
+            entitlements_token, puuid, name, tag, region = await self.resolve_identity(access_token, token_id)
             player_name = f'{name}#{tag}' if tag is not None and tag is not None else 'no_username'
 
             headers = {
@@ -520,3 +598,6 @@ class Auth:
 
     async def refresh_token(self, cookies: dict) -> tuple[dict[str, Any], str, str]:
         return await self.redeem_cookies(cookies)
+
+
+instrument(Auth, auth_seconds, exclude=('setup_session', 'local_response'))
@@ -1,36 +1,28 @@
 from __future__ import annotations
 
-import json
-import os
+import logging
 from typing import Any
 
-import requests
+from ..metrics import cache_seconds, timed
+from .storage import storage
+from .transport import client
+from .useful import JSON
 
-from .useful import JSON, on_replit
+log = logging.getLogger(__name__)
 
 
 def create_json(filename: str, formats: dict[str, Any]) -> None:
     """Create a json file"""
-
-    if on_replit:
-        from replit import db  # type: ignore
-
-        db[filename] = formats
-    else:
-        file_path = 'data/' + filename + '.json'
-        file_dir = os.path.dirname(file_path)
-        os.makedirs(file_dir, exist_ok=True)
-        if not os.path.exists(file_path):
-            with open(file_path, 'w') as fp:
-                json.dump(formats, fp, indent=2)
+    storage.create(filename, formats)
 
 
+@timed(cache_seconds, op='get_valorant_version')
 def get_valorant_version() -> str | None:
     """Get the valorant version from valorant-api.com"""
 
-    print('Fetching Valorant version !')
+    log.info('Fetching Valorant version !')
 
-    resp = requests.get('https://valorant-api.com/v1/version')
+    resp = client.get('https://valorant-api.com/v1/version')
 
     return resp.json()['data']['manifestId']
 
@@ -40,8 +32,8 @@ def fetch_skin() -> None:
 
     data = JSON.read('cache')
 
-    print('Fetching weapons skin !')
-    resp = requests.get('https://valorant-api.com/v1/weapons/skins?language=all')
+    log.info('Fetching weapons skin !')
+    resp = client.get('https://valorant-api.com/v1/weapons/skins?language=all')
     if resp.status_code == 200:
         json = {}
         for skin in resp.json()['data']:
@@ -60,9 +52,9 @@ def fetch_tier() -> None:
     """Fetch the skin tier from valorant-api.com"""
 
     data = JSON.read('cache')
-    print('Fetching tier skin !')
+    log.info('Fetching tier skin !')
 
-    resp = requests.get('https://valorant-api.com/v1/contenttiers/')
+    resp = client.get('https://valorant-api.com/v1/contenttiers/')
     if resp.status_code == 200:
         json = {}
         for tier in resp.json()['data']:
@@ -83,17 +75,16 @@ def pre_fetch_price() -> None:
         data['prices'] = pre_json
         JSON.save('cache', data)
     except Exception as e:
-        print(e)
-        print("Can't fetch price")
+        log.warning("can't fetch price: %r", e)
 
 
 def fetch_mission() -> None:
     """Fetch the mission from valorant-api.com"""
 
     data = JSON.read('cache')
-    print('Fetching mission !')
+    log.info('Fetching mission !')
 
-    resp = requests.get('https://valorant-api.com/v1/missions?language=all')
+    resp = client.get('https://valorant-api.com/v1/missions?language=all')
     if resp.status_code == 200:
         json = {}
         # json['version'] = get_valorant_version()
@@ -113,8 +104,8 @@ def fetch_playercard() -> None:
     """Fetch the player card from valorant-api.com"""
 
     data = JSON.read('cache')
-    print('Fetching Player cards !')
-    resp = requests.get('https://valorant-api.com/v1/playercards?language=all')
+    log.info('Fetching Player cards !')
+    resp = client.get('https://valorant-api.com/v1/playercards?language=all')
     if resp.status_code == 200:
         payload = {}
         # json['version'] = get_valorant_version()
@@ -136,9 +127,9 @@ def fetch_titles() -> None:
     """Fetch the player titles from valorant-api.com"""
 
     data = JSON.read('cache')
-    print('Fetching Player titles !')
+    log.info('Fetching Player titles !')
 
-    resp = requests.get('https://valorant-api.com/v1/playertitles?language=all')
+    resp = client.get('https://valorant-api.com/v1/playertitles?language=all')
     if resp.status_code == 200:
         payload = {}
         for title in resp.json()['data']:
@@ -151,8 +142,8 @@ def fetch_spray() -> None:
     """Fetch the spray from valorant-api.com"""
 
     data = JSON.read('cache')
-    print('Fetching Sprays !')
-    resp = requests.get('https://valorant-api.com/v1/sprays?language=all')
+    log.info('Fetching Sprays !')
+    resp = client.get('https://valorant-api.com/v1/sprays?language=all')
     if resp.status_code == 200:
         payload = {}
         for spray in resp.json()['data']:
@@ -169,8 +160,8 @@ def fetch_bundles() -> None:
     """Fetch all bundles from valorant-api.com and https://docs.valtracker.gg/bundles"""
 
     data = JSON.read('cache')
-    print('Fetching bundles !')
-    resp = requests.get('https://valorant-api.com/v1/bundles?language=all')
+    log.info('Fetching bundles !')
+    resp = client.get('https://valorant-api.com/v1/bundles?language=all')
     if resp.status_code == 200:
         bundles = {}
         for bundle in resp.json()['data']:
@@ -241,8 +232,8 @@ def fetch_contracts() -> None:
     """Fetch contracts from valorant-api.com"""
 
     data = JSON.read('cache')
-    print('Fetching Contracts !')
-    resp = requests.get('https://valorant-api.com/v1/contracts?language=all')
+    log.info('Fetching Contracts !')
+    resp = client.get('https://valorant-api.com/v1/contracts?language=all')
 
     # IGNOR OLD BATTLE_PASS
     ignor_contract = [
@@ -302,8 +293,8 @@ def fetch_currencies() -> None:
     """Fetch currencies from valorant-api.com"""
 
     data = JSON.read('cache')
-    print('Fetching currencies !')
-    resp = requests.get('https://valorant-api.com/v1/currencies?language=all')
+    log.info('Fetching currencies !')
+    resp = client.get('https://valorant-api.com/v1/currencies?language=all')
     if resp.status_code == 200:
         payload = {}
         for currencie in resp.json()['data']:
@@ -321,9 +312,9 @@ def fetch_buddies() -> None:
 
     data = JSON.read('cache')
 
-    print('Fetching buddies !')
+    log.info('Fetching buddies !')
 
-    resp = requests.get('https://valorant-api.com/v1/buddies?language=all')
+    resp = client.get('https://valorant-api.com/v1/buddies?language=all')
     if resp.status_code == 200:
         payload = {}
         for buddy in resp.json()['data']:
@@ -337,6 +328,7 @@ def fetch_buddies() -> None:
         JSON.save('cache', data)
 
 
+@timed(cache_seconds, op='fetch_price')
 def fetch_price(data_price: dict) -> None:
     """Fetch the price of a skin"""
 
@@ -381,6 +373,7 @@ def fetch_price(data_price: dict) -> None:
 #     session.close()
 
 
+@timed(cache_seconds, op='get_cache')
 def get_cache() -> None:
     """Get all cache from valorant-api.com"""
 
@@ -399,4 +392,4 @@ def get_cache() -> None:
     fetch_contracts()
     # fetch_skinchromas() # next update
 
-    print('Loaded Cache')
+    log.info('Loaded Cache')
@@ -0,0 +1,459 @@
+"""
+Read-only, locale projected view of cache.json
+
+cache.json keeps every language valorant-api.com returns, the catalog only keeps the
+locales listed in CATALOG_LOCALES (comma separated, all locales when unset).
+Localized strings are interned in one string table per locale and entries are tuple backed,
+the catalog is built once and rebuilt only when the cache changes.
+
+With CATALOG_SNAPSHOT set the catalog is served from data/catalog.snapshot instead, a binary
+file that is memory mapped and decoded one entry at a time, so startup does not parse the cache
+and every bot process on the host shares the same pages.
+
+Every cache save stamps a new content generation into the document and the small cache_meta
+document. Processes compare the generation they loaded with cache_meta, whatever the storage
+backend, and the snapshot is written from the data being saved.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import gc
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+import tracemalloc
+import uuid as uuid_
+from collections.abc import Callable, Iterator, Mapping
+from typing import Any
+
+from dotenv import load_dotenv
+
+from .. import deadline
+from ..metrics import cache_seconds
+from .storage import catalog as documents
+
+load_dotenv()
+
+CACHE_PATH = 'data/cache.json'
+SNAPSHOT_PATH = 'data/catalog.snapshot'
+
+# seconds between checks of cache_meta for a cache saved by another process
+CHECK_INTERVAL = 30.0
+
+# snapshot layout: magic, little endian u32 header size, json header, entry records
+SNAPSHOT_MAGIC = b'VCATSNP2'
+SNAPSHOT_HEADER = struct.Struct('<I')
+
+DEFAULT_LOCALE = 'en-US'
+
+# entry fields holding {locale: text} maps
+LOCALIZED_FIELDS = {'names', 'subnames', 'descriptions', 'titles', 'text'}
+
+# cache sections that are not {uuid: entry} maps
+PLAIN_SECTIONS = {'prices', 'valorant_version', 'generation'}
+
+
+def resident_locales() -> list[str] | None:
+    """Locales kept in memory, None keeps every locale"""
+    locales = os.getenv('CATALOG_LOCALES')
+    if not locales:
+        return None
+    return [locale.strip() for locale in locales.split(',') if locale.strip()]
+
+
+def snapshot_enabled() -> bool:
+    return bool(os.getenv('CATALOG_SNAPSHOT'))
+
+
+class LocalizedText(tuple):
+    """Texts of one field aligned with the catalog locales, read like the {locale: text} dict it replaces"""
+
+    __slots__ = ()
+    _locales: tuple[str, ...] = ()
+    _index: dict[str, int] = {}
+    _fallback: int = 0
+
+    def __getitem__(self, locale: str) -> str | None:  # type: ignore[override]
+        return tuple.__getitem__(self, self._index.get(locale, self._fallback))
+
+    def get(self, locale: str, default: Any = None) -> Any:
+        index = self._index.get(locale)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> tuple[str, ...]:
+        return self._locales
+
+    def values(self) -> list[str]:
+        return [text for text in tuple.__iter__(self) if text is not None]
+
+    def items(self) -> Iterator[tuple[str, str | None]]:
+        return zip(self._locales, tuple.__iter__(self), strict=True)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._locales)
+
+    def __contains__(self, locale: object) -> bool:
+        return locale in self._index
+
+    def __repr__(self) -> str:
+        return f'LocalizedText({dict(self.items())!r})'
+
+
+class Record(tuple):
+    """Immutable catalog entry, read like the dict it was built from"""
+
+    __slots__ = ()
+    _layout: dict[str, int] = {}
+
+    def __getitem__(self, key: str | int) -> Any:  # type: ignore[override]
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._layout[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        index = self._layout.get(key)
+        return default if index is None else tuple.__getitem__(self, index)
+
+    def keys(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def values(self) -> Iterator[Any]:
+        return tuple.__iter__(self)
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        return zip(self._layout, tuple.__iter__(self), strict=True)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._layout)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._layout
+
+    def __repr__(self) -> str:
+        return f'Record({dict(self.items())!r})'
+
+
+class Catalog:
+    """Locale projected, interned copy of the asset cache"""
+
+    def __init__(self, raw: dict[str, Any], locales: list[str] | None = None) -> None:
+        if locales is None:
+            locales = self._discover_locales(raw)
+        self._setup(locales)
+
+        self.sections: dict[str, Any] = {}
+        for section, entries in raw.items():
+            if section in PLAIN_SECTIONS or not isinstance(entries, dict):
+                self.sections[section] = entries
+            else:
+                self.sections[section] = {uuid: self._record(entry) for uuid, entry in entries.items()}
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Snapshot, locales: list[str] | None = None) -> Catalog:
+        """Catalog whose entries are decoded from the snapshot on first access"""
+
+        catalog = cls.__new__(cls)
+        catalog._setup(snapshot.locales if locales is None else locales)
+        catalog.sections = dict(snapshot.plain)
+        for section in snapshot.index:
+            catalog.sections[section] = SnapshotSection(snapshot, section, catalog._record)
+        return catalog
+
+    def _setup(self, locales: list[str]) -> None:
+        self.locales: tuple[str, ...] = tuple(locales)
+        self.tables: list[dict[str, str]] = [{} for _ in self.locales]
+
+        index = {locale: i for i, locale in enumerate(self.locales)}
+        self._text_type = type(
+            'LocalizedText',
+            (LocalizedText,),
+            {
+                '__slots__': (),
+                '_locales': self.locales,
+                '_index': index,
+                '_fallback': index.get(DEFAULT_LOCALE, 0),
+            },
+        )
+        self._record_types: dict[tuple[str, ...], type[Record]] = {}
+
+    def __getitem__(self, section: str) -> Any:
+        return self.sections[section]
+
+    def get(self, section: str, default: Any = None) -> Any:
+        return self.sections.get(section, default)
+
+    def __contains__(self, section: object) -> bool:
+        return section in self.sections
+
+    @staticmethod
+    def _discover_locales(raw: dict[str, Any]) -> list[str]:
+        for section, entries in raw.items():
+            if section in PLAIN_SECTIONS or not isinstance(entries, dict):
+                continue
+            for entry in entries.values():
+                names = entry.get('names') if isinstance(entry, dict) else None
+                if isinstance(names, dict):
+                    return list(names)
+        return [DEFAULT_LOCALE]
+
+    def __text(self, value: dict[str, str | None]) -> LocalizedText:
+        texts = []
+        for table, locale in zip(self.tables, self.locales, strict=True):
+            text = value.get(locale)
+            if text is not None:
+                text = table.setdefault(text, text)
+            texts.append(text)
+        return self._text_type(texts)
+
+    def _record(self, entry: Any) -> Any:
+        if not isinstance(entry, dict):
+            return entry
+
+        fields = tuple(entry)
+        record_type = self._record_types.get(fields)
+        if record_type is None:
+            record_type = type('Record', (Record,), {'__slots__': (), '_layout': {f: i for i, f in enumerate(fields)}})
+            self._record_types[fields] = record_type
+
+        values = []
+        for field, value in entry.items():
+            if field in LOCALIZED_FIELDS and isinstance(value, dict):
+                value = self.__text(value)
+            values.append(value)
+        return record_type(values)
+
+
+class Snapshot:
+    """Memory mapped snapshot file, entries stay encoded until they are looked up"""
+
+    def __init__(self, path: str = SNAPSHOT_PATH) -> None:
+        with open(path, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[: len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        start = len(SNAPSHOT_MAGIC) + SNAPSHOT_HEADER.size
+        (size,) = SNAPSHOT_HEADER.unpack_from(self.buffer, len(SNAPSHOT_MAGIC))
+        header = json.loads(self.buffer[start : start + size])
+
+        self.base = start + size
+        self.generation: str | None = header.get('generation')
+        self.locales: list[str] = header['locales']
+        self.plain: dict[str, Any] = header['plain']
+        self.index: dict[str, dict[str, list[int]]] = header['index']
+
+    def read(self, section: str, uuid: str) -> Any:
+        offset, length = self.index[section][uuid]
+        start = self.base + offset
+        return json.loads(self.buffer[start : start + length])
+
+
+class SnapshotSection(Mapping):
+    """One {uuid: entry} section of a snapshot, decoding and projecting each entry once"""
+
+    def __init__(self, snapshot: Snapshot, section: str, project: Callable[[Any], Any]) -> None:
+        self.snapshot = snapshot
+        self.section = section
+        self.project = project
+        self.index = snapshot.index[section]
+        self.loaded: dict[str, Any] = {}
+
+    def __getitem__(self, uuid: str) -> Any:
+        try:
+            return self.loaded[uuid]
+        except KeyError:
+            if uuid not in self.index:
+                raise
+        entry = self.loaded[uuid] = self.project(self.snapshot.read(self.section, uuid))
+        return entry
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, uuid: object) -> bool:
+        return uuid in self.index
+
+
+def write_snapshot(raw: dict[str, Any], path: str = SNAPSHOT_PATH) -> None:
+    """Write the cache as a snapshot, replacing the old file atomically so mapped readers keep their pages"""
+
+    plain: dict[str, Any] = {}
+    index: dict[str, dict[str, list[int]]] = {}
+    records: list[bytes] = []
+    offset = 0
+    for section, entries in raw.items():
+        if section in PLAIN_SECTIONS or not isinstance(entries, dict):
+            plain[section] = entries
+            continue
+        index[section] = {}
+        for uuid, entry in entries.items():
+            record = json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            index[section][uuid] = [offset, len(record)]
+            records.append(record)
+            offset += len(record)
+
+    header = json.dumps(
+        {'generation': raw.get('generation'), 'locales': Catalog._discover_locales(raw), 'plain': plain, 'index': index},
+        ensure_ascii=False,
+        separators=(',', ':'),
+    ).encode('utf-8')
+
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(SNAPSHOT_HEADER.pack(len(header)))
+        f.write(header)
+        f.writelines(records)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+_catalog: Catalog | None = None
+_catalog_generation: str | None = None
+_generation: str | None = None
+_checked = float('-inf')
+# last cache saved by this process, the snapshot is written from it instead of parsing the document again
+_published: dict[str, Any] | None = None
+
+
+def cache_info() -> dict[str, Any] | None:
+    """Generation and valorant_version of the saved cache without parsing it, None before the first save"""
+    return documents.meta()
+
+
+def _current_generation() -> str | None:
+    global _generation, _checked
+    now = time.monotonic()
+    if now - _checked >= CHECK_INTERVAL:
+        _generation = (cache_info() or {}).get('generation')
+        _checked = now
+    return _generation
+
+
+def publish(raw: dict[str, Any]) -> None:
+    """Save the cache under a new generation, the snapshot is rebuilt from the data being saved"""
+    global _catalog, _generation, _checked, _published
+
+    raw['generation'] = _generation = uuid_.uuid4().hex
+    _checked = time.monotonic()
+    _catalog = None
+    # a cache build saves many times in a row, the snapshot is written once when the catalog is next used
+    _published = raw if snapshot_enabled() else None
+    documents.set(raw, {'generation': _generation, 'valorant_version': raw.get('valorant_version')})
+
+
+def invalidate() -> None:
+    """Drop the loaded catalog, the next get_catalog checks the saved generation again"""
+    global _catalog, _checked
+    _catalog = None
+    _checked = float('-inf')
+
+
+def _load_snapshot(generation: str | None) -> Catalog:
+    global _published
+
+    if _published is not None and _published.get('generation') == generation:
+        write_snapshot(_published)
+    _published = None
+
+    snapshot = None
+    with contextlib.suppress(OSError, ValueError):
+        snapshot = Snapshot()
+    if snapshot is None or snapshot.generation != generation:
+        # saved by a process on another host, or before this host kept a snapshot
+        write_snapshot(documents.get())
+        snapshot = Snapshot()
+    return Catalog.from_snapshot(snapshot, resident_locales())
+
+
+def get_catalog() -> Catalog:
+    """Get the catalog, loading the cache again only when its generation changed"""
+    global _catalog, _catalog_generation
+
+    deadline.check()
+
+    generation = _current_generation()
+    if _catalog is None or generation != _catalog_generation:
+        with cache_seconds.time(op='catalog_build'):
+            if snapshot_enabled():
+                _catalog = _load_snapshot(generation)
+            else:
+                _catalog = Catalog(documents.get(), resident_locales())
+        # what was loaded, a cache_meta saved ahead of its cache is caught on the next check
+        _catalog_generation = _catalog.get('generation')
+    return _catalog
+
+
+def measure(path: str = CACHE_PATH, locales: list[str] | None = None, lookups: int = 100) -> dict[str, float]:
+    """Compare resident memory and load time of the catalog with today's cache.json"""
+
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    raw = json.loads(text)
+    json_load = time.perf_counter() - start
+    json_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    catalog = Catalog(json.loads(text), locales)
+    catalog_load = time.perf_counter() - start
+    gc.collect()
+    catalog_memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    snapshot_path = f'{path}.measure.snapshot'
+    write_snapshot(json.loads(text), snapshot_path)
+    start = time.perf_counter()
+    snapshot_catalog = Catalog.from_snapshot(Snapshot(snapshot_path), locales)
+    snapshot_open = time.perf_counter() - start
+
+    # today every GetItems lookup parses the whole file, the catalog parses once
+    uuid = next(iter(raw['skins']))
+    start = time.perf_counter()
+    for _ in range(lookups):
+        json.loads(text)['skins'][uuid]['names'][DEFAULT_LOCALE]
+    json_lookup = (time.perf_counter() - start) / lookups
+    start = time.perf_counter()
+    for _ in range(lookups):
+        catalog['skins'][uuid]['names'][DEFAULT_LOCALE]
+    catalog_lookup = (time.perf_counter() - start) / lookups
+    start = time.perf_counter()
+    snapshot_catalog['skins'][uuid]['names'][DEFAULT_LOCALE]
+    snapshot_lookup = time.perf_counter() - start
+    os.remove(snapshot_path)
+
+    return {
+        'locales': len(catalog.locales),
+        'json_memory_mb': json_memory / 2**20,
+        'catalog_memory_mb': catalog_memory / 2**20,
+        'json_load_ms': json_load * 1000,
+        'catalog_load_ms': catalog_load * 1000,
+        'json_lookup_ms': json_lookup * 1000,
+        'catalog_lookup_ms': catalog_lookup * 1000,
+        'snapshot_open_ms': snapshot_open * 1000,
+        'snapshot_first_lookup_ms': snapshot_lookup * 1000,
+    }
+
+
+if __name__ == '__main__':
+    # python -m utils.valorant.catalog [path] [locale,locale]
+    result = measure(
+        sys.argv[1] if len(sys.argv) > 1 else CACHE_PATH,
+        sys.argv[2].split(',') if len(sys.argv) > 2 else resident_locales(),
+    )
+    for name, value in result.items():
+        print(f'{name:>20}: {value:.3f}')
@@ -1,17 +1,23 @@
 from __future__ import annotations
 
-from datetime import datetime, timedelta
+import logging
 from typing import Any
 
 from ..errors import DatabaseError
-from .auth import Auth
+from ..metrics import failures
+from .auth import Auth, token_expired, token_expiry
 from .cache import fetch_price
+from .catalog import publish as publish_catalog
 from .local import LocalErrorResponse
-from .useful import JSON
+from .storage import catalog, notifys, users
 
+log = logging.getLogger(__name__)
 
-def timestamp_utc() -> float:
-    return datetime.timestamp(datetime.utcnow())
+# consecutive rejected sessions before a user is left out of bulk jobs until they log in again
+SESSION_FAILURE_LIMIT = 2
+
+# notify settings restored when a quarantined user logs in again
+NOTIFY_SETTINGS = ('notify_mode', 'DM_Message', 'notify_channel')
 
 
 class DATABASE:
@@ -23,21 +29,19 @@ class DATABASE:
 
     def insert_user(self, data: dict[str, Any]) -> None:
         """Insert user"""
-        JSON.save('users', data)
+        users.save(data)
 
     def read_db(self) -> dict[str, Any]:
         """Read database"""
-        data = JSON.read('users')
-        return data
+        return users.all()
 
     def read_cache(self) -> dict[str, Any]:
         """Read database"""
-        data = JSON.read('cache')
-        return data
+        return catalog.get()
 
     def insert_cache(self, data: dict[str, Any]) -> None:
         """Insert cache"""
-        JSON.save('cache', data)
+        publish_catalog(data)
 
     async def is_login(self, user_id: int, response: dict[str, Any], check: bool = False) -> dict[str, Any] | bool | None:
         """Check if user is logged in"""
@@ -62,7 +66,6 @@ class DATABASE:
         # language
         response = LocalErrorResponse('DATABASE', locale_code)
 
-        db = self.read_db()
         auth = self.auth
 
         auth_data = data['data']
@@ -71,12 +74,10 @@ class DATABASE:
         token_id = auth_data['token_id']
 
         try:
-            entitlements_token = await auth.get_entitlements_token(access_token)
-            puuid, name, tag = await auth.get_userinfo(access_token)
-            region = await auth.get_region(access_token, token_id)
+            entitlements_token, puuid, name, tag, region = await auth.resolve_identity(access_token, token_id)
             player_name = f'{name}#{tag}' if tag is not None and tag is not None else 'no_username'
 
-            expiry_token = datetime.timestamp(datetime.utcnow() + timedelta(minutes=59))
+            expiry_token = token_expiry(access_token, entitlements_token)
 
             data = {
                 'cookie': cookie,
@@ -89,14 +90,14 @@ class DATABASE:
                 'expiry_token': expiry_token,
                 'notify_mode': None,
                 'DM_Message': True,
+                'locale': str(locale_code),
             }
-
-            db[str(user_id)] = data
-
-            self.insert_user(db)
+            self.reinstate(users.get(user_id), data)
+            users.set(user_id, data)
 
         except Exception as e:
-            print(e)
+            log.exception('login failed', extra={'data': {'login_user': user_id}})
+            failures.inc(source='login')
             raise DatabaseError(response.get('LOGIN_ERROR')) from e
         else:
             return {'auth': True, 'player': player_name}
@@ -107,14 +108,12 @@ class DATABASE:
         # language
         response = LocalErrorResponse('DATABASE', locale_code)
 
+        if users.get(user_id) is None:
+            raise DatabaseError(response.get('LOGOUT_ERROR'))
         try:
-            db = self.read_db()
-            del db[str(user_id)]
-            self.insert_user(db)
-        except KeyError as e:
-            raise DatabaseError(response.get('LOGOUT_ERROR')) from e
+            users.delete(user_id)
         except Exception as e:
-            print(e)
+            log.exception('logout failed', extra={'data': {'login_user': user_id}})
             raise DatabaseError(response.get('LOGOUT_EXCEPT')) from e
         else:
             return True
@@ -136,7 +135,7 @@ class DATABASE:
         notify_channel = auth.get('notify_channel', None)  # type: ignore
         dm_message = auth.get('DM_Message', None)  # type: ignore
 
-        if timestamp_utc() > expiry_token:
+        if token_expired(expiry_token):
             access_token, entitlements_token = await self.refresh_token(user_id, auth)  # type: ignore
 
         headers = {'Authorization': f'Bearer {access_token}', 'X-Riot-Entitlements-JWT': entitlements_token}
@@ -160,7 +159,7 @@ class DATABASE:
 
         cookies, access_token, entitlements_token = await auth.redeem_cookies(data['cookie'])
 
-        expired_cookie = datetime.timestamp(datetime.utcnow() + timedelta(minutes=59))
+        expired_cookie = token_expiry(access_token, entitlements_token)
 
         db = self.read_db()
         db[str(user_id)]['cookie'] = cookies['cookie']
@@ -197,17 +196,48 @@ class DATABASE:
         self.insert_user(db)
 
     def check_notify_list(self, user_id: int) -> None:
-        database = JSON.read('notifys')
-        notify_skin = [x for x in database if x['id'] == str(user_id)]  # type: ignore
-        if len(notify_skin) == 0:
+        if not notifys.by_user(user_id):
             raise DatabaseError("You're notification list is empty!")
 
     def get_user_is_notify(self) -> list[Any]:
-        """Get user is notify"""
+        """Get user is notify, quarantined sessions are left out"""
+
+        return [
+            user_id
+            for user_id, user in users.all().items()
+            if user['notify_mode'] is not None and not user.get('quarantined')
+        ]
+
+    def session_failed(self, user_id: int) -> bool:
+        """Count a rejected session, returns True when this failure quarantines the user"""
+
+        db = self.read_db()
+        user = db[str(user_id)]
+        user['session_failures'] = user.get('session_failures', 0) + 1
+        quarantine = not user.get('quarantined') and user['session_failures'] >= SESSION_FAILURE_LIMIT
+        if quarantine:
+            user['quarantined'] = True
+        self.insert_user(db)
+        return quarantine
+
+    def session_ok(self, user_id: int) -> None:
+        """Reset the failure count after the session worked"""
+
+        db = self.read_db()
+        user = db.get(str(user_id))
+        if user and user.get('session_failures'):
+            user['session_failures'] = 0
+            self.insert_user(db)
 
-        database = JSON.read('users')
-        notifys = [user_id for user_id in database if database[user_id]['notify_mode'] is not None]
-        return notifys
+    @staticmethod
+    def reinstate(previous: dict[str, Any] | None, data: dict[str, Any]) -> None:
+        """Carry the notify settings of a quarantined session over to the new login"""
+
+        if not previous or not previous.get('quarantined'):
+            return
+        for key in NOTIFY_SETTINGS:
+            if key in previous:
+                data[key] = previous[key]
 
     def insert_skin_price(self, skin_price: dict[str, Any], force: bool = False) -> None:
         """Insert skin price to cache"""
@@ -221,7 +251,6 @@ class DATABASE:
     async def cookie_login(self, user_id: int, cookie: dict[str, Any] | str, locale_code: str) -> dict[str, Any] | None:
         """Login with cookie"""
 
-        db = self.read_db()
         auth = self.auth
         auth.locale_code = locale_code
 
@@ -232,11 +261,10 @@ class DATABASE:
         token_id = data['token_id']
         entitlements_token = data['emt']
 
-        puuid, name, tag = await auth.get_userinfo(access_token)
-        region = await auth.get_region(access_token, token_id)
+        _, puuid, name, tag, region = await auth.resolve_identity(access_token, token_id, entitlements_token)
         player_name = f'{name}#{tag}' if tag is not None and tag is not None else 'no_username'
 
-        expiry_token = datetime.timestamp(datetime.utcnow() + timedelta(minutes=59))
+        expiry_token = token_expiry(access_token, entitlements_token)
 
         try:
             data = {
@@ -250,13 +278,14 @@ class DATABASE:
                 'expiry_token': expiry_token,
                 'notify_mode': None,
                 'DM_Message': True,
+                'locale': str(locale_code),
             }
+            self.reinstate(users.get(user_id), data)
+            users.set(user_id, data)
 
-            db[str(user_id)] = data
-            self.insert_user(db)
-
-        except Exception as e:
-            print(e)
+        except Exception:
+            log.exception('cookie login failed', extra={'data': {'login_user': user_id}})
+            failures.inc(source='cookie_login')
             return {'auth': False}
         else:
             return {'auth': True, 'player': player_name}
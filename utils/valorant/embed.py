@@ -8,7 +8,8 @@ import discord
 from discord import User
 
 from ..locale_v2 import ValorantTranslator
-from .useful import JSON, GetEmoji, GetFormat, calculate_level_xp, format_relative, iso_to_time
+from .catalog import get_catalog
+from .useful import GetEmoji, GetFormat, calculate_level_xp, format_relative, iso_to_time
 
 VLR_locale = ValorantTranslator()
 
@@ -120,7 +121,7 @@ class GetEmbed:
         # language
         title_point = response.get('POINT')
 
-        cache = JSON.read('cache')
+        cache = get_catalog()
         point = cache['currencies']
 
         vp_uuid = '85ad13f7-3d1b-5128-9eb2-7cd8ee0b5741'
@@ -3,13 +3,17 @@
 from __future__ import annotations
 
 # Standard
+import contextlib
+import functools
 import json
-from typing import Any
+import logging
+from typing import TYPE_CHECKING, Any
 
-import requests
-
-from ..errors import HandshakeError, ResponseError
+from ..errors import HandshakeError, ResponseError, SessionExpired
+from ..metrics import endpoint_seconds, instrument
 from .local import LocalErrorResponse
+from .rank import ranks
+from .transport import BACKGROUND, client, prioritized, priority
 
 # Local
 from .resources import (
@@ -22,6 +26,22 @@ from .resources import (
 
 import asyncio
 
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    import requests
+
+log = logging.getLogger(__name__)
+
+
+def _decode(r: requests.Response) -> Any:
+    """Decode a json response, None when the body is not json"""
+    try:
+        return json.loads(r.text)
+    except ValueError:
+        return None
+
+
 class API_ENDPOINT:
     def __init__(self) -> None:
         from .auth import Auth
@@ -58,7 +78,7 @@ class API_ENDPOINT:
             self.__format_region()
             self.__build_urls()
         except Exception as e:
-            print(e)
+            log.warning('endpoint activation failed: %r', e)
             raise HandshakeError(self.locale_response().get('FAILED_ACTIVE')) from e
 
     def locale_response(self) -> dict[str, Any]:
@@ -66,6 +86,10 @@ class API_ENDPOINT:
         self.response = LocalErrorResponse('API', self.locale_code)
         return self.response
 
+    async def gather(self, *calls: Callable[[], Any]) -> list[Any]:
+        """Run independent endpoint calls concurrently at the caller's priority, the latency is the slowest call"""
+        return await asyncio.gather(*(asyncio.to_thread(call) for call in calls))
+
     # async def refresh_token(self) -> None:
     # cookies = self.cookie
     # cookies, accessToken, emt = await self.auth.redeem_cookies(cookies)
@@ -79,25 +103,22 @@ class API_ENDPOINT:
 
         endpoint_url = getattr(self, url)
 
-        data = None
-        if header is None:
-            r = requests.get(f'{endpoint_url}{endpoint}', headers=self.headers)
-        else:
-            r = requests.get(f'{endpoint_url}{endpoint}', headers=header)
+        r = client.get(f'{endpoint_url}{endpoint}', headers=self.headers if header is None else header)
 
-        try:  # noqa: SIM105
-            data = json.loads(r.text)
-        except Exception:
-            pass
+        data = _decode(r)
+        if data is None:
+            raise ResponseError(self.locale_response().get('REQUEST_FAILED'))
 
-        if 'httpStatus' not in data:  # type: ignore
-            return data  # type: ignore
+        if 'httpStatus' not in data:
+            return data
 
         if r.status_code == 400:
             response = LocalErrorResponse('AUTH', self.locale_code)
-            raise ResponseError(response.get('COOKIES_EXPIRED'))
+            raise SessionExpired(response.get('COOKIES_EXPIRED'))
             # await self.refresh_token()
             # return await self.fetch(endpoint=endpoint, url=url, errors=errors)
+        if r.status_code == 429:
+            raise ResponseError(self.response.get('REQUEST_FAILED'))
         return {}
     
     def fetch2(self, endpoint: str = '/', url: str = 'pd', errors: dict[str, Any] | None = None, header: dict[str, Any] | None = None) -> dict[str, Any]:
@@ -106,24 +127,18 @@ class API_ENDPOINT:
 
         endpoint_url = "https://glz-kr-1.kr.a.pvp.net"
 
-        data = None
-
-        if header is None:
-            r = requests.get(f'{endpoint_url}{endpoint}', headers=self.headers)
-        else:
-            r = requests.get(f'{endpoint_url}{endpoint}', headers=header)
+        r = client.get(f'{endpoint_url}{endpoint}', headers=self.headers if header is None else header)
 
-        try:  # noqa: SIM105
-            data = json.loads(r.text)
-        except Exception:
-            pass
+        data = _decode(r)
+        if data is None:
+            raise ResponseError(self.locale_response().get('REQUEST_FAILED'))
 
-        if 'httpStatus' not in data:  # type: ignore
-            return data  # type: ignore
+        if 'httpStatus' not in data:
+            return data
         
         if r.status_code == 400:
             response = LocalErrorResponse('AUTH', self.locale_code)
-            raise ResponseError(response.get('COOKIES_EXPIRED'))
+            raise SessionExpired(response.get('COOKIES_EXPIRED'))
             # await self.refresh_token()
             # return await self.fetch(endpoint=endpoint, url=url, errors=errors)
         return {}
@@ -142,11 +157,11 @@ class API_ENDPOINT:
 
         endpoint_url = getattr(self, url)
 
-        r = requests.put(f'{endpoint_url}{endpoint}', headers=self.headers, data=data)
-        data = json.loads(r.text)
+        r = client.put(f'{endpoint_url}{endpoint}', headers=self.headers, json=data)
+        data = _decode(r)
 
         if data is None:
-            raise ResponseError(self.response.get('REQUEST_FAILED'))
+            raise ResponseError(self.locale_response().get('REQUEST_FAILED'))
 
         return data
     
@@ -161,11 +176,11 @@ class API_ENDPOINT:
 
         endpoint_url = "https://glz-kr-1.kr.a.pvp.net"
 
-        r = requests.put(f'{endpoint_url}{endpoint}', headers=self.headers, data=data)
-        data = json.loads(r.text)
+        r = client.put(f'{endpoint_url}{endpoint}', headers=self.headers, data=data)
+        data = _decode(r)
 
         if data is None:
-            raise ResponseError(self.response.get('REQUEST_FAILED'))
+            raise ResponseError(self.locale_response().get('REQUEST_FAILED'))
 
         return data
     
@@ -182,11 +197,11 @@ class API_ENDPOINT:
 
         endpoint_url = getattr(self, url)
 
-        r = requests.post(f'{endpoint_url}{endpoint}', headers=self.headers, data=data)
-        data = json.loads(r.text)
+        r = client.post(f'{endpoint_url}{endpoint}', headers=self.headers, data=data)
+        data = _decode(r)
 
         if data is None:
-            raise ResponseError(self.response.get('REQUEST_FAILED'))
+            raise ResponseError(self.locale_response().get('REQUEST_FAILED'))
 
         return data
     
@@ -201,14 +216,11 @@ class API_ENDPOINT:
         """post data to the api"""
 
         endpoint_url = "https://glz-kr-1.kr.a.pvp.net"
-        if headers is not None:
-            r = requests.post(f'{endpoint_url}{endpoint}', headers=headers, json=data)
-        else:
-            r = requests.post(f'{endpoint_url}{endpoint}', headers=self.headers, json=data)
-        data = json.loads(r.text)
+        r = client.post(f'{endpoint_url}{endpoint}', headers=self.headers if headers is None else headers, json=data)
+        data = _decode(r)
 
         if data is None:
-            raise ResponseError(self.response.get('REQUEST_FAILED'))
+            raise ResponseError(self.locale_response().get('REQUEST_FAILED'))
 
         return data
     
@@ -246,17 +258,19 @@ class API_ENDPOINT:
         data = self.fetch(endpoint=f'/mmr/v1/players/{puuid}', url='pd')
         return data
 
-    def fetch_name_by_puuid(self, puuid: str | None = None) -> dict[str, Any]:
+    def fetch_name_by_puuid(self, puuid: str | list[str] | None = None) -> list[dict[str, Any]]:
         """
         Name_service
         get player name tag by puuid
         NOTE:
-        format ['PUUID']
+        format ['PUUID', ...], the endpoint accepts many puuids in one request
         """
         if puuid is None:
             puuids = [self.__check_puuid()]
-        elif puuid is not None and type(puuid) is str:
+        elif isinstance(puuid, str):
             puuids = [puuid]
+        else:
+            puuids = list(puuid)
         data = self.put(endpoint='/name-service/v2/players', url='pd', data=puuids)
         return data
 
@@ -348,17 +362,11 @@ class API_ENDPOINT:
         data = self.fetch_account_xp()['Progress']['Level']
         return data
 
-    def get_player_tier_rank(self, puuid: str | None = None) -> str:
+    def get_player_tier_rank(self, puuid: str | None = None) -> int:
         """
-        get player current tier rank
+        get player current tier rank, cached by the rank service
         """
-        data = self.fetch_player_mmr(puuid)
-        season_id = data['LatestCompetitiveUpdate']['SeasonID']
-        if len(season_id) == 0:
-            season_id = self.__get_live_season()
-        current_season = data['QueueSkills']['competitive']['SeasonalInfoBySeasonID']
-        current_Tier = current_season[season_id]['CompetitiveTier']
-        return current_Tier
+        return ranks.get_rank(self, puuid)
     
     # party endpoints
 
@@ -366,9 +374,11 @@ class API_ENDPOINT:
         """
         Get the party ID of the player
         """
-        r = requests.get(f'https://glz-kr-1.kr.a.pvp.net/parties/v1/players/{self.puuid}?aresriot.aws-rclusterprod-ape1-1.ap-gp-hongkong-1=186&aresriot.aws-rclusterprod-ape1-1.ap-gp-hongkong-awsedge-1=122&aresriot.aws-rclusterprod-apne1-1.ap-gp-tokyo-1=147&aresriot.aws-rclusterprod-apne1-1.ap-gp-tokyo-awsedge-1=151&aresriot.aws-rclusterprod-aps1-1.ap-gp-mumbai-awsedge-1=22&aresriot.aws-rclusterprod-apse1-1.ap-gp-singapore-1=77&aresriot.aws-rclusterprod-apse1-1.ap-gp-singapore-awsedge-1=79&aresriot.aws-rclusterprod-apse2-1.ap-gp-sydney-1=258&aresriot.aws-rclusterprod-apse2-1.ap-gp-sydney-awsedge-1=170&preferredgamepods=aresriot.aws-rclusterprod-aps1-1.ap-gp-mumbai-awsedge-1', headers=self.headers)
+        r = client.get(f'https://glz-kr-1.kr.a.pvp.net/parties/v1/players/{self.puuid}?aresriot.aws-rclusterprod-ape1-1.ap-gp-hongkong-1=186&aresriot.aws-rclusterprod-ape1-1.ap-gp-hongkong-awsedge-1=122&aresriot.aws-rclusterprod-apne1-1.ap-gp-tokyo-1=147&aresriot.aws-rclusterprod-apne1-1.ap-gp-tokyo-awsedge-1=151&aresriot.aws-rclusterprod-aps1-1.ap-gp-mumbai-awsedge-1=22&aresriot.aws-rclusterprod-apse1-1.ap-gp-singapore-1=77&aresriot.aws-rclusterprod-apse1-1.ap-gp-singapore-awsedge-1=79&aresriot.aws-rclusterprod-apse2-1.ap-gp-sydney-1=258&aresriot.aws-rclusterprod-apse2-1.ap-gp-sydney-awsedge-1=170&preferredgamepods=aresriot.aws-rclusterprod-aps1-1.ap-gp-mumbai-awsedge-1', headers=self.headers)
 
-        data = json.loads(r.text)
+        data = _decode(r)
+        if data is None:
+            raise ResponseError(self.locale_response().get('REQUEST_FAILED'))
         if 'errorCode' in data:
             if data['errorCode'] == 'PLAYER_DOES_NOT_EXIST':
                 return None
@@ -380,6 +390,13 @@ class API_ENDPOINT:
 
         return data['CurrentPartyID']
     
+    def fetch_party(self, party_id: str) -> dict[str, Any]:
+        """
+        Get the party state, including custom game team membership
+        """
+        data = self.fetch2(endpoint=f'/parties/v1/parties/{party_id}', url='pd')
+        return data
+
     def request_party_invite(self, party_id: str, players: list) -> None:
         """
         Request an invite to a party
@@ -387,12 +404,18 @@ class API_ENDPOINT:
         for player in players:
             self.fetch(endpoint=f'/parties/v1/parties/{party_id}/invites/name/{player["name"]}/tag/{player["tag"]}', url='pd')
 
-    def invite_party(self, party_id: str, players: list) -> None:
+    async def invite_party(self, party_id: str, players: list) -> None:
         """
-        Set a party join code
+        Invite every player to the party at once
         """
-        for player in players:
-            self.post2(endpoint=f'/parties/v1/parties/{party_id}/invites/name/{player["username"]}/tag/{player["tag"]}', url='pd')
+        # fan-out over the whole party, behind the commands someone is waiting on
+        with prioritized(max(priority.get(), BACKGROUND)):
+            await self.gather(
+                *(
+                    functools.partial(self.post2, endpoint=f'/parties/v1/parties/{party_id}/invites/name/{player["username"]}/tag/{player["tag"]}', url='pd')
+                    for player in players
+                )
+            )
         
     
     def set_party_accessibility(self, party_id: str) -> None:
@@ -409,76 +432,90 @@ class API_ENDPOINT:
         data = self.post2(endpoint=f'/parties/v1/parties/{party_id}/invitecode', url='pd')
         return data['InviteCode']
     
-    def request_party_join(self, party_id: str, players: list) -> None:
+    async def request_party_join(self, party_id: str, players: list) -> None:
         """
-        Request to join a party
+        Request to join a party for every player at once
         """
-        for player in players:
-            headers = self.headers
-            headers['Authorization'] = player['headers']['Authorization']
-            headers['X-Riot-Entitlements-JWT'] = player['headers']['X-Riot-Entitlements-JWT']
-            self.post2(endpoint=f'/parties/v1/parties/{party_id}/request', url='pd', headers=headers)
+        with prioritized(max(priority.get(), BACKGROUND)):
+            await self.gather(
+                *(
+                    functools.partial(self.post2, endpoint=f'/parties/v1/parties/{party_id}/request', url='pd', headers=self.__player_headers(player['headers']))
+                    for player in players
+                )
+            )
 
     async def join_party_code(self, interaction:Any, players: list, code: str) -> None:
         """
-        Join a party using a code
+        Join a party using a code, every player joins at once
         """
-        for player in players:
-            headers = self.headers
-            headers['Authorization'] = player['headers']['Authorization']
-            headers['X-Riot-Entitlements-JWT'] = player['headers']['X-Riot-Entitlements-JWT']
-            data = self.post2(endpoint=f'/parties/v1/players/joinbycode/{code}', url='pd')
+        with prioritized(max(priority.get(), BACKGROUND)):
+            results = await self.gather(
+                *(
+                    functools.partial(self.post2, endpoint=f'/parties/v1/players/joinbycode/{code}', url='pd', headers=self.__player_headers(player['headers']))
+                    for player in players
+                )
+            )
+        for player, data in zip(players, results, strict=True):
             if 'errorCode' in data:
                 if data['errorCode'] == 'PLAYER_DOES_NOT_EXIST':
                     await interaction.followup.send(f'{player["user"].mention}님은 `발로란트`에 로그인되어 있지 않아 초대에서 제외되었습니다.')
-            await asyncio.sleep(0.1)
 
 
 
-    def change_custom_game_team(self, party_id: str, team1: list, team2: list, headers: dict[str, Any]) -> None:
+    async def change_custom_game_team(self, party_id: str, team1: list, team2: list, headers: dict[str, Any]) -> None:
         """
         Change the team of a player in a custom game
+        Players already on their team are not moved, the rest move concurrently
         """
-        def set_team(player: dict, team: str):
-            if 'headers' in player:
-                header = self.headers
-                header['Authorization'] = player['headers']['Authorization']
-                header['X-Riot-Entitlements-JWT'] = player['headers']['X-Riot-Entitlements-JWT']
-                json_data = {
-                    "playerToPutOnTeam": player['puuid']
-                }
-                self.post2(endpoint=f'/parties/v1/parties/{party_id}/customgamemembership/{team}', url='pd', headers=header, data=json_data)
-                
-        for player in team1:
-            set_team(player, 'TeamSpectate')
-        for player in team2:
-            set_team(player, 'TeamSpectate')
-
-
-        for player in team1:
-            set_team(player, 'TeamOne')
-        for player in team2:
-            set_team(player, 'TeamTwo')
+        def set_team(player: dict, team: str) -> Callable[[], Any]:
+            json_data = {
+                "playerToPutOnTeam": player['puuid']
+            }
+            return functools.partial(self.post2, endpoint=f'/parties/v1/parties/{party_id}/customgamemembership/{team}', url='pd', headers=self.__player_headers(player['headers']), data=json_data)
+
+        with prioritized(max(priority.get(), BACKGROUND)):
+            membership = None
+            with contextlib.suppress(Exception):
+                (party,) = await self.gather(functools.partial(self.fetch_party, party_id))
+                membership = party['CustomGameData']['Membership'] or {}
+            current = {
+                member['Subject']: team
+                for team, key in (('TeamOne', 'teamOne'), ('TeamTwo', 'teamTwo'), ('TeamSpectate', 'teamSpectate'))
+                for member in (membership or {}).get(key) or []
+            }
+
+            moves = [
+                (player, team)
+                for players, team in ((team1, 'TeamOne'), (team2, 'TeamTwo'))
+                for player in players
+                if 'headers' in player and current.get(player['puuid']) != team
+            ]
+
+            # free the slots first so a full team never rejects a move, everyone moves out if the state is unknown
+            await self.gather(
+                *(
+                    set_team(player, 'TeamSpectate')
+                    for player, _ in moves
+                    if membership is None or current.get(player['puuid']) not in (None, 'TeamSpectate')
+                )
+            )
+            await self.gather(*(set_team(player, team) for player, team in moves))
     
     def set_custom_game_start(self, party_id: str, headers: dict[str, Any]) -> dict[str, Any]:
         """
         Start a custom game
         """
-        header = self.headers
-        header['Authorization'] = headers['Authorization']
-        header['X-Riot-Entitlements-JWT'] = headers['X-Riot-Entitlements-JWT']
+        header = self.__player_headers(headers)
         json_data = {}
         data = self.post2(endpoint=f'/parties/v1/parties/{party_id}/customgamesettings', url='pd', headers=header, data=json_data)
-        print(data)
+        log.debug('custom game start', extra={'data': data})
         return data
     
     async def set_change_queue(self, party_id: str, headers: dict[str, Any], map: str = "/Game/Maps/Ascent/Ascent") -> None:
         """
         Change the queue of the party
         """
-        header = self.headers
-        header['Authorization'] = headers['Authorization']
-        header['X-Riot-Entitlements-JWT'] = headers['X-Riot-Entitlements-JWT']
+        header = self.__player_headers(headers)
         
         json_data = {
             "Map": map,
@@ -493,16 +530,16 @@ class API_ENDPOINT:
                 "IsOvertimeWinByTwo": "true"
             }
         }
-        self.post2(endpoint=f'/parties/v1/parties/{party_id}/makecustomgame', url='pd', headers=header)
+        await asyncio.to_thread(self.post2, endpoint=f'/parties/v1/parties/{party_id}/makecustomgame', url='pd', headers=header)
         # self.post2(endpoint=f'/parties/v1/parties/{party_id}/customgamesettings', url='pd', headers=header, data=json_data)
 
     def fetch_custom_game_map(self) -> list[dict[str, str]] | None:
         """
         Get the map for a custom game
         """
-        r = requests.get('https://valorant-api.com/v1/maps')
+        r = client.get('https://valorant-api.com/v1/maps')
         
-        data = json.loads(r.text)
+        data = _decode(r) or {}
 
         result = []
         if 'status' in data and data['status'] == 200:
@@ -516,13 +553,13 @@ class API_ENDPOINT:
 
     # local utility functions
 
-    def __get_live_season(self) -> str:
-        """Get the UUID of the live competitive season"""
-        content = self.fetch_content()
-        season_id = [season['ID'] for season in content['Seasons'] if season['IsActive'] and season['Type'] == 'act']
-        if not season_id:
-            return self.fetch_player_mmr()['LatestCompetitiveUpdate']['SeasonID']
-        return season_id[0]
+    def __player_headers(self, headers: dict[str, Any]) -> dict[str, Any]:
+        """Copy of the request headers authenticated as another player"""
+        return {
+            **self.headers,
+            'Authorization': headers['Authorization'],
+            'X-Riot-Entitlements-JWT': headers['X-Riot-Entitlements-JWT'],
+        }
 
     def __check_puuid(self, puuid: str | None = None) -> str:
         """If puuid passed into method is None make it current user's puuid"""
@@ -553,14 +590,17 @@ class API_ENDPOINT:
 
     def _get_client_version(self) -> str:
         """Get the client version"""
-        r = requests.get('https://valorant-api.com/v1/version')
+        r = client.get('https://valorant-api.com/v1/version')
         data = r.json()['data']
         return f"{data['branch']}-shipping-{data['buildVersion']}-{data['version'].split('.')[3]}"  # return formatted version string
 
     def _get_valorant_version(self) -> str | None:
         """Get the valorant version"""
-        r = requests.get('https://valorant-api.com/v1/version')
+        r = client.get('https://valorant-api.com/v1/version')
         if r.status_code != 200:
             return None
         data = r.json()['data']
         return data['version']
+
+
+instrument(API_ENDPOINT, endpoint_seconds, exclude=('activate', 'locale_response', 'gather'))
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any
+
+from ..errors import ResponseError
+
+if TYPE_CHECKING:
+    from .endpoint import API_ENDPOINT
+
+# seconds a resolved name/tag stays cached
+NAME_TTL = 6 * 60 * 60
+
+# seconds to wait for other callers before sending a batch
+BATCH_WINDOW = 0.05
+
+# puuids sent in one name-service request
+BATCH_SIZE = 100
+
+
+class _Batch:
+    def __init__(self, endpoint: API_ENDPOINT) -> None:
+        self.endpoint = endpoint
+        self.futures: dict[str, asyncio.Future[dict[str, str] | None]] = {}
+        self.timer: asyncio.TimerHandle | None = None
+
+
+class NameResolver:
+    """Resolve player name/tag by puuid, batching concurrent callers into one request per shard"""
+
+    def __init__(self, ttl: float = NAME_TTL, window: float = BATCH_WINDOW) -> None:
+        self.ttl = ttl
+        self.window = window
+        self._cache: dict[str, tuple[float, dict[str, str]]] = {}
+        self._pending: dict[str, _Batch] = {}
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    def get_cached(self, puuid: str) -> dict[str, str] | None:
+        cached = self._cache.get(puuid)
+        if cached is None or cached[0] < time.monotonic():
+            return None
+        return cached[1]
+
+    async def resolve(self, endpoint: API_ENDPOINT, puuid: str) -> dict[str, str] | None:
+        """Get {'name', 'tag'} for a puuid, None if Riot does not know it"""
+        result = await self.resolve_many(endpoint, [puuid])
+        return result.get(puuid)
+
+    async def resolve_many(self, endpoint: API_ENDPOINT, puuids: list[str]) -> dict[str, dict[str, str]]:
+        """Get {'name', 'tag'} for many puuids with at most one round-trip per shard"""
+
+        result = {}
+        futures = {}
+        for puuid in dict.fromkeys(puuids):
+            cached = self.get_cached(puuid)
+            if cached is not None:
+                result[puuid] = cached
+            else:
+                futures[puuid] = self._enqueue(endpoint, puuid)
+
+        # every shard's batch is awaited, a failed one must not leave the others' errors unretrieved
+        names = await asyncio.gather(*futures.values(), return_exceptions=True)
+        errors = [name for name in names if isinstance(name, BaseException)]
+        if errors:
+            raise errors[0]
+        for puuid, name in zip(futures, names, strict=True):
+            if name is not None:
+                result[puuid] = name  # type: ignore
+        return result
+
+    def _enqueue(self, endpoint: API_ENDPOINT, puuid: str) -> asyncio.Future[dict[str, str] | None]:
+        shard = endpoint.shard
+        batch = self._pending.get(shard)
+        if batch is None:
+            batch = self._pending[shard] = _Batch(endpoint)
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, shard, batch)
+
+        if puuid not in batch.futures:
+            batch.futures[puuid] = asyncio.get_running_loop().create_future()
+        future = batch.futures[puuid]
+
+        if len(batch.futures) >= BATCH_SIZE:
+            self._flush(shard, batch)
+        return future
+
+    def _flush(self, shard: str, batch: _Batch) -> None:
+        # the timer of a batch that was already sent by size must not send the shard's next batch early
+        if self._pending.get(shard) is not batch:
+            return
+        del self._pending[shard]
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.create_task(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: _Batch) -> None:
+        error: Exception | None = None
+        try:
+            data: Any = await asyncio.to_thread(batch.endpoint.fetch_name_by_puuid, list(batch.futures))
+            # Riot errors come back as the decoded error body, not as an exception
+            if not isinstance(data, list):
+                raise ResponseError(f'name service returned {type(data).__name__}')
+
+            expires = time.monotonic() + self.ttl
+            for player in data:
+                name = {'name': player['GameName'], 'tag': player['TagLine']}
+                self._cache[player['Subject']] = (expires, name)
+
+            for puuid, future in batch.futures.items():
+                if not future.done():
+                    future.set_result(self.get_cached(puuid))
+        except Exception as e:
+            error = e
+        finally:
+            # every caller gets an answer, also when the lookup failed half way or was cancelled
+            for future in batch.futures.values():
+                if not future.done():
+                    future.set_exception(error or ResponseError('name service request was cancelled'))
+
+
+resolver = NameResolver()
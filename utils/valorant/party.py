@@ -1,13 +1,20 @@
 from discord import Interaction, User, Member
 from utils.valorant import cache as Cache, useful, view as View
 from utils.valorant.embed import Embed, GetEmbed
+from utils.valorant.endpoint import API_ENDPOINT
+from utils.members import MemberOps, Result
+from utils.valorant.names import resolver
+import contextlib
 import discord
+import logging
 
 from typing import TYPE_CHECKING, Any
 
 
 from bot import ValorantBot
 
+log = logging.getLogger(__name__)
+
 class CustomParty():
     def __init__(self, valorantCog, interaction: Interaction[ValorantBot], bot: ValorantBot): # type: ignore
         self.bot = bot
@@ -49,49 +56,73 @@ class CustomParty():
 
         return True
     
+    def team_members(self, guild: discord.Guild, role: discord.Role | None, team: list) -> list[Member]:
+        """Members of a team, the party's players plus whoever holds the team role in the member cache"""
+
+        members = {member.id: member for member in role.members} if role else {}
+        for player in team:
+            user = self.players[player]['user']
+            member = guild.get_member(user.id) or user
+            if isinstance(member, Member):
+                members[member.id] = member
+        return list(members.values())
+
+    @staticmethod
+    def move_message(result: Result) -> str:
+        if result.ok:
+            return '음성 채널 이동 완료!'
+        return f'음성 채널 이동 완료! (이동 실패: {", ".join(f.member.display_name for f in result.failed)})'
+
     async def move_users(self, interaction: Interaction[ValorantBot]):
         try:
             role1 = discord.utils.get(interaction.guild.roles, name="VAL_1") # type: ignore
             role2 = discord.utils.get(interaction.guild.roles, name="VAL_2") # type: ignore
-            await interaction.guild.chunk() # type: ignore
-            role_members1 = [member for member in interaction.guild.members if role1 in member.roles] # type: ignore
-            role_members2 = [member for member in interaction.guild.members if role2 in member.roles] # type: ignore
-            for member in role_members1:
-                # 음성채널 이동
-                if member.voice:
-                    await member.move_to(self.voice_channel[0]) # type: ignore
-
-            for member in role_members2:
-                # 음성채널 이동
-                if member.voice:
-                    await member.move_to(self.voice_channel[1]) # type: ignore
-
-            await interaction.followup.send('음성 채널 이동 완료!')
+
+            # 음성채널 이동, 모든 이동을 한 번에
+            ops = MemberOps(reason='custom party teams')
+            for member in self.team_members(interaction.guild, role1, self.best_team1): # type: ignore
+                ops.move(member, self.voice_channel[0]) # type: ignore
+            for member in self.team_members(interaction.guild, role2, self.best_team2): # type: ignore
+                ops.move(member, self.voice_channel[1]) # type: ignore
+            result = await ops.run()
+
+            await interaction.followup.send(self.move_message(result))
         except Exception as e:
-            print(e)
+            log.warning('moving members failed: %r', e)
             await interaction.followup.send('음성 채널 이동 실패!')
 
     async def re_change(self, interaction: Interaction) -> None:
         try:
             role2 = discord.utils.get(interaction.guild.roles, name="VAL_2") # type: ignore
-            role_members2 = [member for member in interaction.guild.members if role2 in member.roles] # type: ignore
-            for member in role_members2:
-                # 음성채널 이동
-                if member.voice:
-                    await member.move_to(self.voice_channel[0])
-            
-            await interaction.followup.send('음성 채널 이동 완료!')
+
+            # 음성채널 이동
+            ops = MemberOps(reason='custom party regroup')
+            for member in self.team_members(interaction.guild, role2, self.best_team2): # type: ignore
+                ops.move(member, self.voice_channel[0])
+            result = await ops.run()
+
+            await interaction.followup.send(self.move_message(result))
         except Exception as e:
-            print(e)
+            log.warning('moving members back failed: %r', e)
             await interaction.followup.send('음성 채널 이동 실패!')
 
-    async def invite_room(self, interaction:Interaction[ValorantBot], user:str) -> tuple[list, list, list]:
+    async def invite_room(self, interaction:Interaction[ValorantBot], endpoint: API_ENDPOINT) -> tuple[list, list, list]:
         players = []
         best_team1 = []
         best_team2 = []
+
+        # refresh riot ids of every logged in player in one name-service round-trip
+        logged_in = [self.players[player] for player in self.players if 'puuid' in self.players[player]]
+        with contextlib.suppress(Exception):
+            names = await resolver.resolve_many(endpoint, [player['puuid'] for player in logged_in])
+            for player in logged_in:
+                if player['puuid'] in names:
+                    player['username'] = names[player['puuid']]['name']
+                    player['tag'] = names[player['puuid']]['tag']
+
         for player in self.players:
             if 'username' in self.players[player]:
-                if user != self.players[player]['username'] + "#" + self.players[player]['tag']:
+                if endpoint.puuid != self.players[player]['puuid']:
                     players.append({"headers": self.players[player]['headers'], "user": self.players[player]['user']})
             else:
                 await interaction.followup.send(f'{self.players[player]["user"].mention}님은 `내전봇`에 로그인되어 있지 않아 초대에서 제외되었습니다.')
@@ -100,4 +131,4 @@ class CustomParty():
         for member in self.best_team2:
             best_team2.append(self.players[member])
 
-        return players, best_team1, best_team2
\ No newline at end of file
+        return players, best_team1, best_team2
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any
+
+from ..errors import ResponseError
+
+if TYPE_CHECKING:
+    from .endpoint import API_ENDPOINT
+
+# seconds a player's competitive tier stays cached, rank rarely changes mid-evening
+RANK_TTL = 30 * 60
+
+# seconds the live act id stays cached
+SEASON_TTL = 6 * 60 * 60
+
+
+class RankService:
+    """Competitive tier lookups with a per puuid cache and a shared live season cache"""
+
+    def __init__(self, ttl: float = RANK_TTL, season_ttl: float = SEASON_TTL) -> None:
+        self.ttl = ttl
+        self.season_ttl = season_ttl
+        self._ranks: dict[str, tuple[float, int]] = {}
+        self._seasons: dict[str, tuple[float, str]] = {}
+
+    def get_cached(self, puuid: str) -> int | None:
+        cached = self._ranks.get(puuid)
+        if cached is None or cached[0] < time.monotonic():
+            return None
+        return cached[1]
+
+    def live_season(self, endpoint: API_ENDPOINT) -> str | None:
+        """Get the UUID of the live competitive act, shared by every player of the shard"""
+
+        cached = self._seasons.get(endpoint.shard)
+        if cached is not None and cached[0] >= time.monotonic():
+            return cached[1]
+
+        content = endpoint.fetch_content()
+        season_id = [season['ID'] for season in content.get('Seasons') or [] if season['IsActive'] and season['Type'] == 'act']
+        if not season_id:
+            return None
+
+        self._seasons[endpoint.shard] = (time.monotonic() + self.season_ttl, season_id[0])
+        return season_id[0]
+
+    def get_rank(self, endpoint: API_ENDPOINT, puuid: str | None = None) -> int:
+        """Get the current competitive tier, blocking, run it in a worker thread"""
+
+        puuid = endpoint.puuid if puuid is None else puuid
+        cached = self.get_cached(puuid)
+        if cached is not None:
+            return cached
+
+        data = endpoint.fetch_player_mmr(puuid)
+        # fetch answers a Riot error status with {}, that is no rank to show or keep for RANK_TTL
+        if 'QueueSkills' not in data:
+            raise ResponseError(endpoint.locale_response().get('REQUEST_FAILED'))
+
+        season_id = self.live_season(endpoint)
+        if season_id is None:
+            # no live act in the content, answer from the player's own last update but do not keep it
+            latest = data.get('LatestCompetitiveUpdate') or {}
+            return int(latest.get('TierAfterUpdate') or 0)
+
+        seasons = (data['QueueSkills'].get('competitive') or {}).get('SeasonalInfoBySeasonID') or {}
+        # 0 when the player is not placed in the live act yet
+        tier = int((seasons.get(season_id) or {}).get('CompetitiveTier') or 0)
+
+        self._ranks[puuid] = (time.monotonic() + self.ttl, tier)
+        return tier
+
+    async def prefetch(self, players: list[dict[str, Any]]) -> dict[str, int]:
+        """Fetch the tier of every logged in party player concurrently, using each player's own endpoint"""
+
+        players = [player for player in players if 'endpoint' in player and 'puuid' in player]
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self.get_rank, player['endpoint'], player['puuid']) for player in players),
+            return_exceptions=True,
+        )
+        return {
+            player['puuid']: rank for player, rank in zip(players, results, strict=True) if not isinstance(rank, BaseException)
+        }
+
+
+ranks = RankService()
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 from io import BytesIO
 from typing import TYPE_CHECKING
 
 import discord
-import requests
 
 from ..errors import ValorantBotError
 from .local import LocalErrorResponse
+from .transport import client
+
+log = logging.getLogger(__name__)
 
 if TYPE_CHECKING:
     from bot import ValorantBot
@@ -117,9 +121,7 @@ def get_item_type(uuid: str) -> str | None:
 
 
 def __url_to_image(url: str) -> bytes | None:
-    session = requests.session()
-
-    r = session.get(url)
+    r = client.get(url)
     image = BytesIO(r.content)
     image_value = image.getvalue()
     if r.status_code in range(200, 299):
@@ -134,12 +136,11 @@ async def setup_emoji(bot: ValorantBot, guild: discord.Guild, local_code: str, f
         emoji = discord.utils.get(bot.emojis, name=name)
         if not emoji:
             try:
-                emoji = await guild.create_custom_emoji(name=name, image=__url_to_image(emoji_url))  # type: ignore
+                emoji = await guild.create_custom_emoji(name=name, image=await asyncio.to_thread(__url_to_image, emoji_url))  # type: ignore
             except discord.Forbidden as e:
                 if force:
                     raise ValorantBotError(response.get('MISSING_PERM')) from e
                 continue
             except discord.HTTPException:
-                print(response.get('FAILED_CREATE_EMOJI'))
-                pass
+                log.warning(response.get('FAILED_CREATE_EMOJI'), extra={'data': {'emoji': name}})
                 # raise RuntimeError(f'Failed to create emoji !')
@@ -0,0 +1,629 @@
+from __future__ import annotations
+
+import abc
+import asyncio
+import atexit
+import contextlib
+import json
+import logging
+import os
+import queue
+import random
+import sqlite3
+import string
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from dotenv import load_dotenv
+
+from ..cluster import cluster
+from ..metrics import cache_seconds
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Iterator
+
+try:
+    import fcntl
+except ImportError:  # windows, file leases then only hold within one process
+    fcntl = None  # type: ignore
+
+load_dotenv()
+
+log = logging.getLogger(__name__)
+
+# seconds repeated saves of the same document are coalesced into one write
+SAVE_DELAY = 0.5
+
+# documents are stored as json text, indented like the files the bot always wrote
+INDENT = 2
+
+SQLITE_PATH = 'data/storage.sqlite3'
+
+MYSQL_POOL_SIZE = 4
+
+# seconds between attempts while waiting for a lease held by another process
+LEASE_POLL = 1.0
+
+# seconds a process may hold a document while merging and writing it, and between attempts to take it
+DOCUMENT_LEASE = 30.0
+DOCUMENT_LEASE_POLL = 0.05
+
+_MISSING = object()
+
+
+# ---------- BACKENDS ---------- #
+
+
+class StorageBackend(abc.ABC):
+    """Stores named json documents as text, load returns None for a missing document
+
+    Leases are named locks with an expiry shared by every process on the backend, by default kept
+    in a leases document guarded by _lease_lock.
+    """
+
+    name = 'base'
+
+    def __init__(self) -> None:
+        self.lease_lock = threading.Lock()
+
+    @abc.abstractmethod
+    def load(self, name: str) -> str | None: ...
+
+    @abc.abstractmethod
+    def store(self, name: str, text: str) -> None: ...
+
+    @contextlib.contextmanager
+    def _lease_lock(self) -> Iterator[None]:
+        with self.lease_lock:
+            yield
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew a lease, True when owner holds it for the next ttl seconds"""
+
+        with self._lease_lock():
+            now = time.time()
+            leases = {k: v for k, v in json.loads(self.load('leases') or '{}').items() if v['expires'] > now}
+            holder = leases.get(name)
+            if holder is not None and holder['owner'] != owner:
+                return False
+            leases[name] = {'owner': owner, 'expires': now + ttl}
+            self.store('leases', json.dumps(leases))
+            return True
+
+    def release(self, name: str, owner: str) -> None:
+        with self._lease_lock():
+            leases = json.loads(self.load('leases') or '{}')
+            if leases.get(name, {}).get('owner') == owner:
+                del leases[name]
+                self.store('leases', json.dumps(leases))
+
+
+class FileBackend(StorageBackend):
+    """data/<name>.json files, replaced atomically"""
+
+    name = 'file'
+
+    def __init__(self, folder: str = 'data') -> None:
+        super().__init__()
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+
+    def load(self, name: str) -> str | None:
+        try:
+            with open(os.path.join(self.folder, name + '.json'), encoding='utf-8') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def store(self, name: str, text: str) -> None:
+        path = os.path.join(self.folder, name + '.json')
+        tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(text)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(tmp)
+
+    @contextlib.contextmanager
+    def _lease_lock(self) -> Iterator[None]:
+        with self.lease_lock, open(os.path.join(self.folder, 'leases.lock'), 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)  # released when the file is closed
+            yield
+
+
+class SQLiteBackend(StorageBackend):
+    """Embedded SQLite database, one row per document"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = SQLITE_PATH) -> None:
+        super().__init__()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS documents (name TEXT PRIMARY KEY, data TEXT NOT NULL)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)')
+        self.lock = threading.Lock()
+
+    def load(self, name: str) -> str | None:
+        with self.lock:
+            row = self.conn.execute('SELECT data FROM documents WHERE name = ?', (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def store(self, name: str, text: str) -> None:
+        with self.lock:
+            self.conn.execute(
+                'INSERT INTO documents (name, data) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET data = excluded.data',
+                (name, text),
+            )
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self.lock:
+            # the update only applies while the lease is free, expired or already ours
+            cursor = self.conn.execute(
+                'INSERT INTO leases (name, owner, expires) VALUES (?, ?, ?) ON CONFLICT(name) DO UPDATE '
+                'SET owner = excluded.owner, expires = excluded.expires WHERE leases.expires <= ? OR leases.owner = excluded.owner',
+                (name, owner, now + ttl, now),
+            )
+        return cursor.rowcount == 1
+
+    def release(self, name: str, owner: str) -> None:
+        with self.lock:
+            self.conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+
+class ReplitBackend(StorageBackend):
+    """Replit DB, documents are kept as raw json values"""
+
+    name = 'replit'
+
+    def __init__(self) -> None:
+        from replit import db  # type: ignore
+
+        super().__init__()
+        self.db = db
+
+    def load(self, name: str) -> str | None:
+        try:
+            return self.db.get_raw(name)
+        except KeyError:
+            return None
+
+    def store(self, name: str, text: str) -> None:
+        self.db.set_raw(name, text)
+
+
+class MySQLPool:
+    """Small blocking connection pool for pymysql, connections run in autocommit"""
+
+    def __init__(self, size: int = MYSQL_POOL_SIZE) -> None:
+        self.size = size
+        self.idle: queue.LifoQueue[Any] = queue.LifoQueue(maxsize=size)
+        self.slots = threading.BoundedSemaphore(size)
+
+    @staticmethod
+    def _connect() -> Any:
+        import pymysql
+
+        host = os.getenv('DB_HOST')
+        user = os.getenv('DB_USER')
+        passw = os.getenv('DB_PASS')
+        db = os.getenv('DB_NAME')
+        if host is None or user is None or passw is None or db is None:
+            raise ConnectionError('DB Connection Error')
+        return pymysql.connect(host=host, user=user, password=passw, db=db, charset='utf8', autocommit=True)
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[Any]:
+        with self.slots:
+            try:
+                conn = self.idle.get_nowait()
+                conn.ping(reconnect=True)
+            except queue.Empty:
+                conn = self._connect()
+            try:
+                yield conn
+            except Exception:
+                conn.close()
+                raise
+            self.idle.put_nowait(conn)
+
+
+class MySQLBackend(StorageBackend):
+    """MySQL through the shared pool, one row per document"""
+
+    name = 'mysql'
+
+    def __init__(self, pool: MySQLPool) -> None:
+        super().__init__()
+        self.pool = pool
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute('CREATE TABLE IF NOT EXISTS documents (name VARCHAR(64) PRIMARY KEY, data LONGTEXT NOT NULL)')
+            cursor.execute(
+                'CREATE TABLE IF NOT EXISTS leases (name VARCHAR(64) PRIMARY KEY, owner VARCHAR(128) NOT NULL, expires DOUBLE NOT NULL)'
+            )
+
+    def load(self, name: str) -> str | None:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute('SELECT data FROM documents WHERE name = %s', (name,))
+            row = cursor.fetchone()
+        return None if row is None else row[0]
+
+    def store(self, name: str, text: str) -> None:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO documents (name, data) VALUES (%s, %s) ON DUPLICATE KEY UPDATE data = VALUES(data)',
+                (name, text),
+            )
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            # assignments run left to right, expires is only moved once owner is ours
+            cursor.execute(
+                'INSERT INTO leases (name, owner, expires) VALUES (%s, %s, %s) ON DUPLICATE KEY UPDATE '
+                'owner = IF(expires <= %s OR owner = VALUES(owner), VALUES(owner), owner), '
+                'expires = IF(owner = VALUES(owner), VALUES(expires), expires)',
+                (name, owner, now + ttl, now),
+            )
+            cursor.execute('SELECT owner FROM leases WHERE name = %s', (name,))
+            row = cursor.fetchone()
+        return row is not None and row[0] == owner
+
+    def release(self, name: str, owner: str) -> None:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute('DELETE FROM leases WHERE name = %s AND owner = %s', (name, owner))
+
+
+def create_backend(pool: MySQLPool) -> StorageBackend:
+    """Pick the backend from STORAGE_BACKEND, Replit DB when ON_REPLIT is set, files otherwise"""
+
+    kind = os.getenv('STORAGE_BACKEND') or ('replit' if os.getenv('ON_REPLIT') else 'file')
+    if kind == 'file':
+        return FileBackend()
+    if kind == 'sqlite':
+        return SQLiteBackend(os.getenv('STORAGE_PATH') or SQLITE_PATH)
+    if kind == 'replit':
+        return ReplitBackend()
+    if kind == 'mysql':
+        return MySQLBackend(pool)
+    raise ValueError(f'Unknown STORAGE_BACKEND: {kind}')
+
+
+# ---------- STORAGE ---------- #
+
+
+def merge(base: Any, mine: Any, theirs: Any) -> Any:
+    """Three-way merge of a document's top level
+
+    Keys or list items this process changed since it read base are applied over what another process
+    stored meanwhile, everything else keeps their version. Other values are replaced by mine.
+    """
+
+    if isinstance(mine, dict) and isinstance(theirs, dict):
+        base = base if isinstance(base, dict) else {}
+        merged = dict(theirs)
+        for key in base.keys() | mine.keys():
+            if key not in mine:
+                merged.pop(key, None)
+            elif base.get(key, _MISSING) != mine[key]:
+                merged[key] = mine[key]
+        return merged
+
+    if isinstance(mine, list) and isinstance(theirs, list):
+        base = base if isinstance(base, list) else []
+
+        def identity(item: Any) -> str:
+            return json.dumps(item, sort_keys=True)
+
+        before = {identity(item) for item in base}
+        removed = before - {identity(item) for item in mine}
+        merged = [item for item in theirs if identity(item) not in removed]
+        present = {identity(item) for item in merged}
+        merged += [item for item in mine if identity(item) not in before and identity(item) not in present]
+        return merged
+
+    return mine
+
+
+class Storage:
+    """Documents of the chosen backend behind a shared read cache and a coalescing background writer
+
+    With shared set, other processes write the same documents: reads always go to the backend, only
+    this process's unwritten saves are served from memory, and every write re-reads the document
+    under a lease and merges what changed since this process read it.
+    """
+
+    def __init__(self, backend: StorageBackend, delay: float = SAVE_DELAY, shared: bool = False) -> None:
+        self.backend = backend
+        self.delay = delay
+        self.shared = shared
+        self.owner = cluster.owner
+        self.cache: dict[str, str] = {}
+        self.base: dict[str, str | None] = {}  # shared: the stored text this process's changes start from
+        self.pending: dict[str, float] = {}
+        self.writing: set[str] = set()
+        self.condition = threading.Condition()
+        self.thread: threading.Thread | None = None
+
+    def read(self, name: str) -> Any:
+        """Get a fresh copy of a document, None if it does not exist"""
+
+        with self.condition:
+            text = self.cache.get(name)
+        if text is None:
+            with cache_seconds.time(op='load', backend=self.backend.name):
+                text = self.backend.load(name)
+            with self.condition:
+                if self.shared:
+                    # a save may have been queued while loading, it keeps the base it started from
+                    if name in self.cache:
+                        text = self.cache[name]
+                    else:
+                        self.base[name] = text
+                elif text is not None:
+                    text = self.cache.setdefault(name, text)
+            if text is None:
+                return None
+        return json.loads(text)
+
+    def save(self, name: str, data: Any) -> None:
+        """Replace a document, the write happens on a background thread"""
+
+        text = json.dumps(data, indent=INDENT, ensure_ascii=False)
+        with self.condition:
+            self.cache[name] = text
+            self.pending.setdefault(name, time.monotonic() + self.delay)
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='storage-writer', daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def create(self, name: str, data: Any) -> None:
+        """Save a document only if it does not exist yet"""
+        if self.read(name) is None:
+            self.save(name, data)
+
+    def invalidate(self, name: str) -> None:
+        """Drop a cached document that was changed outside this process"""
+        with self.condition:
+            if name not in self.pending:
+                self.cache.pop(name, None)
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                name, due = min(self.pending.items(), key=lambda item: item[1])
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self.condition.wait(wait)
+                    continue
+                del self.pending[name]
+                self.writing.add(name)
+                text = self.cache[name]
+            try:
+                with cache_seconds.time(op='store', backend=self.backend.name):
+                    if self.shared:
+                        self._store_shared(name, text)
+                    else:
+                        self.backend.store(name, text)
+            except Exception:
+                log.exception('failed to save %s', name)
+            finally:
+                with self.condition:
+                    self.writing.discard(name)
+                    if self.shared and name not in self.pending:
+                        self.cache.pop(name, None)
+                    self.condition.notify_all()
+
+    def _store_shared(self, name: str, text: str) -> None:
+        lease = f'document:{name}'
+        while not self.backend.acquire(lease, self.owner, DOCUMENT_LEASE):
+            time.sleep(DOCUMENT_LEASE_POLL)
+        try:
+            current = self.backend.load(name)
+            with self.condition:
+                base = self.base.get(name)
+            merged = text
+            if current is not None and current != base and current != text:
+                data = merge(json.loads(base) if base else None, json.loads(text), json.loads(current))
+                merged = json.dumps(data, indent=INDENT, ensure_ascii=False)
+                log.debug('merged %s with changes from another process', name)
+            self.backend.store(name, merged)
+            with self.condition:
+                if name in self.pending:
+                    # the next save was made from this process's copy, other processes' keys stay theirs
+                    self.base[name] = text
+                else:
+                    self.base[name] = merged
+                    self.cache.pop(name, None)
+        finally:
+            self.backend.release(lease, self.owner)
+
+    def flush(self) -> None:
+        """Write every pending document now, blocks until done"""
+        with self.condition:
+            for name in self.pending:
+                self.pending[name] = 0.0
+            self.condition.notify_all()
+            while (self.pending or self.writing) and self.thread is not None and self.thread.is_alive():
+                self.condition.wait()
+
+    def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew a lease shared by every process on the backend"""
+        with cache_seconds.time(op='lease', backend=self.backend.name):
+            return self.backend.acquire(name, owner, ttl)
+
+    def release(self, name: str, owner: str) -> None:
+        self.backend.release(name, owner)
+
+
+# ---------- REPOSITORIES ---------- #
+
+
+class UserRepository:
+    """users document, {user_id: account data}
+
+    The documents are served from the Storage cache and saved in the background, so these are plain calls.
+    """
+
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+
+    def all(self) -> dict[str, Any]:
+        return self.storage.read('users') or {}
+
+    def get(self, user_id: int | str) -> dict[str, Any] | None:
+        return self.all().get(str(user_id))
+
+    def set(self, user_id: int | str, data: dict[str, Any]) -> None:
+        users = self.all()
+        users[str(user_id)] = data
+        self.storage.save('users', users)
+
+    def delete(self, user_id: int | str) -> None:
+        users = self.all()
+        if users.pop(str(user_id), None) is not None:
+            self.storage.save('users', users)
+
+    def save(self, users: dict[str, Any]) -> None:
+        """Write back the whole document after changing several users read from all()"""
+        self.storage.save('users', users)
+
+
+class NotifyRepository:
+    """notifys document, a list of {'id', 'uuid'} subscriptions"""
+
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+
+    def all(self) -> list[dict[str, Any]]:
+        # a document created empty by older versions is {}
+        return list(self.storage.read('notifys') or [])
+
+    def by_user(self, user_id: int | str) -> list[dict[str, Any]]:
+        return [notify for notify in self.all() if notify['id'] == str(user_id)]
+
+    def add(self, user_id: int | str, uuid: str) -> bool:
+        """Subscribe a user to a skin, False when they already are"""
+        notifys = self.all()
+        if any(n['id'] == str(user_id) and n['uuid'] == uuid for n in notifys):
+            return False
+        notifys.append({'id': str(user_id), 'uuid': uuid})
+        self.storage.save('notifys', notifys)
+        return True
+
+    def remove(self, user_id: int | str, *uuids: str) -> None:
+        notifys = self.all()
+        remaining = [n for n in notifys if not (n['id'] == str(user_id) and n['uuid'] in uuids)]
+        if len(remaining) != len(notifys):
+            self.storage.save('notifys', remaining)
+
+
+class CatalogRepository:
+    """cache document, the raw asset cache the catalog is built from, and cache_meta describing it
+
+    Saving goes through catalog.publish, which stamps the generation both documents carry.
+    """
+
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+
+    def get(self) -> dict[str, Any]:
+        return self.storage.read('cache') or {}
+
+    def meta(self) -> dict[str, Any] | None:
+        return self.storage.read('cache_meta')
+
+    def set(self, data: dict[str, Any], meta: dict[str, Any]) -> None:
+        # queued after the cache, a reader that still finds the older document loads it again on its next check
+        self.storage.save('cache', data)
+        self.storage.save('cache_meta', meta)
+
+    def invalidate(self) -> None:
+        self.storage.invalidate('cache')
+        self.storage.invalidate('cache_meta')
+
+
+class LeaseRepository:
+    """Named leases for work that must run in one process at a time, e.g. the daily notify or a cache build"""
+
+    def __init__(self, storage: Storage) -> None:
+        self.storage = storage
+
+    async def acquire(self, name: str, owner: str, ttl: float) -> bool:
+        return await asyncio.to_thread(self.storage.acquire, name, owner, ttl)
+
+    async def release(self, name: str, owner: str) -> None:
+        await asyncio.to_thread(self.storage.release, name, owner)
+
+    @contextlib.asynccontextmanager
+    async def hold(self, name: str, owner: str, ttl: float, poll: float = LEASE_POLL) -> AsyncIterator[None]:
+        """Wait until the lease is ours, released on exit"""
+
+        while not await self.acquire(name, owner, ttl):
+            await asyncio.sleep(poll)
+        try:
+            yield
+        finally:
+            await self.release(name, owner)
+
+
+class CaptchaRepository:
+    """Captcha hand-off with the web page, always MySQL since the page reads the same table"""
+
+    def __init__(self, pool: MySQLPool) -> None:
+        self.pool = pool
+
+    @staticmethod
+    def _random_token(length: int = 20) -> str:
+        return ''.join(random.choice(string.ascii_letters) for _ in range(length))
+
+    def _create(self, site_key: str, data: str) -> str:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            token = self._random_token()
+            while cursor.execute('SELECT * FROM captcha WHERE customToken = %s', (token,)):
+                token = self._random_token()
+            cursor.execute('INSERT INTO captcha VALUES (%s, %s, %s, %s)', (token, '', site_key, data))
+        return token
+
+    def _solved(self, custom_token: str) -> str:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute('SELECT SQL_NO_CACHE token FROM captcha WHERE customToken = %s', (custom_token,))
+            row = cursor.fetchone()
+        return '' if row is None else row[0]
+
+    def _delete(self, custom_token: str) -> None:
+        with self.pool.connection() as conn, conn.cursor() as cursor:
+            cursor.execute('DELETE FROM captcha WHERE customToken = %s', (custom_token,))
+
+    async def create(self, site_key: str, data: str) -> str:
+        """Store the hcaptcha challenge, returns the token the web page is opened with"""
+        return await asyncio.to_thread(self._create, site_key, data)
+
+    async def solved(self, custom_token: str) -> str:
+        """Get the solved hcaptcha token, empty until the user finished the challenge"""
+        return await asyncio.to_thread(self._solved, custom_token)
+
+    async def delete(self, custom_token: str) -> None:
+        await asyncio.to_thread(self._delete, custom_token)
+
+
+mysql_pool = MySQLPool(int(os.getenv('DB_POOL_SIZE') or MYSQL_POOL_SIZE))
+storage = Storage(create_backend(mysql_pool), shared=cluster.enabled)
+atexit.register(storage.flush)
+
+users = UserRepository(storage)
+notifys = NotifyRepository(storage)
+catalog = CatalogRepository(storage)
+leases = LeaseRepository(storage)
+captcha = CaptchaRepository(mysql_pool)
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .. import deadline
+from ..errors import DeadlineExceeded, ResponseError
+from ..metrics import (
+    http_coalesced,
+    http_queue_depth,
+    http_queue_seconds,
+    http_rate_limited,
+    http_responses,
+    http_retries,
+    http_seconds,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Hashable, Iterator
+
+# connect, read timeout in seconds
+DEFAULT_TIMEOUT = (5, 15)
+
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 8.0
+
+# only these methods are retried after a connection error or a 5xx, a 429 is always safe to retry
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+
+# requests per second and burst size for each host, Riot hosts use the default
+HOST_RATE_LIMITS = {
+    'valorant-api.com': (20.0, 40.0),
+    'media.valorant-api.com': (20.0, 40.0),
+}
+DEFAULT_RATE_LIMIT = (10.0, 20.0)
+
+# priority classes, a free token goes to the lowest class waiting
+INTERACTIVE = 0  # slash commands and buttons, someone is waiting on the reply
+BACKGROUND = 1  # fan-out triggered by a user, e.g. inviting a whole party
+BULK = 2  # scheduled jobs, the daily notify and cache rebuilds
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BACKGROUND: 'background', BULK: 'bulk'}
+
+# share of each host's burst that bulk requests leave untouched for the other classes
+BULK_RESERVE = 0.25
+
+# consecutive failures before a host is cut off and seconds before it is tried again
+BREAKER_THRESHOLD = 5
+BREAKER_RESET = 30.0
+
+# headers telling apart whose request it is, identical GETs are only shared between the same identity
+IDENTITY_HEADERS = ('Authorization', 'X-Riot-Entitlements-JWT')
+
+T = TypeVar('T')
+
+# base url every upstream request is sent to instead, as <override>/<host>/<path>, used by the benchmarks
+UPSTREAM_OVERRIDE = os.getenv('UPSTREAM_OVERRIDE')
+
+
+priority: contextvars.ContextVar[int] = contextvars.ContextVar('priority', default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def prioritized(level: int) -> Iterator[None]:
+    """Send the upstream requests made in this block, and in threads started from it, at the given priority"""
+    token = priority.set(level)
+    try:
+        yield
+    finally:
+        priority.reset(token)
+
+
+def override_url(url: str) -> str:
+    """Point an upstream url at UPSTREAM_OVERRIDE when it is set"""
+    if not UPSTREAM_OVERRIDE:
+        return url
+    parts = urlsplit(url)
+    query = f'?{parts.query}' if parts.query else ''
+    return f'{UPSTREAM_OVERRIDE.rstrip("/")}/{parts.hostname}{parts.path}{query}'
+
+
+class TokenBucket:
+    """Per host rate limiter, blocks the calling worker thread until a token is free
+
+    Waiters queue by priority then arrival, only the head of the queue takes the next token.
+    Bulk requests also stop short of the reserve so a command arriving mid burst does not wait for a refill.
+    """
+
+    def __init__(self, rate: float, capacity: float, reserve: float = BULK_RESERVE) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.reserve = capacity * reserve
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiters: list[tuple[int, int]] = []
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+
+    def acquire(self, level: int = INTERACTIVE) -> float:
+        """Take a token, returns the seconds spent waiting"""
+
+        entry = (level, next(self.sequence))
+        start = time.monotonic()
+        floor = 1 + (self.reserve if level >= BULK else 0)
+        with self.condition:
+            heapq.heappush(self.waiters, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.waiters[0] == entry and now >= self.blocked_until and self.tokens >= floor:
+                        self.tokens -= 1
+                        return now - start
+                    wait = max(self.blocked_until - now, (floor - self.tokens) / self.rate, 0.001)
+                    self.condition.wait(wait)
+            finally:
+                if self.waiters[0] == entry:
+                    heapq.heappop(self.waiters)
+                else:
+                    self.waiters.remove(entry)
+                    heapq.heapify(self.waiters)
+                self.condition.notify_all()
+
+    def block(self, seconds: float) -> None:
+        """Stop handing out tokens, used to honor Retry-After"""
+        with self.condition:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+class CircuitBreaker:
+    """Stop calling a host that keeps failing, let one request through after the reset timeout"""
+
+    def __init__(self, threshold: int, reset_timeout: float) -> None:
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                # half open, the next failure opens it again
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Concurrent calls with the same key wait for the first one and share its result"""
+
+    def __init__(self) -> None:
+        self.flights: dict[Hashable, _Flight] = {}
+        self.lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> tuple[T, bool]:
+        """Run fn once for every caller arriving while it is in flight, returns (result, shared)"""
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self.flights[key] = _Flight()
+
+        if not leader:
+            flight.done.wait(deadline.remaining())
+            deadline.check()
+            # the first caller gave up on its own deadline, this one may still have time
+            if not flight.done.is_set() or isinstance(flight.error, DeadlineExceeded):
+                return fn(), False
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+class HTTPClient:
+    """Shared transport for Riot and valorant-api.com with timeouts, retries, rate limits and circuit breaking"""
+
+    def __init__(self) -> None:
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=64)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._buckets: dict[str, TokenBucket] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def _host(self, host: str) -> tuple[TokenBucket, CircuitBreaker]:
+        with self._lock:
+            if host not in self._buckets:
+                rate, capacity = HOST_RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+                self._buckets[host] = TokenBucket(rate, capacity)
+                self._breakers[host] = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET)
+            return self._buckets[host], self._breakers[host]
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Full jitter exponential backoff"""
+        return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2**attempt))
+
+    @staticmethod
+    def _retry_after(r: requests.Response) -> float | None:
+        try:
+            return max(float(r.headers['Retry-After']), 0.0)
+        except (KeyError, ValueError):
+            return None
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        timeout: float | tuple[float, float] = DEFAULT_TIMEOUT,
+        retries: int = MAX_RETRIES,
+        **kwargs: Any,
+    ) -> requests.Response:
+        """Send a request, retrying rate limits and transient failures"""
+
+        method = method.upper()
+        host = urlsplit(url).hostname or ''
+        bucket, breaker = self._host(host)
+        retryable = method in IDEMPOTENT_METHODS
+        url = override_url(url)
+        level = priority.get()
+        label = PRIORITY_NAMES.get(level, str(level))
+
+        for attempt in range(retries + 1):
+            last_attempt = attempt == retries
+
+            if not breaker.allow():
+                raise ResponseError(f'{host} is not responding, please try again later.')
+
+            http_queue_depth.inc(priority=label)
+            try:
+                waited = bucket.acquire(level)
+            finally:
+                http_queue_depth.dec(priority=label)
+            http_queue_seconds.observe(waited, priority=label)
+
+            # nobody is waiting for the answer anymore, keep the quota for someone who is
+            deadline.check()
+
+            start = time.perf_counter()
+            try:
+                r = self.session.request(method, url, timeout=deadline.clamp(timeout), **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                http_seconds.observe(time.perf_counter() - start, host=host)
+                http_responses.inc(host=host, status='error')
+                breaker.record_failure()
+                if last_attempt or not retryable:
+                    raise ResponseError(f'{host} is not responding, please try again later.') from e
+                http_retries.inc(host=host, reason='connection')
+                time.sleep(self._backoff(attempt))
+                continue
+
+            http_seconds.observe(time.perf_counter() - start, host=host)
+            http_responses.inc(host=host, status=r.status_code)
+
+            if r.status_code == 429:
+                http_rate_limited.inc(host=host)
+                if last_attempt:
+                    return r
+                http_retries.inc(host=host, reason='429')
+                bucket.block(self._retry_after(r) or self._backoff(attempt))
+                continue
+
+            if r.status_code >= 500:
+                breaker.record_failure()
+                if last_attempt or not retryable:
+                    return r
+                http_retries.inc(host=host, reason='5xx')
+                time.sleep(self._retry_after(r) or self._backoff(attempt))
+                continue
+
+            breaker.record_success()
+            return r
+
+        raise ResponseError(f'{host} is not responding, please try again later.')
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        """GET, sharing the response with identical GETs of the same identity already in flight"""
+
+        if set(kwargs) - {'headers', 'timeout'}:
+            return self.request('GET', url, **kwargs)
+
+        headers = kwargs.get('headers') or {}
+        key = ('GET', url, tuple(headers.get(name) for name in IDENTITY_HEADERS))
+        r, shared = self._flights.do(key, lambda: self.request('GET', url, **kwargs))
+        if shared:
+            http_coalesced.inc(host=urlsplit(url).hostname or '')
+        return r
+
+    def put(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('PUT', url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+
+client = HTTPClient()
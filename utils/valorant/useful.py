@@ -1,25 +1,24 @@
 from __future__ import annotations
 
 import contextlib
-import json
 import os
 import uuid
 from datetime import datetime
-import pytz
-
-UTC = pytz.UTC
 from typing import TYPE_CHECKING, Any
 
 import discord
+import pytz
 from dotenv import load_dotenv
 
 from ..errors import ValorantBotError
 from ..locale_v2 import ValorantTranslator
+from .catalog import get_catalog, invalidate as invalidate_catalog, publish as publish_catalog
 from .resources import get_item_type, points as points_emoji, tiers as tiers_resources
+from .storage import catalog as catalog_documents, storage
 
 load_dotenv()
-global on_replit
-on_replit = bool(os.getenv('ON_REPLIT'))
+
+UTC = pytz.UTC
 
 VLR_locale = ValorantTranslator()
 
@@ -113,38 +112,33 @@ class JSON:
     @staticmethod
     def read(filename: str, force: bool = True) -> dict[str, Any]:
         """Read json file"""
-        try:
-            if on_replit:
-                from replit import db  # type: ignore
-
-                data = db[filename]
-            else:
-                with open('data/' + filename + '.json', encoding='utf-8') as json_file:
-                    data = json.load(json_file)
-        except (FileNotFoundError, KeyError):
-            from .cache import create_json
-
-            if force:
-                create_json(filename, {})
-                return JSON.read(filename, False)
+        data = storage.read(filename)
+        if data is None and force:
+            storage.create(filename, {})
+            return JSON.read(filename, False)
         return data
 
     @staticmethod
     def save(filename: str, data: dict[str, Any]) -> None:
-        """Save data to json file"""
-        try:
-            if on_replit:
-                from replit import db  # type: ignore
+        """Save data to json file, the write happens on a background thread"""
+        if filename == 'cache':
+            publish_catalog(data)
+        else:
+            storage.save(filename, data)
 
-                db[filename] = data
-            else:
-                with open('data/' + filename + '.json', 'w', encoding='utf-8') as json_file:
-                    json.dump(data, json_file, indent=2, ensure_ascii=False)
-        except (FileNotFoundError, KeyError):
-            from .cache import create_json
+    @staticmethod
+    def invalidate(filename: str) -> None:
+        """Forget the cached copy, the next read loads what another process saved"""
+        if filename == 'cache':
+            catalog_documents.invalidate()
+            invalidate_catalog()
+        else:
+            storage.invalidate(filename)
 
-            create_json(filename, {})
-            return JSON.save(filename, data)
+    @staticmethod
+    def flush() -> None:
+        """Write pending saves to disk"""
+        storage.flush()
 
 
 # ---------- GET DATA ---------- #
@@ -177,7 +171,7 @@ class GetItems:
     def get_skin(uuid: str) -> dict[str, Any]:
         """Get Skin data"""
         try:
-            skin_data = JSON.read('cache')
+            skin_data = get_catalog()
             skin = skin_data['skins'][uuid]
         except KeyError as e:
             raise ValorantBotError('Some skin data is missing, plz use `/debug cache`') from e
@@ -187,7 +181,7 @@ class GetItems:
     def get_skin_price(uuid: str) -> str:
         """Get Skin price by skin uuid"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         price = data['prices']
         try:
             cost = price[uuid]
@@ -199,7 +193,7 @@ class GetItems:
     def get_skin_tier_icon(skin: str) -> str:
         """Get Skin skin tier image"""
 
-        skindata = JSON.read('cache')
+        skindata = get_catalog()
         tier_uuid = skindata['skins'][skin]['tier']
         tier = skindata['tiers'][tier_uuid]['icon']
         return tier
@@ -208,7 +202,7 @@ class GetItems:
     def get_spray(uuid: str) -> Any:
         """Get Spray"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         spray = None
         with contextlib.suppress(Exception):
             spray = data['sprays'][uuid]
@@ -218,7 +212,7 @@ class GetItems:
     def get_title(uuid: str) -> Any:
         """Get Title"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         title = None
         with contextlib.suppress(Exception):
             title = data['titles'][uuid]
@@ -228,7 +222,7 @@ class GetItems:
     def get_playercard(uuid: str) -> Any:
         """Get Player card"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         title = None
         with contextlib.suppress(Exception):
             title = data['playercards'][uuid]
@@ -238,7 +232,7 @@ class GetItems:
     def get_buddie(uuid: str) -> Any:
         """Get Buddie"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         title = None
         with contextlib.suppress(Exception):
             title = data['buddies'][uuid]
@@ -248,7 +242,7 @@ class GetItems:
     def get_skin_lvl_or_name(name: str, uuid: str) -> Any:
         """Get Skin uuid by name"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         skin = None
         with contextlib.suppress(Exception):
             skin = data['skins'][uuid]
@@ -262,7 +256,7 @@ class GetItems:
         """Get tier name by skin uuid"""
 
         try:
-            data = JSON.read('cache')
+            data = get_catalog()
             uuid = data['skins'][skin_uuid]['tier']
             name = data['tiers'][uuid]['name']
         except KeyError as e:
@@ -273,7 +267,7 @@ class GetItems:
     def get_contract(uuid: str) -> Any:
         """Get contract by uuid"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         contract = None
         with contextlib.suppress(Exception):
             contract = data['contracts'][uuid]
@@ -283,7 +277,7 @@ class GetItems:
     def get_bundle(uuid: str) -> Any:
         """Get bundle by uuid"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         bundle = None
         with contextlib.suppress(Exception):
             bundle = data['bundles'][uuid]
@@ -298,7 +292,7 @@ class GetEmoji:
     def tier(skin_uuid: str) -> discord.Emoji:
         """Get tier emoji"""
 
-        data = JSON.read('cache')
+        data = get_catalog()
         uuid = data['skins'][skin_uuid]['tier']
         uuid = data['tiers'][uuid]['uuid']
         emoji = tiers_resources[uuid]['emoji']
@@ -375,7 +369,7 @@ class GetFormat:
             weekly_end = ''
 
         def get_mission_by_id(ID: str) -> str | None:
-            data = JSON.read('cache')
+            data = get_catalog()
             mission = data['missions'][ID]
             return mission
 
@@ -447,41 +441,41 @@ class GetFormat:
         """Get item battle pass by type and uuid"""
 
         if type == 'Currency':
-            data = JSON.read('cache')
+            data = get_catalog()
             name = data['currencies'][uuid]['names'][str(VLR_locale)]
             icon = data['currencies'][uuid]['icon']
             item_type = response.get('POINT', 'Point')
             return {'success': True, 'data': {'type': item_type, 'name': '10 ' + name, 'icon': icon}}
 
         elif type == 'PlayerCard':
-            data = JSON.read('cache')
+            data = get_catalog()
             name = data['playercards'][uuid]['names'][str(VLR_locale)]
             icon = data['playercards'][uuid]['icon']['wide']
             item_type = response.get('PLAYER_CARD', 'Player Card')
             return {'success': True, 'data': {'type': item_type, 'name': name, 'icon': icon}}
 
         elif type == 'Title':
-            data = JSON.read('cache')
+            data = get_catalog()
             name = data['titles'][uuid]['names'][str(VLR_locale)]
             item_type = response.get('PLAYER_TITLE', 'Title')
             return {'success': True, 'data': {'type': item_type, 'name': name, 'icon': False}}
 
         elif type == 'Spray':
-            data = JSON.read('cache')
+            data = get_catalog()
             name = data['sprays'][uuid]['names'][str(VLR_locale)]
             icon = data['sprays'][uuid]['icon']
             item_type = response.get('SPRAY', 'Spray')
             return {'success': True, 'data': {'type': item_type, 'name': name, 'icon': icon}}
 
         elif type == 'EquippableSkinLevel':
-            data = JSON.read('cache')
+            data = get_catalog()
             name = data['skins'][uuid]['names'][str(VLR_locale)]
             icon = data['skins'][uuid]['icon']
             item_type = response.get('SKIN', 'Skin')
             return {'success': True, 'data': {'type': item_type, 'name': name, 'icon': icon}}
 
         elif type == 'EquippableCharmLevel':
-            data = JSON.read('cache')
+            data = get_catalog()
             name = data['buddies'][uuid]['names'][str(VLR_locale)]
             icon = data['buddies'][uuid]['icon']
             item_type = response.get('BUDDY', 'Buddie')
@@ -535,7 +529,7 @@ class GetFormat:
         """Get battle pass format"""
 
         data = data['Contracts']
-        contracts = JSON.read('cache')
+        contracts = get_catalog()
         # data_contracts['contracts'].pop('version')
 
         season_id = season['id']  # type: ignore
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import contextlib
+import logging
 from datetime import datetime, timedelta
 from typing import TYPE_CHECKING, Any
 
@@ -8,18 +9,25 @@ from typing import TYPE_CHECKING, Any
 import discord
 from discord import ButtonStyle, Interaction, TextStyle, ui
 
+from .. import deadline
 from ..errors import ValorantBotError
 from ..locale_v2 import ValorantTranslator
+from ..members import MemberOps
+from ..metrics import failures
 from .resources import get_item_type, emoji_icon_assests
 from .party import CustomParty
+from .rank import ranks
+from .storage import notifys
 from .useful import GetEmoji
 from utils.valorant.embed import Embed, GetEmbed
 # Local
-from .useful import JSON, GetEmoji, GetItems, format_relative
+from .useful import GetEmoji, GetItems, format_relative
 import inspect
 
 VLR_locale = ValorantTranslator()
 
+log = logging.getLogger(__name__)
+
 if TYPE_CHECKING:
     from bot import ValorantBot
 
@@ -77,10 +85,10 @@ class LoginModal(ui.Modal):
             else:
                 try:
                     await self.valorantCog.commands_dict[self.command_name].callback(self.valorantCog, interaction)
-                except Exception as e:
-                    print(f"LoginModal.on_submit_method:{e}")
-        except Exception as e:
-            print(f"LoginModal.on_submit:{e}")
+                except Exception:
+                    log.exception('LoginModal.on_submit %s failed', self.command_name)
+        except Exception:
+            log.exception('LoginModal.on_submit failed')
 
     async def delete(self) -> None:
         await self.msg.delete()
@@ -117,8 +125,8 @@ class LoginView(ui.View):
                 await interaction.response.send_modal(LoginModal(self.msg, self.valorantCog, "cookie", self.command_name))
             elif self.select.values[0] == 'no_login':
                 await interaction.response.send_modal(LoginModal(self.msg, self.valorantCog, "no_login", self.command_name))
-        except Exception as e:
-            print(f"LoginView.login:{e}")
+        except Exception:
+            log.exception('LoginView.login failed')
         await self.msg.delete() # type: ignore
 
 
@@ -233,15 +241,15 @@ class CustomPartyJoinButtons(ui.View):
         try:
             user = interaction.user
             player_id = str(user.name)
-            rank = await self.valorantCog.get_tier_rank(interaction)
-            if rank == -1:
+            party_player = await self.valorantCog.get_party_player(interaction)
+            if party_player is None:
                 return
+            rank = party_player['rank']
+            player_info = party_player['player']
             emoji = discord.utils.get(self.bot.emojis, name=f'competitivetiers{rank}') # type: ignore
-            player_info, player_puuid = await self.valorantCog.get_player_info(interaction)
-            get_player_headers = await self.valorantCog.get_player_headers(interaction)
 
             
-            if await self.custom_party.add_player(player_id, {"displayName": str(user.global_name), "rank": rank, "user": user, "emoji": emoji, "headers": get_player_headers, "username": player_info.split("#")[0], "tag": player_info.split("#")[1], "puuid": player_puuid}):
+            if await self.custom_party.add_player(player_id, {"displayName": str(user.global_name), "rank": rank, "user": user, "emoji": emoji, "headers": party_player['headers'], "endpoint": party_player['endpoint'], "username": player_info.split("#")[0], "tag": player_info.split("#")[1], "puuid": party_player['puuid']}):
                 await p_msg.edit(content="참여 완료!") # type: ignore
             else:
                 await p_msg.edit(content="참여 실패..") # type: ignore
@@ -253,15 +261,15 @@ class CustomPartyJoinButtons(ui.View):
         try:
             user = interaction.user
             player_id = str(user.name)
-            rank = await self.valorantCog.get_tier_rank(interaction)
-            if rank == -1:
+            party_player = await self.valorantCog.get_party_player(interaction)
+            if party_player is None:
                 return
+            rank = party_player['rank']
+            player_info = party_player['player']
             emoji = discord.utils.get(self.bot.emojis, name=f'competitivetiers{rank}') # type: ignore
-            player_info, player_puuid = await self.valorantCog.get_player_info(interaction)
-            get_player_headers = await self.valorantCog.get_player_headers(interaction)
 
             
-            if await self.custom_party.add_player(player_id, {"displayName": str(user.global_name), "rank": rank, "user": user, "emoji": emoji, "headers": get_player_headers, "username": player_info.split("#")[0], "tag": player_info.split("#")[1], "puuid": player_puuid}):
+            if await self.custom_party.add_player(player_id, {"displayName": str(user.global_name), "rank": rank, "user": user, "emoji": emoji, "headers": party_player['headers'], "endpoint": party_player['endpoint'], "username": player_info.split("#")[0], "tag": player_info.split("#")[1], "puuid": party_player['puuid']}):
                 await p_msg.edit(content="참여 완료!") # type: ignore
             else:
                 await p_msg.edit(content="참여 실패..") # type: ignore
@@ -370,6 +378,12 @@ class CustomPartyStartButtons(ui.View):
             best_team1 = []
             best_team2 = []
             count = 0
+            # 로그인한 플레이어의 랭크를 동시에 갱신
+            player_ranks = await ranks.prefetch(list(self.custom_party.players.values()))
+            for data in self.custom_party.players.values():
+                if data.get('puuid') in player_ranks:
+                    data['rank'] = player_ranks[data['puuid']]
+                    data['emoji'] = discord.utils.get(self.bot.emojis, name=f'competitivetiers{data["rank"]}')
             # 플레이어의 랭크를 점수로 변환
             player_scores = [(name, data['rank']) for name, data in self.custom_party.players.items()]
             
@@ -394,11 +408,18 @@ class CustomPartyStartButtons(ui.View):
                 avg_rank2 = int(sum([self.custom_party.players[member]["rank"] for member in best_team2]) / len(best_team2))
             else:
                 avg_rank2 = 0
-            print(avg_rank1, avg_rank2)
+            log.debug('team average ranks %s / %s', avg_rank1, avg_rank2)
+
+            # 역할 부여는 한 번에, 파티 참가 이후 바뀐 역할을 덮어쓰지 않도록 현재 멤버로 조회
+            ops = MemberOps(reason='custom party teams')
+
+            def current(player_id: str) -> discord.Member:
+                user = self.custom_party.players[player_id]["user"]
+                return interaction.guild.get_member(user.id) or user  # type: ignore
 
             modifed_best_team1 = []
             for member in best_team1:
-                await self.custom_party.players[member]["user"].add_roles(role1)
+                ops.add_roles(current(member), role1)
                 value = f"{self.custom_party.players[member]['displayName']} - {self.custom_party.players[member]['emoji']}"
                 if 'headers' not in self.custom_party.players[member]:
                     value += ' - 비로그인'
@@ -407,15 +428,18 @@ class CustomPartyStartButtons(ui.View):
 
             modifed_best_team2 = []
             for member in best_team2:
-                await self.custom_party.players[member]["user"].add_roles(role2)
+                ops.add_roles(current(member), role2)
                 value = f"{self.custom_party.players[member]['displayName']} - {self.custom_party.players[member]['emoji']}"
                 if 'headers' not in self.custom_party.players[member]:
                     value += ' - 비로그인'
 
                 modifed_best_team2.append(value)
+            result = await ops.run()
             await msg.delete() # type: ignore
             embeds = []
             embeds.append(discord.Embed(title="내전 팀 분배", description=f"팀 분배가 완료되었습니다.\n`{count}`번의 경우의 수로 밸런스를 맞췄습니다.", color=0x00ff00))
+            if result.failed:
+                embeds[0].description += f"\n역할 부여 실패: {', '.join(f.member.display_name for f in result.failed)}"  # type: ignore
 
             embeds.append(discord.Embed(title=f"팀 1", color=0xff0000))
             embeds[1].set_thumbnail(url=emoji_icon_assests[f"competitivetiers{avg_rank1}"])
@@ -430,8 +454,9 @@ class CustomPartyStartButtons(ui.View):
             await self.check(interaction)
             await self.custom_party.delete_party_list_message()
 
-        except Exception as e:
-            print(f"CustomPartyStartButtons.start:{e}")
+        except Exception:
+            log.exception('CustomPartyStartButtons.start failed')
+            failures.inc(source='custom_party_start')
 
 
     @ui.button(label='취소', style=ButtonStyle.red)
@@ -535,14 +560,7 @@ class NotifyView(discord.ui.View):
 
     @discord.ui.button(label='Remove Notify', emoji='✖️', style=ButtonStyle.red)
     async def remove_notify(self, interaction: Interaction, button: ui.Button):
-        data = JSON.read('notifys')
-
-        for i in range(len(data)):
-            if data[i]['uuid'] == self.uuid and data[i]['id'] == str(self.user_id):  # type: ignore
-                data.pop(i)  # type: ignore
-                break
-
-        JSON.save('notifys', data)
+        notifys.remove(self.user_id, self.uuid)
 
         self.remove_notify.disabled = True
         await interaction.response.edit_message(view=self)
@@ -551,22 +569,72 @@ class NotifyView(discord.ui.View):
         await interaction.followup.send(removed_notify.format(skin=self.name), ephemeral=True)  # type: ignore
 
 
+class NotifyBatchView(ui.View):
+    """One removal menu for every notified skin of a daily message"""
+
+    def __init__(self, user_id: int, skins: dict[str, str], response: dict) -> None:
+        self.user_id = user_id
+        self.skins = skins  # uuid: name
+        self.response = response
+        self.message: discord.Message | None = None
+        super().__init__(timeout=600)
+        self.select = ui.Select(
+            placeholder=response.get('REMOVE_NOTIFY', 'Remove Notification'),
+            min_values=1,
+            max_values=len(skins),
+            options=[discord.SelectOption(label=name[:100], value=uuid) for uuid, name in skins.items()],
+        )
+        self.select.callback = self.remove_notify
+        self.add_item(self.select)
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        """Only the user the daily message was sent to can remove its skins"""
+        if interaction.user.id == int(self.user_id):
+            return True
+        await interaction.response.send_message('This notify menu is not yours, sorry!', ephemeral=True)
+        return False
+
+    async def on_timeout(self) -> None:
+        """Disables the removal menu when the view times out"""
+
+        with contextlib.suppress(Exception):
+            self.select.disabled = True
+            await self.message.edit(view=self)  # type: ignore
+
+    async def remove_notify(self, interaction: Interaction) -> None:
+        selected = set(self.select.values)
+
+        notifys.remove(self.user_id, *selected)
+
+        removed = [self.skins.pop(uuid) for uuid in selected if uuid in self.skins]
+        self.select.options = [option for option in self.select.options if option.value not in selected]
+        if self.select.options:
+            self.select.max_values = len(self.select.options)
+        else:
+            self.select.options = [discord.SelectOption(label='-', value='-')]
+            self.select.disabled = True
+        await interaction.response.edit_message(view=self)
+
+        removed_notify = self.response.get('REMOVED_NOTIFY')
+        await interaction.followup.send(
+            '\n'.join(removed_notify.format(skin=name) for name in removed), ephemeral=True  # type: ignore
+        )
+
+
 class _NotifyListButton(ui.Button):
     def __init__(self, label: str, custom_id: str) -> None:
         super().__init__(label=label, style=ButtonStyle.red, custom_id=str(custom_id))
 
     async def callback(self, interaction: Interaction) -> None:
         await interaction.response.defer()
+        # the list is edited through the command's interaction, bounded by its window
+        deadline.begin(self.view.interaction)  # type: ignore
 
-        data: dict[str, Any] = JSON.read('notifys')
-        for i in range(len(data)):
-            if data[i]['uuid'] == self.custom_id and data[i]['id'] == str(self.view.interaction.user.id):  # type: ignore
-                data.pop(i)  # type: ignore
-                break
-
-        JSON.save('notifys', data)
+        notifys.remove(self.view.interaction.user.id, self.custom_id)  # type: ignore
 
         del self.view.skin_source[self.custom_id]  # type: ignore
+        if self.view.is_finished():  # type: ignore
+            return
         self.view.update_button()  # type: ignore
         embed = self.view.main_embed()  # type: ignore
         await self.view.interaction.edit_original_response(embed=embed, view=self.view)  # type: ignore
@@ -607,11 +675,11 @@ class NotifyViewList(ui.View):
     def get_data(self) -> None:
         """Gets the data from the cache."""
 
-        database = JSON.read('notifys')
-        notify_skin = [x['uuid'] for x in database if x['id'] == str(self.interaction.user.id)]  # type: ignore
+        notify_skin = [x['uuid'] for x in notifys.by_user(self.interaction.user.id)]
         skin_source = {}
 
         for uuid in notify_skin:
+            deadline.check()
             skin = GetItems.get_skin(uuid)
             name = skin['names'][str(VLR_locale)]
             icon = skin['icon']
@@ -722,7 +790,7 @@ class TwoFA_UI(ui.Modal, title='Two-factor authentication'):
 
     async def on_error(self, interaction: Interaction, error: Exception) -> None:
         """Called when the user submits the modal with an error."""
-        print('TwoFA_UI:', error)
+        log.error('TwoFA_UI failed', exc_info=error)
         embed = discord.Embed(description='Oops! Something went wrong.', color=0xFD4554)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
@@ -774,6 +842,7 @@ class BaseBundle(ui.View):
                     ).set_image(url=bundle['icon'])  # type: ignore
                 )
                 for items in sorted(bundle['items'], key=lambda x: x['price'], reverse=True):  # type: ignore
+                    deadline.check()
                     item = GetItems.get_item_by_type(items['type'], items['uuid'])  # type: ignore
                     item_type = get_item_type(items['type'])  # type: ignore
                     emoji = GetEmoji.tier_by_bot(items['uuid'], self.bot) if item_type == 'Skins' else ''  # type: ignore
@@ -828,6 +897,7 @@ class BaseBundle(ui.View):
         embeds = [embed]
 
         for items in sorted(bundle['items'], reverse=True, key=lambda c: c['base_price']):  # type: ignore
+            deadline.check()
             item = GetItems.get_item_by_type(items['type'], items['uuid'])
             item_type = get_item_type(items['type'])
             emoji = GetEmoji.tier_by_bot(items['uuid'], self.bot) if item_type == 'Skins' else ''
@@ -865,6 +935,8 @@ class BaseBundle(ui.View):
     @ui.select(placeholder='Select a bundle:')
     async def select_bundle(self, interaction: Interaction, select: ui.Select):
         # TODO: fix freeze
+        if self.is_finished():
+            return
         self.build_embeds(int(select.values[0]))
         self.fill_items()
         self.update_button()
@@ -892,6 +964,8 @@ class BaseBundle(ui.View):
 
     async def interaction_check(self, interaction: Interaction) -> bool:
         if interaction.user == self.interaction.user:
+            # pages are answered with response.edit_message, which Discord only accepts within INITIAL_RESPONSE
+            deadline.begin(interaction, deadline.INITIAL_RESPONSE)
             return True
         await interaction.response.send_message('This menus cannot be controlled by you, sorry!', ephemeral=True)
         return False
@@ -979,6 +1053,7 @@ class SelectionFeaturedBundleView(ui.View):
 
     @ui.select(placeholder='Select a bundle:')
     async def select_bundle(self, interaction: Interaction, select: ui.Select):
+        deadline.begin(interaction, deadline.INITIAL_RESPONSE)
         value = select.values[0]
         bundle = self.bundles[int(value)]
         embeds = self.other_view.build_featured_bundle(bundle)  # type: ignore
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, NamedTuple
+
+from .metrics import loop_blocked, loop_lag_seconds
+
+log = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# seconds between heartbeats on the event loop
+INTERVAL = 0.05
+
+# a heartbeat late by this many seconds counts as a stall and records the blocking stack
+THRESHOLD = 0.25
+
+# frames kept per sampled stack
+STACK_DEPTH = 15
+
+
+class Callsite(NamedTuple):
+    callsite: str
+    count: int
+    total: float
+    max: float
+    stack: list[str]
+
+
+def _own_frame(stack: traceback.StackSummary) -> traceback.FrameSummary | None:
+    """Innermost frame in the bot's code, the stdlib or library call below it is what blocks"""
+
+    for frame in reversed(stack):
+        if frame.filename.startswith(ROOT) and 'site-packages' not in frame.filename:
+            return frame
+    return stack[-1] if stack else None
+
+
+def _callsite(frame: traceback.FrameSummary | None) -> str:
+    if frame is None:
+        return 'unknown'
+    return f'{os.path.relpath(frame.filename, ROOT)}:{frame.lineno}({frame.name})'
+
+
+class LoopWatchdog:
+    """Event loop lag monitor
+
+    A heartbeat task measures how late the loop wakes it up. A thread watches the heartbeat and,
+    once it is overdue past the threshold, samples the loop thread's stack with sys._current_frames,
+    so each stall is attributed to the code that was running when it happened.
+    """
+
+    def __init__(self, threshold: float = THRESHOLD, interval: float = INTERVAL) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.callsites: dict[str, list[Any]] = {}
+        self.lock = threading.Lock()
+        self.sample: traceback.StackSummary | None = None
+        self.last_beat = time.monotonic()
+        self.loop_thread: int | None = None
+        self.task: asyncio.Task[None] | None = None
+        self.thread: threading.Thread | None = None
+        self.stopped = threading.Event()
+
+    def start(self, threshold: float | None = None) -> None:
+        """Start watching the running loop"""
+
+        if threshold is not None:
+            self.threshold = threshold
+        if self.task is not None:
+            return
+        self.loop_thread = threading.get_ident()
+        self.last_beat = time.monotonic()
+        self.stopped.clear()
+        self.task = asyncio.get_running_loop().create_task(self._heartbeat(), name='loop-watchdog')
+        self.thread = threading.Thread(target=self._watch, name='loop-watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self.last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - self.last_beat - self.interval)
+            loop_lag_seconds.observe(lag)
+            if lag >= self.threshold:
+                self._record(lag)
+
+    def _watch(self) -> None:
+        while not self.stopped.wait(self.interval / 2):
+            overdue = time.monotonic() - self.last_beat - self.interval
+            if overdue < self.threshold or self.sample is not None:
+                continue
+            frame = sys._current_frames().get(self.loop_thread)  # type: ignore
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            with self.lock:
+                # the heartbeat may have caught up while the stack was being walked
+                if time.monotonic() - self.last_beat - self.interval >= self.threshold:
+                    self.sample = stack
+
+    def _record(self, lag: float) -> None:
+        with self.lock:
+            stack, self.sample = self.sample, None
+
+        frames = stack[-STACK_DEPTH:] if stack is not None else []
+        callsite = _callsite(_own_frame(stack)) if stack is not None else 'unknown'
+        formatted = [f'{os.path.relpath(f.filename, ROOT)}:{f.lineno} {f.name}' for f in frames]
+
+        with self.lock:
+            entry = self.callsites.setdefault(callsite, [0, 0.0, 0.0, formatted])
+            entry[0] += 1
+            entry[1] += lag
+            if lag > entry[2]:
+                entry[2] = lag
+                entry[3] = formatted
+
+        loop_blocked.inc()
+        log.warning('event loop blocked %.3fs at %s', lag, callsite, extra={'data': {'stack': formatted}})
+
+    def top(self, limit: int = 10) -> list[Callsite]:
+        """Callsites by total blocked time"""
+
+        with self.lock:
+            entries = [Callsite(name, *entry) for name, entry in self.callsites.items()]
+        return sorted(entries, key=lambda entry: entry.total, reverse=True)[:limit]
+
+    def reset(self) -> None:
+        with self.lock:
+            self.callsites.clear()
+
+
+watchdog = LoopWatchdog()